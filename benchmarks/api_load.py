@@ -0,0 +1,362 @@
+"""
+Load and latency benchmark for the MyMovieShelf API.
+
+Starts the offline OMDb stub, serves the Django app in-process (or targets
+an already running server with --base-url) and drives the main user flow
+from a pool of concurrent virtual users:
+
+    register -> login -> [search -> detail -> create -> add-from-omdb
+                          -> list -> mark-watched] x iterations
+
+Reports throughput and p50/p95/p99 latency per endpoint plus database
+queries per request, and writes the results as JSON so two runs (e.g. two
+commits) can be diffed, or compared directly with --baseline.
+
+Usage:
+    python benchmarks/api_load.py --concurrency 8 --iterations 10 \\
+        --omdb-latency-ms 80 --omdb-error-rate 0.01 --output bench.json
+    python benchmarks/api_load.py --baseline before.json --output after.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from omdb_stub import start_stub  # noqa: E402
+
+ENDPOINTS = ('register', 'login', 'search', 'detail', 'create',
+             'add_from_omdb', 'list', 'mark_watched')
+QUERIES = ('batman', 'star wars', 'alien', 'matrix', 'godfather', 'inception',
+           'jaws', 'heat', 'up', 'cars', 'toy story', 'frozen')
+PASSWORD = 'Bench-Passw0rd!'
+QUERY_COUNT_HEADER = 'X-Bench-Queries'
+SERVER_TIMING_QUERIES = re.compile(r'(?:^|,)\s*db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """Thread-safe collector of per-endpoint samples"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {name: [] for name in ENDPOINTS}
+
+    def add(self, endpoint, elapsed, ok, queries):
+        with self.lock:
+            self.samples[endpoint].append((elapsed, ok, queries))
+
+    def summary(self, wall_time):
+        endpoints = {}
+        for name, samples in self.samples.items():
+            latencies = sorted(s[0] * 1000.0 for s in samples)
+            queries = [s[2] for s in samples if s[2] is not None]
+            errors = sum(1 for s in samples if not s[1])
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+                'throughput_rps': round(len(samples) / wall_time, 2) if wall_time else 0.0,
+                'latency_ms': {
+                    'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                    'p50': _round(percentile(latencies, 50)),
+                    'p95': _round(percentile(latencies, 95)),
+                    'p99': _round(percentile(latencies, 99)),
+                    'max': _round(latencies[-1] if latencies else None),
+                },
+                'queries_per_request': (
+                    round(sum(queries) / len(queries), 2) if queries else None
+                ),
+            }
+        total = sum(e['requests'] for e in endpoints.values())
+        return {
+            'endpoints': endpoints,
+            'totals': {
+                'requests': total,
+                'errors': sum(e['errors'] for e in endpoints.values()),
+                'wall_time_s': round(wall_time, 3),
+                'throughput_rps': round(total / wall_time, 2) if wall_time else 0.0,
+            },
+        }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def query_count(response):
+    """Queries the server ran for a response, if it reported them"""
+    queries = response.headers.get(QUERY_COUNT_HEADER)
+    if queries:
+        return int(queries)
+    # Servers started outside the benchmark report it via RequestMetricsMiddleware.
+    match = SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+class VirtualUser:
+    """One client session walking through the benchmark flow"""
+
+    def __init__(self, base_url, index, run_id, iterations, recorder):
+        self.base_url = base_url.rstrip('/')
+        self.index = index
+        self.run_id = run_id
+        self.iterations = iterations
+        self.recorder = recorder
+        self.session = requests.Session()
+
+    def call(self, endpoint, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=60, **kwargs)
+        except requests.RequestException:
+            self.recorder.add(endpoint, time.perf_counter() - started, False, None)
+            return None
+        elapsed = time.perf_counter() - started
+        self.recorder.add(endpoint, elapsed, response.ok, query_count(response))
+        return response if response.ok else None
+
+    def run(self):
+        email = f"bench-{self.run_id}-{self.index}@example.com"
+        self.call('register', 'post', '/api/auth/register/', json={
+            'email': email,
+            'username': f"bench-{self.run_id}-{self.index}",
+            'password': PASSWORD,
+            'password_confirm': PASSWORD,
+        })
+        response = self.call('login', 'post', '/api/auth/login/', json={
+            'email': email,
+            'password': PASSWORD,
+        })
+        if response is None:
+            return
+        self.session.headers['Authorization'] = f"Bearer {response.json()['access']}"
+
+        for iteration in range(self.iterations):
+            self.iteration(iteration)
+
+    def iteration(self, iteration):
+        query = QUERIES[iteration % len(QUERIES)]
+        response = self.call('search', 'get', '/api/movies/search/', params={'query': query})
+        if response is None:
+            return
+        movies = response.json().get('movies', [])
+        if not movies:
+            return
+
+        # Walk a different result per lap over the query list so a user
+        # never shelves the same title twice.
+        offset = self.index + iteration // len(QUERIES)
+        shelve_id = movies[offset % len(movies)]['imdb_id']
+        browse_id = movies[(offset + 1) % len(movies)]['imdb_id']
+
+        self.call('detail', 'get', f"/api/movies/detail/{browse_id}/")
+        self.call('create', 'post', '/api/movies/create/', json={'imdb_id': browse_id})
+        response = self.call('add_from_omdb', 'post', '/api/watchlist/add-from-omdb/', json={
+            'imdb_id': shelve_id,
+            'rating': 1 + iteration % 5,
+            'note': 'benchmark',
+        })
+        self.call('list', 'get', '/api/watchlist/')
+        if response is not None:
+            item_id = response.json()['watchlist_item']['id']
+            self.call('mark_watched', 'patch', f"/api/watchlist/{item_id}/mark_watched/")
+
+
+def serve_django_in_process():
+    """Serve the Django app on an ephemeral port, counting queries per request"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movieshelfapp.settings')
+    import django
+    django.setup()
+
+    from wsgiref.simple_server import WSGIRequestHandler
+    from django.core.servers.basehttp import ThreadedWSGIServer
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    app = get_wsgi_application()
+
+    def counted_app(environ, start_response):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def counted_start_response(status, headers, exc_info=None):
+            headers.append((QUERY_COUNT_HEADER, str(queries[0])))
+            return start_response(status, headers, exc_info)
+
+        with connection.execute_wrapper(count):
+            return app(environ, counted_start_response)
+
+    # The stdlib handler speaks HTTP/1.0 and closes each connection, which
+    # keeps Nagle/delayed-ACK stalls on keep-alive sockets out of the numbers.
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler)
+    server.set_app(counted_app)
+    threading.Thread(target=server.serve_forever, name='django-wsgi', daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    header = f"{'endpoint':<14}{'reqs':>6}{'err':>5}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>7}"
+    print(header)
+    print('-' * len(header))
+    for name, stats in report['endpoints'].items():
+        latency = stats['latency_ms']
+        queries = stats['queries_per_request']
+        print(
+            f"{name:<14}{stats['requests']:>6}{stats['errors']:>5}{stats['throughput_rps']:>9}"
+            f"{_fmt(latency['p50']):>9}{_fmt(latency['p95']):>9}{_fmt(latency['p99']):>9}"
+            f"{_fmt(queries):>7}"
+        )
+        if baseline and name in baseline.get('endpoints', {}):
+            before = baseline['endpoints'][name]
+            deltas = [
+                _delta(before['latency_ms'][key], latency[key]) for key in ('p50', 'p95', 'p99')
+            ]
+            print(
+                f"{'  vs baseline':<25}{_delta(before['throughput_rps'], stats['throughput_rps']):>9}"
+                f"{deltas[0]:>9}{deltas[1]:>9}{deltas[2]:>9}"
+                f"{_delta(before['queries_per_request'], queries):>7}"
+            )
+    totals = report['totals']
+    print(f"\n{totals['requests']} requests, {totals['errors']} errors in "
+          f"{totals['wall_time_s']}s ({totals['throughput_rps']} req/s)")
+
+
+def _fmt(value):
+    return '-' if value is None else f"{value:.1f}"
+
+
+def _delta(before, after):
+    if not before or after is None:
+        return '-'
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MyMovieShelf API load benchmark')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent virtual users')
+    parser.add_argument('--users', type=int, default=None,
+                        help='total virtual users (defaults to --concurrency)')
+    parser.add_argument('--iterations', type=int, default=5,
+                        help='search/shelve laps per virtual user')
+    parser.add_argument('--base-url', default=None,
+                        help='benchmark a running server instead of serving in-process '
+                             '(query counts need SERVER_TIMING_HEADER=True there)')
+    parser.add_argument('--omdb-latency-ms', type=float, default=50.0)
+    parser.add_argument('--omdb-jitter-ms', type=float, default=10.0)
+    parser.add_argument('--omdb-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this path')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+    args = parser.parse_args()
+
+    stub = start_stub(
+        latency_ms=args.omdb_latency_ms,
+        jitter_ms=args.omdb_jitter_ms,
+        error_rate=args.omdb_error_rate,
+        seed=args.seed,
+    )
+
+    server = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        # Must be in place before settings are imported.
+        os.environ['OMDB_BASE_URL'] = stub.base_url
+        os.environ.setdefault('OMDB_API_KEY', 'benchmark')
+        os.environ.setdefault('SERVER_TIMING_HEADER', 'True')
+        server, base_url = serve_django_in_process()
+
+    run_id = uuid.uuid4().hex[:8]
+    users = args.users or args.concurrency
+    recorder = Recorder()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(VirtualUser(base_url, index, run_id, args.iterations, recorder).run)
+            for index in range(users)
+        ]
+        for future in futures:
+            future.result()
+    wall_time = time.perf_counter() - started
+
+    if server is not None:
+        server.shutdown()
+    stub.shutdown()
+
+    report = recorder.summary(wall_time)
+    report['meta'] = {
+        'run_id': run_id,
+        'git_revision': git_revision(),
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'target': args.base_url or 'in-process',
+        'concurrency': args.concurrency,
+        'users': users,
+        'iterations': args.iterations,
+        'omdb': {
+            'latency_ms': args.omdb_latency_ms,
+            'jitter_ms': args.omdb_jitter_ms,
+            'error_rate': args.omdb_error_rate,
+            'calls': stub.calls,
+            'injected_errors': stub.errors,
+        },
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Offline stand-in for the OMDb API used by the benchmarks.
+
+Answers the two request shapes the backend sends (``?s=<title>&page=<n>``
+and ``?i=<imdb id>``) with deterministic fake data, after an artificial
+delay, and fails a configurable fraction of calls. Point the backend at it
+with ``OMDB_BASE_URL=http://127.0.0.1:<port>/``.
+
+Run standalone:
+    python benchmarks/omdb_stub.py --port 8765 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RESULTS_PER_PAGE = 10
+TOTAL_RESULTS = 120
+
+GENRES = ['Action', 'Adventure', 'Comedy', 'Crime', 'Drama', 'Fantasy',
+          'Horror', 'Mystery', 'Romance', 'Sci-Fi', 'Thriller', 'Western']
+PEOPLE = ['Ava Stone', 'Ben Carter', 'Chloe Diaz', 'Dan Hughes', 'Eva Novak',
+          'Finn Walsh', 'Gia Romano', 'Hugo Berg', 'Iris Tanaka', 'Jon Reyes',
+          'Kara Lind', 'Leo Marsh', 'Mia Okafor', 'Nils Dahl', 'Omar Haddad']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def imdb_id_for(query, page, index):
+    """Stable fake IMDb ID for the index-th result of a search page"""
+    seed = f"{query.strip().lower()}:{page}:{index}".encode()
+    return f"tt{zlib.crc32(seed) % 10_000_000:07d}"
+
+
+def search_payload(query, page):
+    if not query.strip():
+        return {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+    first = (page - 1) * RESULTS_PER_PAGE
+    if first >= TOTAL_RESULTS:
+        return {'Response': 'False', 'Error': 'Movie not found!'}
+    results = []
+    for index in range(min(RESULTS_PER_PAGE, TOTAL_RESULTS - first)):
+        imdb_id = imdb_id_for(query, page, index)
+        results.append({
+            'Title': f"{query.strip().title()} {first + index + 1}",
+            'Year': str(1950 + int(imdb_id[2:]) % 75),
+            'imdbID': imdb_id,
+            'Type': 'movie',
+            'Poster': f"https://img.example.invalid/{imdb_id}.jpg",
+        })
+    return {'Search': results, 'totalResults': str(TOTAL_RESULTS), 'Response': 'True'}
+
+
+def detail_payload(imdb_id):
+    if not imdb_id.startswith('tt') or not imdb_id[2:].isdigit():
+        return {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+    rng = random.Random(imdb_id)
+    year = 1950 + int(imdb_id[2:]) % 75
+    return {
+        'Title': f"Movie {imdb_id}",
+        'Year': str(year),
+        'Rated': 'PG-13',
+        'Released': f"{rng.randint(1, 28):02d} {rng.choice(MONTHS)} {year}",
+        'Runtime': f"{rng.randint(80, 190)} min",
+        'Genre': ', '.join(rng.sample(GENRES, 3)),
+        'Director': rng.choice(PEOPLE),
+        'Writer': ', '.join(rng.sample(PEOPLE, 2)),
+        'Actors': ', '.join(rng.sample(PEOPLE, 4)),
+        'Plot': ' '.join(['A stub plot line for benchmarking.'] * rng.randint(2, 8)),
+        'Language': 'English',
+        'Country': 'United States',
+        'Poster': f"https://img.example.invalid/{imdb_id}.jpg",
+        'imdbRating': f"{rng.uniform(3, 9.5):.1f}",
+        'imdbVotes': f"{rng.randint(100, 2_500_000):,}",
+        'imdbID': imdb_id,
+        'Type': 'movie',
+        'Response': 'True',
+    }
+
+
+class OMDbStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None):
+        super().__init__(address, OMDbStubHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def next_delay_and_failure(self):
+        with self.lock:
+            self.calls += 1
+            delay = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return max(delay, 0.0) / 1000.0, failed
+
+
+class OMDbStubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        delay, failed = self.server.next_delay_and_failure()
+        if delay:
+            time.sleep(delay)
+        if failed:
+            self._send(503, {'Response': 'False', 'Error': 'Stub injected failure'})
+            return
+
+        params = parse_qs(urlparse(self.path).query)
+        if 'i' in params:
+            payload = detail_payload(params['i'][0])
+        elif 's' in params:
+            try:
+                page = max(int(params.get('page', ['1'])[0]), 1)
+            except ValueError:
+                page = 1
+            payload = search_payload(params['s'][0], page)
+        else:
+            payload = {'Response': 'False', 'Error': 'Something went wrong.'}
+        self._send(200, payload)
+
+    def _send(self, code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(host='127.0.0.1', port=0, **options):
+    """Start the stub on a background thread and return the server"""
+    server = OMDbStubServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, name='omdb-stub', daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = OMDbStubServer(
+        (args.host, args.port),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    print(f"OMDb stub listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""
+Per-user query latency and maintenance cost of watchlist_items, to compare
+the plain table with the hash-partitioned one (watchlist/partitioning.py).
+
+Runs against the PostgreSQL database in the Django settings, which should
+hold realistic data, e.g. from `manage.py generate_synthetic_data`. For a
+sample of users it times the queries every watchlist request makes:
+  - list:   a shelf page (WatchlistViewSet's queryset, newest first),
+  - sync:   the delta-sync read of items changed since a cursor,
+  - lookup: one item by (user, movie), as add-to-shelf checks,
+then times VACUUM ANALYZE of the table and reports table and index sizes
+(summed over the partitions when partitioned).
+
+    python benchmarks/partitioning.py --output plain.json
+    manage.py partition_watchlist_items --partitions 32
+    python benchmarks/partitioning.py --baseline plain.json --output partitioned.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movieshelfapp.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from api_load import git_revision, percentile  # noqa: E402
+from watchlist import partitioning  # noqa: E402
+from watchlist.models import WatchlistItem  # noqa: E402
+
+QUERIES = ('list', 'sync', 'lookup')
+
+
+def sample_users(count, rng):
+    with connection.cursor() as cursor:
+        # TABLESAMPLE keeps this cheap on a large table; users with many items come up more often,
+        # as they do in real traffic.
+        cursor.execute(
+            f"SELECT user_id, movie_id FROM {partitioning.TABLE} TABLESAMPLE SYSTEM (1) LIMIT %s", [count * 10]
+        )
+        rows = cursor.fetchall()
+    if not rows:
+        raise SystemExit(f"{partitioning.TABLE} is empty; generate data first")
+    return rng.sample(rows, min(count, len(rows)))
+
+
+def run_query(name, user_id, movie_id, since):
+    items = WatchlistItem.objects.filter(user_id=user_id)
+    if name == 'list':
+        return list(items.select_related('movie')[:20])
+    if name == 'sync':
+        return list(items.filter(updated_at__gt=since).order_by('updated_at', 'id')[:500])
+    return list(items.filter(movie_id=movie_id))
+
+
+def time_queries(samples, repeat):
+    since = datetime.now(timezone.utc) - timedelta(days=30)
+    results = {}
+    for name in QUERIES:
+        timings = []
+        for _ in range(repeat):
+            for user_id, movie_id in samples:
+                started = time.perf_counter()
+                run_query(name, user_id, movie_id, since)
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results[name] = {
+            'queries': len(timings),
+            'p50': round(percentile(timings, 50), 3),
+            'p95': round(percentile(timings, 95), 3),
+            'p99': round(percentile(timings, 99), 3),
+        }
+    return results
+
+
+def relations():
+    """The table and, when partitioned, its partitions"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relid FROM pg_partition_tree(%s::regclass) WHERE isleaf", [partitioning.TABLE]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def sizes():
+    tree = f"pg_partition_tree('{partitioning.TABLE}'::regclass)"
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT sum(pg_table_size(relid)), sum(pg_indexes_size(relid)) FROM {tree} WHERE isleaf")
+        table, indexes = cursor.fetchone()
+        cursor.execute(
+            f"SELECT sum(pg_relation_size(indexrelid)) FROM {tree} JOIN pg_index ON indrelid = relid "
+            f"WHERE isleaf AND indisunique AND NOT indisprimary"
+        )
+        (unique,) = cursor.fetchone()
+    return {'table_mb': _mb(table), 'indexes_mb': _mb(indexes), 'unique_index_mb': _mb(unique)}
+
+
+def vacuum():
+    """Seconds VACUUM ANALYZE takes over the whole table, and the slowest single relation"""
+    timings = []
+    for relation in relations():
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f"VACUUM (ANALYZE) {relation}")
+        timings.append(time.perf_counter() - started)
+    return {'total_s': round(sum(timings), 3), 'max_relation_s': round(max(timings), 3)}
+
+
+def _mb(size):
+    return round((size or 0) / 2 ** 20, 2)
+
+
+def print_report(report, baseline=None):
+    print(f"{partitioning.TABLE}: {report['rows']} rows, {report['state']}, {report['partitions']} partitions")
+    header = f"{'query':<10}{'p50':>9}{'p95':>9}{'p99':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, stats in report['latency_ms'].items():
+        print(f"{name:<10}{stats['p50']:>9.2f}{stats['p95']:>9.2f}{stats['p99']:>9.2f}")
+        if baseline and name in baseline.get('latency_ms', {}):
+            before = baseline['latency_ms'][name]
+            print(f"{'  vs base':<10}" + ''.join(f"{_delta(before[k], stats[k]):>9}" for k in ('p50', 'p95', 'p99')))
+    for section in ('vacuum', 'sizes'):
+        for key, value in report[section].items():
+            line = f"{section} {key:<16}{value:>10}"
+            if baseline and key in baseline.get(section, {}):
+                line += f"  ({_delta(baseline[section][key], value)} vs baseline)"
+            print(line)
+
+
+def _delta(before, after):
+    if not before or after is None:
+        return '-'
+    return f"{(after - before) / before * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='watchlist_items partitioning benchmark')
+    parser.add_argument('--users', type=int, default=200, help='users sampled for the per-user queries')
+    parser.add_argument('--repeat', type=int, default=5, help='times each query runs per user')
+    parser.add_argument('--skip-vacuum', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this path')
+    parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+    args = parser.parse_args()
+
+    if connection.vendor != 'postgresql':
+        raise SystemExit('This benchmark needs PostgreSQL')
+    rng = random.Random(args.seed)
+    samples = sample_users(args.users, rng)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {partitioning.TABLE}")
+        (rows,) = cursor.fetchone()
+    state = partitioning.state(connection)
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'users': len(samples),
+            'repeat': args.repeat,
+        },
+        'rows': rows,
+        'state': state,
+        'partitions': len(relations()) if state == 'partitioned' else 0,
+        'latency_ms': time_queries(samples, args.repeat),
+        'vacuum': {} if args.skip_vacuum else vacuum(),
+        'sizes': sizes(),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
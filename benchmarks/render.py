@@ -0,0 +1,169 @@
+"""
+Rendering and compression benchmark for watchlist payloads.
+
+Serializes synthetic watchlists of several sizes (nested movies with long
+overviews and cast lists, like GET /api/watchlist/?page_size=N would
+return) and reports, per size:
+  - render time with DRF's stdlib JSONRenderer and with ORJSONRenderer,
+  - bytes on the wire uncompressed, gzipped and brotli-compressed, with
+    the levels CompressionMiddleware uses, and the time compression takes.
+
+No database is needed; run it from the repository root:
+
+    python benchmarks/render.py --sizes 20,200,2000 --output render.json
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'movieshelfapp.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from api_load import git_revision  # noqa: E402
+from movies.models import Movie  # noqa: E402
+from movieshelfapp.middleware import brotli  # noqa: E402
+from movieshelfapp.renderers import ORJSONRenderer  # noqa: E402
+from watchlist.models import WatchlistItem  # noqa: E402
+from watchlist.serializers import WatchlistItemSerializer  # noqa: E402
+
+WORDS = ('the', 'a', 'young', 'detective', 'discovers', 'secret', 'city', 'family', 'war', 'love',
+         'journey', 'must', 'before', 'after', 'night', 'world', 'team', 'friend', 'past', 'final')
+NAMES = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn')
+SURNAMES = ('Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Silva', 'Kim', 'Moreau', 'Rossi', 'Haas')
+GENRES = ('Drama', 'Comedy', 'Action', 'Thriller', 'Sci-Fi', 'Romance', 'Horror', 'Animation')
+
+
+def synthetic_watchlist(size, rng):
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    items = []
+    for n in range(size):
+        movie = Movie(
+            id=n + 1,
+            tmdb_id=f"tt{n:07d}",
+            imdb_id=f"tt{n:07d}",
+            title=' '.join(rng.choice(WORDS) for _ in range(3)).title(),
+            overview=' '.join(rng.choice(WORDS) for _ in range(60)).capitalize() + '.',
+            release_date=date(1970, 1, 1) + timedelta(days=rng.randrange(20000)),
+            poster_path=f"https://m.media-amazon.com/images/M/poster{n}._V1_SX300.jpg",
+            vote_average=round(rng.uniform(1, 10), 1),
+            vote_count=rng.randrange(100000),
+            runtime=rng.randrange(80, 180),
+            genres=rng.sample(GENRES, 3),
+            director=f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}",
+            cast=[f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}" for _ in range(10)],
+            created_at=now,
+            updated_at=now,
+        )
+        watched = rng.random() < 0.4
+        items.append(WatchlistItem(
+            id=n + 1,
+            movie=movie,
+            user_id=1,
+            is_watched=watched,
+            rating=rng.randrange(1, 6) if watched else None,
+            note='',
+            added_at=now,
+            watched_at=now if watched else None,
+            updated_at=now,
+        ))
+    return items
+
+
+def best_of(repeat, fn):
+    """Fastest of ``repeat`` runs in ms, and the last result"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best, 3), result
+
+
+def measure(size, repeat, rng):
+    items = synthetic_watchlist(size, rng)
+    serialize_ms, data = best_of(repeat, lambda: WatchlistItemSerializer(items, many=True).data)
+    payload = {'count': size, 'next': None, 'previous': None, 'results': data}
+
+    stdlib_ms, stdlib_body = best_of(repeat, lambda: JSONRenderer().render(payload))
+    orjson_ms, body = best_of(repeat, lambda: ORJSONRenderer().render(payload))
+    assert json.loads(body) == json.loads(stdlib_body)
+
+    gzip_ms, gzipped = best_of(
+        repeat, lambda: gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+    )
+    result = {
+        'items': size,
+        'serialize_ms': serialize_ms,
+        'render_ms': {'stdlib': stdlib_ms, 'orjson': orjson_ms},
+        'bytes': {'identity': len(body), 'gzip': len(gzipped)},
+        'compress_ms': {'gzip': gzip_ms},
+    }
+    if brotli is not None:
+        brotli_ms, compressed = best_of(
+            repeat, lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        )
+        result['bytes']['br'] = len(compressed)
+        result['compress_ms']['br'] = brotli_ms
+    return result
+
+
+def print_report(report):
+    print(f"{'items':>6} {'serialize':>10} {'stdlib':>9} {'orjson':>9} {'speedup':>8}"
+          f" {'identity':>10} {'gzip':>9} {'gzip ms':>8} {'br':>9} {'br ms':>7}")
+    for row in report['sizes']:
+        render = row['render_ms']
+        size = row['bytes']
+        print(
+            f"{row['items']:>6} {row['serialize_ms']:>8.1f}ms {render['stdlib']:>7.2f}ms {render['orjson']:>7.2f}ms"
+            f" {render['stdlib'] / render['orjson']:>7.1f}x {size['identity']:>10,} {size['gzip']:>9,}"
+            f" {row['compress_ms']['gzip']:>8.2f}"
+            + (f" {size['br']:>9,} {row['compress_ms']['br']:>7.2f}" if 'br' in size else f" {'-':>9} {'-':>7}")
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MyMovieShelf watchlist rendering benchmark')
+    parser.add_argument('--sizes', default='20,200,2000', help='comma separated watchlist sizes')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement; the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the JSON report to this path')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {
+        'sizes': [measure(int(size), args.repeat, rng) for size in args.sizes.split(',')],
+        'meta': {
+            'git_revision': git_revision(),
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'gzip_level': settings.COMPRESSION_GZIP_LEVEL,
+            'brotli_quality': settings.COMPRESSION_BROTLI_QUALITY if brotli is not None else None,
+        },
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+Startup benchmark: gunicorn with the app preloaded and warmed up in the
+master (the default, see movieshelfapp/warmup.py) versus loaded lazily in
+each worker.
+
+For each mode it starts gunicorn, then reports
+  - time from launch to the first HTTP response,
+  - latency of the first request each worker serves (one concurrent burst
+    of --workers requests right after that) against warmed-up latency,
+  - memory per worker: RSS, and PSS/USS, which show what copy-on-write
+    sharing with the master saves (RSS counts shared pages in full).
+
+The probed endpoint (/api/watchlist/ without a token) goes through the
+middleware, URL resolver, DRF and simplejwt but not the database, so any
+settings module works:
+
+    python benchmarks/startup.py --workers 4 --output startup.json
+    DJANGO_SETTINGS_MODULE=mysettings python benchmarks/startup.py --modes lazy
+"""
+import argparse
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from api_load import git_revision, percentile  # noqa: E402
+
+PROBE_PATH = '/api/watchlist/'
+MODES = {'preload': 'True', 'lazy': 'False'}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(url):
+    """Latency in ms of one request on a fresh connection"""
+    started = time.perf_counter()
+    requests.get(url, headers={'Connection': 'close'}, timeout=30)
+    return (time.perf_counter() - started) * 1000
+
+
+def memory(pid):
+    """RSS, PSS and USS of a process in MiB (PSS/USS need /proc/<pid>/smaps_rollup)"""
+    values = {}
+    path = f"/proc/{pid}/smaps_rollup"
+    if not os.path.exists(path):
+        path = f"/proc/{pid}/status"
+    with open(path) as fh:
+        for line in fh:
+            key, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[key] = int(rest.split()[0]) / 1024
+    usage = {'rss_mib': values.get('Rss', values.get('VmRSS'))}
+    if 'Pss' in values:
+        usage['pss_mib'] = values['Pss']
+        usage['uss_mib'] = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {key: round(value, 1) for key, value in usage.items() if value is not None}
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as fh:
+                # The command name may contain spaces; fields resume after ')'.
+                ppid = int(fh.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return found
+
+
+def run_mode(mode, workers, warm_requests):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{PROBE_PATH}"
+    env = {
+        **os.environ,
+        'GUNICORN_PRELOAD': MODES[mode],
+        'GUNICORN_BIND': f"127.0.0.1:{port}",
+        'GUNICORN_WORKERS': str(workers),
+        'REQUEST_LOG_LEVEL': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+    }
+    launched = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'movieshelfapp.wsgi'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"gunicorn exited with {server.returncode} in {mode} mode")
+            try:
+                get(url)
+                break
+            except requests.ConnectionError:
+                time.sleep(0.01)
+        first_response_ms = (time.perf_counter() - launched) * 1000
+
+        # Sync workers take one connection at a time, so a burst of
+        # `workers` requests lands on every worker.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            cold = sorted(pool.map(lambda _: get(url), range(workers)))
+        warm = sorted(get(url) for _ in range(warm_requests))
+
+        worker_memory = [memory(pid) for pid in children(server.pid)]
+        return {
+            'first_response_ms': round(first_response_ms, 1),
+            'first_request_per_worker_ms': {
+                'p50': round(percentile(cold, 50), 1), 'max': round(cold[-1], 1),
+            },
+            'warm_ms': {'p50': round(percentile(warm, 50), 1), 'p95': round(percentile(warm, 95), 1)},
+            'master_memory': memory(server.pid),
+            'worker_memory': worker_memory,
+            'worker_memory_mean': {
+                key: round(sum(usage[key] for usage in worker_memory) / len(worker_memory), 1)
+                for key in (worker_memory[0] if worker_memory else {})
+            },
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+
+
+def print_report(report):
+    print(f"{'mode':<8} {'first resp':>11} {'1st/worker p50':>15} {'max':>8} {'warm p50':>9}"
+          f" {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11}")
+    for mode, result in report['modes'].items():
+        mem = result['worker_memory_mean']
+        print(
+            f"{mode:<8} {result['first_response_ms']:>9.0f}ms"
+            f" {result['first_request_per_worker_ms']['p50']:>13.1f}ms"
+            f" {result['first_request_per_worker_ms']['max']:>6.1f}ms"
+            f" {result['warm_ms']['p50']:>7.1f}ms"
+            + ''.join(
+                f" {mem[key]:>8.1f}MiB" if key in mem else f" {'-':>11}"
+                for key in ('rss_mib', 'pss_mib', 'uss_mib')
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='MyMovieShelf gunicorn startup benchmark')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--modes', default='preload,lazy', help='comma separated: preload, lazy')
+    parser.add_argument('--warm-requests', type=int, default=200)
+    parser.add_argument('--output', help='write the JSON report to this path')
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    report = {
+        'modes': {mode: run_mode(mode, args.workers, args.warm_requests) for mode in modes},
+        'meta': {
+            'git_revision': git_revision(),
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'workers': args.workers,
+            'settings': os.environ.get('DJANGO_SETTINGS_MODULE', 'movieshelfapp.settings'),
+        },
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+            fh.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -61,6 +61,11 @@ export default function Dashboard() {
       if (response.ok) {
         const data = await response.json();
         setMovies(data.movies || []);
+        // Results say whether they are shelved; no need to look them up.
+        const shelved = (data.movies || []).filter((movie: any) => movie.in_watchlist);
+        if (shelved.length) {
+          setWatchlist(prev => new Set([...prev, ...shelved.map((movie: any) => movie.imdb_id)]));
+        }
       } else {
         throw new Error('Failed to search movies');
       }
@@ -75,13 +75,21 @@ export const refreshToken = async () => {
 
 // Movie API functions
 export const movieAPI = {
-  search: async (query) => {
-    return apiCall(`/movies/search/?query=${encodeURIComponent(query)}`);
+  search: async (query, page = 1) => {
+    return apiCall(`/movies/search/?query=${encodeURIComponent(query)}&page=${page}`);
+  },
+
+  suggest: async (query, limit = 5) => {
+    return apiCall(`/movies/suggest/?query=${encodeURIComponent(query)}&limit=${limit}`);
   },
 
   getDetail: async (imdbId) => {
     return apiCall(`/movies/detail/${imdbId}/`);
   },
+
+  getDetails: async (imdbIds) => {
+    return apiCall(`/movies/details/?ids=${imdbIds.map(encodeURIComponent).join(',')}`);
+  },
 };
 
 // Watchlist API functions
@@ -126,6 +134,44 @@ export const watchlistAPI = {
     });
   },
 
+  // Bulk actions take { ids: [...] } or { filter: { is_watched, rating } }
+  bulkMarkWatched: async (selection) => {
+    return apiCall('/watchlist/bulk_mark_watched/', {
+      method: 'PATCH',
+      body: JSON.stringify(selection),
+    });
+  },
+
+  bulkUnmarkWatched: async (selection) => {
+    return apiCall('/watchlist/bulk_unmark_watched/', {
+      method: 'PATCH',
+      body: JSON.stringify(selection),
+    });
+  },
+
+  bulkRemove: async (selection) => {
+    return apiCall('/watchlist/bulk_delete/', {
+      method: 'POST',
+      body: JSON.stringify(selection),
+    });
+  },
+
+  // Changes since a cursor from a previous sync; omit it for a full snapshot.
+  // Returns { cursor, full, items, deleted }.
+  sync: async (cursor = null) => {
+    return apiCall(`/watchlist/sync/${cursor ? `?since=${encodeURIComponent(cursor)}` : ''}`);
+  },
+
+  // Push notifications of watchlist changes made in other tabs/devices.
+  // onChange receives { upserted, deleted } (or { resync: true }); call
+  // sync() with the last cursor to fetch the changes. Returns the EventSource.
+  subscribe: (onChange) => {
+    const token = localStorage.getItem('access_token');
+    const source = new EventSource(`${API_BASE}/watchlist/events/?token=${encodeURIComponent(token)}`);
+    source.addEventListener('watchlist', (event) => onChange(JSON.parse(event.data)));
+    return source;
+  },
+
   getWatched: async () => {
     return apiCall('/watchlist/watched/');
   },
@@ -0,0 +1,41 @@
+"""
+gunicorn settings for the API.
+
+    PROMETHEUS_MULTIPROC_DIR=/tmp/movieshelf-metrics gunicorn movieshelfapp.wsgi
+
+The app is loaded and warmed up in the master before forking (see
+movieshelfapp/warmup.py), so workers start hot and share that memory
+copy-on-write. Set GUNICORN_PRELOAD=False to load it in each worker instead,
+e.g. to pick up code changes with a graceful reload (HUP).
+"""
+import os
+import shutil
+
+# Not `from decouple import config`: gunicorn would read `config` as its own
+# --config setting.
+import decouple
+
+bind = decouple.config('GUNICORN_BIND', default='127.0.0.1:8000')
+workers = decouple.config('GUNICORN_WORKERS', default=4, cast=int)
+preload_app = decouple.config('GUNICORN_PRELOAD', default=True, cast=bool)
+
+
+def on_starting(server):
+    # Samples of a previous run would otherwise be summed into this one.
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported, before any fork.
+    if server.cfg.preload_app:
+        from movieshelfapp.warmup import warm_up
+        warm_up()
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
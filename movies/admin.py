@@ -1,3 +1,25 @@
+import re
+
 from django.contrib import admin
 
-# Register your models here.
+from movieshelfapp.admin import LargeTableAdminMixin
+from .models import Movie, normalize_imdb_id
+
+IMDB_ID = re.compile(r'^tt\d+$')
+
+
+@admin.register(Movie)
+class MovieAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('title', 'imdb_id', 'release_date', 'vote_average', 'is_placeholder', 'updated_at')
+    list_filter = ('is_placeholder',)
+    search_fields = ('title',)
+    search_help_text = 'Title, or an exact IMDb ID such as tt0068646'
+    ordering = ('-id',)
+    readonly_fields = ('created_at', 'updated_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        # IMDb IDs go straight to the unique index instead of a title scan.
+        imdb_id = normalize_imdb_id(search_term)
+        if imdb_id and IMDB_ID.match(imdb_id):
+            return queryset.filter(imdb_id=imdb_id), False
+        return super().get_search_results(request, queryset, search_term)
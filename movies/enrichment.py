@@ -0,0 +1,141 @@
+"""
+Background enrichment of placeholder movies.
+
+add-from-omdb shelves a movie before its details are known: it creates a
+placeholder Movie (``is_placeholder``, titled from the client's hint or the
+IMDb ID) and an EnrichmentJob row in the same transaction, and answers
+202. The enrich_movies command then claims due jobs in batches, fetches
+the details through the provider chain (concurrently, at most
+ENRICHMENT_CONCURRENCY at a time), fills the movies in and deletes the
+jobs. The queue is the database itself, so no broker is needed, and
+several workers can run side by side: claimed jobs are leased for
+ENRICHMENT_LEASE_SECONDS (and locked with SKIP LOCKED where supported).
+
+A fetch that errors is retried with exponential backoff up to
+ENRICHMENT_MAX_ATTEMPTS times; "Movie not found!" is final. Failed jobs
+stay in the table, marked failed, for inspection.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from movieshelfapp import metrics as prometheus
+from . import identity, providers
+from .models import EnrichmentJob
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """ENRICHMENT_MAX_PENDING jobs are already waiting"""
+
+
+def queue_full():
+    """Whether the backlog has reached ENRICHMENT_MAX_PENDING (reads at most one row)"""
+    limit = settings.ENRICHMENT_MAX_PENDING
+    if limit <= 0:
+        return True  # no backlog allowed: every fetch is synchronous
+    return EnrichmentJob.objects.filter(status=EnrichmentJob.PENDING)[limit - 1:limit].exists()
+
+
+def add_placeholder(imdb_id, title=''):
+    """
+    A placeholder movie for ``imdb_id`` with its enrichment job queued; the
+    existing movie if another request created it first. Raises QueueFull.
+    """
+    if queue_full():
+        raise QueueFull()
+    with transaction.atomic():
+        movie = identity.create_movie(
+            tmdb_id=imdb_id, imdb_id=imdb_id, title=title or imdb_id, is_placeholder=True
+        )
+        if movie.is_placeholder:
+            enqueue(movie)
+    return movie
+
+
+def enqueue(movie):
+    """Queue ``movie`` for enrichment; a no-op while a job for it is pending"""
+    job, created = EnrichmentJob.objects.get_or_create(movie=movie, defaults={'run_after': timezone.now()})
+    if not created and job.status == EnrichmentJob.FAILED:
+        EnrichmentJob.objects.filter(pk=job.pk).update(
+            status=EnrichmentJob.PENDING, attempts=0, run_after=timezone.now(), locked_until=None
+        )
+
+
+def claim(batch_size, now=None):
+    """Lease up to ``batch_size`` due jobs to this worker"""
+    now = now or timezone.now()
+    using = router.db_for_write(EnrichmentJob)
+    with transaction.atomic(using=using):
+        due = EnrichmentJob.objects.using(using).filter(
+            status=EnrichmentJob.PENDING, run_after__lte=now
+        ).exclude(locked_until__gt=now).order_by('run_after')
+        if connections[using].features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True, of=('self',))
+        jobs = list(due.select_related('movie')[:batch_size])
+        if jobs:
+            EnrichmentJob.objects.using(using).filter(pk__in=[job.pk for job in jobs]).update(
+                locked_until=now + timedelta(seconds=settings.ENRICHMENT_LEASE_SECONDS)
+            )
+    return jobs
+
+
+def run_batch(batch_size=None):
+    """Enrich one batch of due placeholder movies; returns the number of jobs handled"""
+    jobs = claim(batch_size or settings.ENRICHMENT_BATCH_SIZE)
+    if not jobs:
+        return 0
+    # The catalog would only offer the placeholders themselves.
+    chain = providers.get_chain().without('catalog')
+    pending = [job for job in jobs if job.movie.is_placeholder]
+    # Filled in meanwhile, e.g. by /api/movies/create/.
+    EnrichmentJob.objects.filter(pk__in=[job.pk for job in jobs if job not in pending]).delete()
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(settings.ENRICHMENT_CONCURRENCY, len(pending))) as pool:
+            results = list(pool.map(lambda job: _fetch(chain, job.movie.imdb_id), pending))
+        for job, (record, error) in zip(pending, results):
+            _finish(job, record, error)
+    return len(jobs)
+
+
+def _fetch(chain, imdb_id):
+    try:
+        return chain.detail(imdb_id, operation='enrich'), None
+    except (requests.RequestException, providers.ProviderError) as exc:
+        return None, exc
+
+
+def _finish(job, record, error):
+    with transaction.atomic():
+        if record is not None and providers.is_found(record):
+            providers.fill(job.movie, record)
+            EnrichmentJob.objects.filter(pk=job.pk).delete()
+            outcome = 'enriched'
+        elif record is not None:
+            job.status, job.last_error = EnrichmentJob.FAILED, record.get('Error', providers.NOT_FOUND)
+            outcome = 'not_found'
+        elif job.attempts + 1 >= settings.ENRICHMENT_MAX_ATTEMPTS:
+            job.status, job.last_error = EnrichmentJob.FAILED, str(error)
+            outcome = 'failed'
+        else:
+            delay = settings.ENRICHMENT_RETRY_SECONDS * 2 ** job.attempts
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+            job.last_error = str(error)
+            outcome = 'retry'
+        if outcome != 'enriched':
+            job.attempts += 1
+            job.locked_until = None
+            job.save(update_fields=['status', 'attempts', 'run_after', 'locked_until', 'last_error'])
+    prometheus.ENRICHMENT_JOBS.labels(outcome).inc()
+    if outcome in ('not_found', 'failed'):
+        logger.warning("Could not enrich movie %s: %s", job.movie.imdb_id, job.last_error)
+
+
+def pending_count():
+    return EnrichmentJob.objects.filter(status=EnrichmentJob.PENDING).count()
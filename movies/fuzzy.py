@@ -0,0 +1,184 @@
+"""
+Typo-tolerant title matching over the local movie catalog.
+
+On PostgreSQL this is pg_trgm word similarity backed by a GIN trigram index
+on movies.title (migration 0006). Other databases (SQLite in development)
+use an in-process trigram index over the titles, kept current by the Movie
+signals and reloaded every FUZZY_INDEX_REFRESH_SECONDS so movies created by
+other processes show up too.
+
+Both score a title with pg_trgm's word similarity - how well the query's
+trigrams match the best stretch of the title, from 0 to 1 - so "shawshenk"
+finds "The Shawshank Redemption" and "inter" finds "Interstellar".
+"""
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from .models import Movie
+
+_WORD = re.compile(r'\w+')
+
+
+def _ordered_trigrams(text):
+    """pg_trgm-style trigrams in order: each lower-cased word padded with two spaces in front, one behind"""
+    grams = []
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigrams(text):
+    return set(_ordered_trigrams(text))
+
+
+def word_similarity(query, title):
+    """
+    pg_trgm's word_similarity(): the best trigram similarity between the
+    query and any contiguous extent of the title's trigrams
+    """
+    wanted = trigrams(query)
+    if not wanted:
+        return 0.0
+    grams = _ordered_trigrams(title)
+    best = 0.0
+    for start, gram in enumerate(grams):
+        if gram not in wanted:
+            continue
+        extent = set()
+        for gram in grams[start:]:
+            extent.add(gram)
+            if gram in wanted:
+                best = max(best, len(wanted & extent) / len(wanted | extent))
+    return best
+
+
+def search(query, limit=10, using=None):
+    """Catalog movies whose title resembles ``query``, best first, with a ``similarity`` attribute"""
+    query = query.strip()
+    if not query:
+        return []
+    using = using or router.db_for_read(Movie)
+    if connections[using].vendor == 'postgresql':
+        return _search_postgres(query, limit, using)
+    return _title_index.search(query, limit, using)
+
+
+def _search_postgres(query, limit, using):
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    # `title %> query` can use the GIN index; its cut-off is a session setting.
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(settings.FUZZY_MIN_SIMILARITY)],
+            )
+        return list(
+            Movie.objects.using(using)
+            .filter(TrigramWordSimilar(F('title'), query))
+            .annotate(similarity=TrigramWordSimilarity(query, 'title'))
+            .order_by('-similarity', '-vote_count')[:limit]
+        )
+
+
+class TitleIndex:
+    """In-process trigram -> movie id postings for databases without pg_trgm"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._titles = {}
+        self._postings = defaultdict(set)
+        self._loaded_at = None
+
+    def search(self, query, limit, using):
+        self._ensure_loaded(using)
+        wanted = trigrams(query)
+        with self._lock:
+            # A title can only reach the threshold if it shares at least that
+            # fraction of the query's trigrams, so only those get scored.
+            hits = defaultdict(int)
+            for gram in wanted:
+                for movie_id in self._postings.get(gram, ()):
+                    hits[movie_id] += 1
+            floor = len(wanted) * settings.FUZZY_MIN_SIMILARITY
+            candidates = [(movie_id, self._titles[movie_id]) for movie_id, n in hits.items() if n >= floor]
+
+        scored = sorted(
+            ((word_similarity(query, title), movie_id) for movie_id, title in candidates),
+            reverse=True,
+        )
+        scored = [(score, movie_id) for score, movie_id in scored if score >= settings.FUZZY_MIN_SIMILARITY]
+        scores = dict((movie_id, score) for score, movie_id in scored[:limit])
+        movies = Movie.objects.using(using).in_bulk(list(scores))
+        for movie in movies.values():
+            movie.similarity = scores[movie.pk]
+        return sorted(movies.values(), key=lambda movie: (-movie.similarity, -movie.vote_count))
+
+    def add(self, movie_id, title):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # the first search loads everything anyway
+            self._remove(movie_id)
+            self._titles[movie_id] = title
+            for gram in trigrams(title):
+                self._postings[gram].add(movie_id)
+
+    def discard(self, movie_id):
+        with self._lock:
+            self._remove(movie_id)
+
+    def clear(self):
+        with self._lock:
+            self._titles.clear()
+            self._postings.clear()
+            self._loaded_at = None
+
+    def _remove(self, movie_id):
+        title = self._titles.pop(movie_id, None)
+        if title is not None:
+            for gram in trigrams(title):
+                self._postings[gram].discard(movie_id)
+
+    def _ensure_loaded(self, using):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < settings.FUZZY_INDEX_REFRESH_SECONDS:
+            return
+        rows = Movie.objects.using(using).values_list('pk', 'title').iterator()
+        titles, postings = {}, defaultdict(set)
+        for movie_id, title in rows:
+            titles[movie_id] = title
+            for gram in trigrams(title):
+                postings[gram].add(movie_id)
+        with self._lock:
+            self._titles, self._postings = titles, postings
+            self._loaded_at = time.monotonic()
+
+
+_title_index = TitleIndex()
+
+
+def prime(using=None):
+    """Load the in-process title index now rather than on the first search"""
+    using = using or router.db_for_read(Movie)
+    if connections[using].vendor != 'postgresql':
+        _title_index._ensure_loaded(using)
+
+
+def index_movie(movie):
+    _title_index.add(movie.pk, movie.title)
+
+
+def unindex_movie(movie):
+    _title_index.discard(movie.pk)
+
+
+def clear():
+    _title_index.clear()
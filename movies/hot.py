@@ -0,0 +1,205 @@
+"""
+Per-process read-through cache of hot movies.
+
+Watchlist pages and movie details keep serializing the same few thousand
+popular movies. Instead of querying them and building a Django model
+instance each time, this cache keeps one compact MovieRecord per movie:
+a ``__slots__`` object with the Movie field values, where genres, cast and
+director are tuples of interned strings shared by every record. Records
+carry the same attributes as a Movie, so MovieSerializer and its
+subclasses render them as they are.
+
+The cache is an LRU bounded by MOVIE_CACHE_MAX_BYTES (an estimate of the
+records' heap use) rather than by entry count, as overviews and cast lists
+vary a lot in size. Saving or deleting a Movie drops its record in this
+process; other processes reload theirs after MOVIE_CACHE_TTL_SECONDS.
+Placeholder movies are never kept, so enriched details show up at once.
+MOVIE_CACHE_MAX_BYTES=0 turns caching off, so every lookup reads the
+database.
+"""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from movieshelfapp import metrics as prometheus
+from movieshelfapp.instrumentation import record_cache
+from .models import Movie
+
+FIELDS = tuple(field.attname for field in Movie._meta.concrete_fields)
+# Values that repeat across movies: one shared copy of each string.
+INTERNED = ('genres', 'cast', 'director')
+
+
+class MovieRecord:
+    """Read-only stand-in for a Movie row"""
+
+    __slots__ = FIELDS + ('loaded_at', 'size')
+
+    def __init__(self, values, loaded_at):
+        for name, value in zip(FIELDS, values):
+            if name in INTERNED and value:
+                value = sys.intern(value) if isinstance(value, str) else tuple(sys.intern(str(v)) for v in value)
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, 'loaded_at', loaded_at)
+        object.__setattr__(self, 'size', self._estimate_size())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('MovieRecord is read-only')
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f"<MovieRecord {self.id}: {self.title}>"
+
+    def _estimate_size(self):
+        # Interned strings are shared between records; only the tuples holding them are counted.
+        size = sys.getsizeof(self)
+        for name in FIELDS:
+            value = getattr(self, name)
+            if name in INTERNED:
+                size += sys.getsizeof(value) if isinstance(value, tuple) else 0
+            elif value is not None and not isinstance(value, bool):
+                size += sys.getsizeof(value)
+        return size
+
+
+class HotMovieCache:
+    """Thread-safe LRU of movie PK -> MovieRecord under a byte budget"""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._records = OrderedDict()
+        self._generation = 0
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, pk):
+        """The record of movie ``pk``, or None if there is no such movie"""
+        return self.get_many([pk]).get(pk)
+
+    def get_many(self, pks):
+        """Records of the movies in ``pks`` that exist, by PK; one query for all misses"""
+        pks, found, now = list(pks), {}, time.monotonic()
+        with self._lock:
+            generation = self._generation
+            for pk in pks:
+                record = self._records.get(pk)
+                if record is not None and now - record.loaded_at < self.ttl:
+                    self._records.move_to_end(pk)
+                    found[pk] = record
+            missing = {pk for pk in pks if pk not in found}
+            self.hits += len(found)
+            self.misses += len(missing)
+        for pk in pks:
+            record_cache(pk in found, cache='hot_movie')
+        if missing:
+            loaded = [
+                MovieRecord(values, now)
+                for values in Movie.objects.filter(pk__in=missing).order_by().values_list(*FIELDS)
+            ]
+            self._store(loaded, generation)
+            found.update((record.id, record) for record in loaded)
+        return found
+
+    def _store(self, records, generation):
+        if not self.max_bytes:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return  # a movie was saved meanwhile; these rows may predate it
+            for record in records:
+                # Placeholders are filled in by the enrichment worker, which cannot invalidate them here.
+                if record.is_placeholder or record.size > self.max_bytes:
+                    continue
+                previous = self._records.pop(record.id, None)
+                if previous is not None:
+                    self.bytes -= previous.size
+                self._records[record.id] = record
+                self.bytes += record.size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._records.popitem(last=False)
+                self.bytes -= evicted.size
+                self.evictions += 1
+            prometheus.HOT_MOVIE_CACHE_BYTES.set(self.bytes)
+
+    def invalidate(self, pk):
+        with self._lock:
+            self._generation += 1
+            record = self._records.pop(pk, None)
+            if record is not None:
+                self.bytes -= record.size
+                prometheus.HOT_MOVIE_CACHE_BYTES.set(self.bytes)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._records.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+            prometheus.HOT_MOVIE_CACHE_BYTES.set(0)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._records),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HotMovieCache(settings.MOVIE_CACHE_MAX_BYTES, settings.MOVIE_CACHE_TTL_SECONDS)
+        return _cache
+
+
+@receiver(setting_changed)
+def reset_cache(setting=None, **kwargs):
+    """Start over with an empty cache built from settings"""
+    global _cache
+    if setting not in (None, 'MOVIE_CACHE_MAX_BYTES', 'MOVIE_CACHE_TTL_SECONDS'):
+        return
+    with _cache_lock:
+        _cache = None
+    prometheus.HOT_MOVIE_CACHE_BYTES.set(0)
+
+
+def get(pk):
+    return get_cache().get(pk)
+
+
+def get_many(pks):
+    return get_cache().get_many(pks)
+
+
+def invalidate(pk):
+    get_cache().invalidate(pk)
+
+
+def clear():
+    """Drop every record and reset the stats, e.g. between tests that reuse primary keys"""
+    get_cache().clear()
+
+
+def stats():
+    return get_cache().stats()
@@ -0,0 +1,175 @@
+"""
+Canonical external IDs and the Movie identity map.
+
+A movie is identified by its IMDb ID (``imdb`` provider, stored normalized
+in Movie.imdb_id) or its TMDb ID (``tmdb``, Movie.tmdb_id); both columns are
+unique. Movies created from OMDb also store their IMDb ID in tmdb_id, which
+cannot be null.
+
+resolve() maps an external ID to a movie PK. Hits are remembered for the
+whole process (a movie's PK never changes; deleted movies are forgotten via
+a post_delete signal and stale entries from other processes are dropped on
+first use), and full Movie rows for the duration of the current request, so
+a request that looks up the same movie several times queries it once.
+"""
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import IntegrityError, transaction
+
+from movieshelfapp.instrumentation import record_cache
+from .models import Movie, normalize_imdb_id
+
+PROVIDER_FIELDS = {'imdb': 'imdb_id', 'tmdb': 'tmdb_id'}
+PROCESS_MAP_SIZE = 10000
+
+_MISSING = object()
+_request_map = ContextVar('movie_identity_map', default=None)
+
+
+def canonical_id(provider, external_id):
+    if provider == 'imdb':
+        return normalize_imdb_id(external_id)
+    return str(external_id).strip() or None
+
+
+class _ProcessMap:
+    """Bounded, thread-safe LRU of (provider, external id) -> movie PK"""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._pks = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            pk = self._pks.get(key)
+            if pk is not None:
+                self._pks.move_to_end(key)
+            return pk
+
+    def set(self, key, pk):
+        with self._lock:
+            self._pks[key] = pk
+            self._pks.move_to_end(key)
+            while len(self._pks) > self.size:
+                self._pks.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._pks.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._pks.clear()
+
+
+_process_map = _ProcessMap(PROCESS_MAP_SIZE)
+
+
+def clear():
+    """Drop every remembered ID, e.g. between tests that reuse primary keys"""
+    _process_map.clear()
+
+
+@contextmanager
+def request_scope():
+    """Share Movie rows between lookups until the block exits (one request)"""
+    token = _request_map.set({})
+    try:
+        yield
+    finally:
+        _request_map.reset(token)
+
+
+def _keys(movie):
+    for provider, field in PROVIDER_FIELDS.items():
+        external_id = getattr(movie, field)
+        if external_id:
+            yield provider, canonical_id(provider, external_id)
+
+
+def remember(movie):
+    requested = _request_map.get()
+    for key in _keys(movie):
+        _process_map.set(key, movie.pk)
+        if requested is not None:
+            requested[key] = movie
+
+
+def forget(movie):
+    requested = _request_map.get()
+    for key in _keys(movie):
+        _process_map.discard(key)
+        if requested is not None:
+            requested.pop(key, None)
+
+
+def resolve(provider, external_id):
+    """PK of the movie with this external ID, or None"""
+    key = (provider, canonical_id(provider, external_id))
+    requested = _request_map.get()
+    if requested is not None and key in requested:
+        movie = requested[key]
+        return None if movie is _MISSING else movie.pk
+    pk = _process_map.get(key)
+    if pk is not None:
+        record_cache(True, cache='movie_identity')
+        return pk
+    record_cache(False, cache='movie_identity')
+    pk = Movie.objects.filter(**{PROVIDER_FIELDS[provider]: key[1]}).values_list('pk', flat=True).first()
+    if pk is None:
+        if requested is not None:
+            requested[key] = _MISSING
+    else:
+        _process_map.set(key, pk)
+    return pk
+
+
+def get_movie(provider, external_id):
+    """The movie with this external ID, or None; queried at most once per request"""
+    key = (provider, canonical_id(provider, external_id))
+    requested = _request_map.get()
+    if requested is not None and key in requested:
+        movie = requested[key]
+        return None if movie is _MISSING else movie
+
+    field = PROVIDER_FIELDS[provider]
+    movie = None
+    pk = _process_map.get(key)
+    if pk is not None:
+        movie = Movie.objects.filter(pk=pk).first()
+        if movie is None or canonical_id(provider, getattr(movie, field)) != key[1]:
+            # Deleted or merged away by another process.
+            _process_map.discard(key)
+            movie = None
+    if movie is None:
+        movie = Movie.objects.filter(**{field: key[1]}).first()
+
+    if movie is None:
+        if requested is not None:
+            requested[key] = _MISSING
+        return None
+    remember(movie)
+    return movie
+
+
+def create_movie(**fields):
+    """
+    Create a movie, or return the existing one if a concurrent request
+    created it first (the external ID columns are unique).
+    """
+    try:
+        with transaction.atomic():
+            movie = Movie.objects.create(**fields)
+    except IntegrityError:
+        # This request has likely cached the movie as missing; look again.
+        forget(Movie(**fields))
+        movie = get_movie('imdb', fields['imdb_id']) if fields.get('imdb_id') else None
+        if movie is None:
+            raise
+        return movie
+    remember(movie)
+    return movie
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from movies import enrichment
+
+
+class Command(BaseCommand):
+    help = 'Fetch the details of placeholder movies queued by add-from-omdb'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.ENRICHMENT_BATCH_SIZE)
+        parser.add_argument(
+            '--poll-seconds', type=float, default=5,
+            help='How long to wait before looking again when no job is due'
+        )
+        parser.add_argument('--once', action='store_true', help='Work off the due jobs, then exit')
+
+    def handle(self, *args, **options):
+        total = 0
+        try:
+            while True:
+                close_old_connections()
+                handled = enrichment.run_batch(options['batch_size'])
+                total += handled
+                if handled:
+                    self.stdout.write(f"Handled {handled} jobs, {enrichment.pending_count()} pending")
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['poll_seconds'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(f"Handled {total} enrichment jobs")
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_movie_imdb_id_alter_movie_tmdb_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieStats',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='movies.movie')),
+                ('shelved_count', models.IntegerField(default=0)),
+                ('watched_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'movie_stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingMovie',
+            fields=[
+                ('rank', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+            ],
+            options={
+                'db_table': 'trending_movies',
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('shelvings', models.IntegerField(default=0)),
+                ('watches', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+            ],
+            options={
+                'db_table': 'movie_activity',
+                'indexes': [models.Index(fields=['bucket'], name='movie_activity_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('movie', 'bucket'), name='movie_activity_movie_bucket_uniq')],
+            },
+        ),
+    ]
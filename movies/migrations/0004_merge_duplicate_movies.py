@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:52
+
+import re
+
+from django.db import migrations
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+IMDB_ID = re.compile(r'^tt\d+$')
+
+# Filled in on the surviving movie when it lacks a value a duplicate has.
+MERGED_FIELDS = ('overview', 'poster_path', 'backdrop_path', 'runtime', 'release_date', 'director')
+
+
+def normalize(value):
+    value = (value or '').strip().lower()
+    return value or None
+
+
+def merge_duplicate_movies(apps, schema_editor):
+    """
+    Store every IMDb ID in its canonical form (movies created from OMDb
+    only had it in tmdb_id at first), then fold movies sharing an IMDb ID
+    into the oldest one so the unique constraint can be added.
+    """
+    Movie = apps.get_model('movies', 'Movie')
+    MovieStats = apps.get_model('movies', 'MovieStats')
+    WatchlistItem = apps.get_model('watchlist', 'WatchlistItem')
+    WatchlistDeletion = apps.get_model('watchlist', 'WatchlistDeletion')
+
+    for pk, tmdb_id, imdb_id in Movie.objects.values_list('pk', 'tmdb_id', 'imdb_id').iterator():
+        canonical = normalize(imdb_id)
+        if canonical is None and IMDB_ID.match(normalize(tmdb_id) or ''):
+            canonical = normalize(tmdb_id)
+        if canonical != imdb_id:
+            Movie.objects.filter(pk=pk).update(imdb_id=canonical)
+
+    duplicated = (
+        Movie.objects.filter(imdb_id__isnull=False)
+        .values('imdb_id')
+        .annotate(copies=Count('id'), survivor=Min('id'))
+        .filter(copies__gt=1)
+    )
+    survivors = []
+    now = timezone.now()
+    for group in duplicated:
+        survivor = Movie.objects.get(pk=group['survivor'])
+        duplicates = list(Movie.objects.filter(imdb_id=group['imdb_id']).exclude(pk=survivor.pk).order_by('pk'))
+        for duplicate in duplicates:
+            for field in MERGED_FIELDS:
+                if not getattr(survivor, field) and getattr(duplicate, field):
+                    setattr(survivor, field, getattr(duplicate, field))
+
+            kept = {item.user_id: item for item in WatchlistItem.objects.filter(movie=survivor)}
+            for item in WatchlistItem.objects.filter(movie=duplicate):
+                existing = kept.get(item.user_id)
+                if existing is None:
+                    item.movie = survivor
+                    item.updated_at = now
+                    item.save(update_fields=['movie', 'updated_at'])
+                    kept[item.user_id] = item
+                    continue
+                # The user shelved both copies: keep one item with what they recorded.
+                if item.is_watched and not existing.is_watched:
+                    existing.is_watched, existing.watched_at = True, item.watched_at
+                existing.rating = existing.rating or item.rating
+                existing.note = existing.note or item.note
+                existing.updated_at = now
+                existing.save(update_fields=['is_watched', 'watched_at', 'rating', 'note', 'updated_at'])
+                WatchlistDeletion.objects.create(item_id=item.pk, user_id=item.user_id)
+                item.delete()
+            duplicate.delete()
+        survivor.save()
+        survivors.append(survivor.pk)
+
+    # The duplicates' counters went with them; recount the merged movies.
+    MovieStats.objects.filter(movie_id__in=survivors).delete()
+    totals = WatchlistItem.objects.filter(movie_id__in=survivors).values('movie_id').annotate(
+        shelved=Count('id'),
+        watched=Count('id', filter=Q(is_watched=True)),
+        rating_total=Sum('rating'),
+        rated=Count('rating'),
+    )
+    MovieStats.objects.bulk_create(
+        MovieStats(
+            movie_id=row['movie_id'],
+            shelved_count=row['shelved'],
+            watched_count=row['watched'],
+            rating_sum=row['rating_total'] or 0,
+            rating_count=row['rated'],
+        )
+        for row in totals
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_movie_popularity'),
+        ('watchlist', '0003_backfill_movie_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_movies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Separate from 0004 so the data changes commit before the table is
+    # altered (PostgreSQL refuses ALTER TABLE with pending trigger events).
+
+    dependencies = [
+        ('movies', '0004_merge_duplicate_movies'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movie',
+            name='imdb_id',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='movie',
+            constraint=models.UniqueConstraint(condition=models.Q(('imdb_id__isnull', False)), fields=('imdb_id',), name='movies_imdb_id_uniq'),
+        ),
+    ]
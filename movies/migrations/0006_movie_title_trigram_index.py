@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from movieshelfapp.migration_helpers import run_on_postgresql
+
+# pg_trgm index for typo-tolerant title search (movies/fuzzy.py). Other
+# databases search an in-process index instead, so this is PostgreSQL only.
+# Built concurrently so the table stays writable.
+CREATE_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS movies_title_trgm_idx ON movies USING gin (title gin_trgm_ops)',
+]
+DROP_INDEX = ['DROP INDEX CONCURRENTLY IF EXISTS movies_title_trgm_idx']
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('movies', '0005_movie_imdb_id_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_INDEX), run_on_postgresql(DROP_INDEX)),
+    ]
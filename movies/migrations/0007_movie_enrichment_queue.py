@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_movie_title_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='is_placeholder',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='EnrichmentJob',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='enrichment_job', serialize=False, to='movies.movie')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('run_after', models.DateTimeField()),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'movie_enrichment_jobs',
+                'indexes': [models.Index(fields=['status', 'run_after'], name='enrichment_status_run_idx')],
+            },
+        ),
+    ]
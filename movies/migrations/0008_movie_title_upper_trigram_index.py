@@ -0,0 +1,25 @@
+from django.db import migrations
+
+from movieshelfapp.migration_helpers import run_on_postgresql
+
+# Trigram index for the admin's title search (icontains, which compares
+# UPPER(title) on PostgreSQL); movies_title_trgm_idx from 0006 serves the
+# case-insensitive pg_trgm operators of movies/fuzzy.py instead. Built
+# concurrently so the table stays writable; PostgreSQL only.
+CREATE_INDEX = [
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS movies_title_upper_trgm_idx '
+    'ON movies USING gin ((UPPER(title::text)) gin_trgm_ops)',
+]
+DROP_INDEX = ['DROP INDEX CONCURRENTLY IF EXISTS movies_title_upper_trgm_idx']
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('movies', '0007_movie_enrichment_queue'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_INDEX), run_on_postgresql(DROP_INDEX)),
+    ]
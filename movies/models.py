@@ -1,10 +1,18 @@
 
 from django.db import models
 
+
+def normalize_imdb_id(value):
+    """Canonical form of an IMDb ID (``tt`` + digits, lower case); None for blanks"""
+    value = (value or '').strip().lower()
+    return value or None
+
+
 class Movie(models.Model):
     # Change tmdb_id to CharField to handle both TMDb and IMDb IDs
     tmdb_id = models.CharField(max_length=50, unique=True)
-    imdb_id = models.CharField(max_length=20, blank=True, null=True, db_index=True)
+    # Canonical IMDb ID, see movies/identity.py; unique when set.
+    imdb_id = models.CharField(max_length=20, blank=True, null=True)
     title = models.CharField(max_length=255)
     overview = models.TextField(blank=True)
     release_date = models.DateField(null=True, blank=True)
@@ -16,12 +24,102 @@ class Movie(models.Model):
     genres = models.JSONField(default=list, blank=True)
     director = models.CharField(max_length=255, blank=True)
     cast = models.JSONField(default=list, blank=True)
+    # Created by add-from-omdb ahead of its details, see movies/enrichment.py.
+    is_placeholder = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.imdb_id = normalize_imdb_id(self.imdb_id)
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'movies'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['imdb_id'], condition=models.Q(imdb_id__isnull=False), name='movies_imdb_id_uniq'
+            ),
+        ]
+
+
+class MovieStats(models.Model):
+    """Denormalized watchlist counters, kept up to date by watchlist writes"""
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    shelved_count = models.IntegerField(default=0)
+    watched_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'movie_stats'
+
+    def __str__(self):
+        return f"{self.movie_id}: {self.shelved_count} shelved"
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+
+class MovieActivity(models.Model):
+    """Hourly shelving and watch counts per movie, the input of the trending score"""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    bucket = models.DateTimeField()
+    shelvings = models.IntegerField(default=0)
+    watches = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'movie_activity'
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'bucket'], name='movie_activity_movie_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='movie_activity_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} @ {self.bucket:%Y-%m-%d %H:00}"
+
+
+class TrendingMovie(models.Model):
+    """Precomputed trending ranking, rebuilt by the refresh_trending command"""
+    rank = models.PositiveIntegerField(primary_key=True)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'trending_movies'
+        ordering = ['rank']
+
+    def __str__(self):
+        return f"#{self.rank} {self.movie_id}"
+
+
+class EnrichmentJob(models.Model):
+    """Pending fetch of a placeholder movie's details, run by the enrich_movies command"""
+    PENDING = 'pending'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (FAILED, 'Failed')]
+
+    # One job per movie: enqueueing a movie twice is a no-op.
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='enrichment_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'movie_enrichment_jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='enrichment_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id}: {self.status} ({self.attempts} attempts)"
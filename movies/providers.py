@@ -0,0 +1,583 @@
+"""
+Movie provider chain.
+
+Search, detail and materialization (turning an IMDb ID into a Movie row)
+ask an ordered list of providers, MOVIE_PROVIDERS, and take the first
+answer:
+
+    catalog  Movie rows already in our database (detail only)
+    cache    upstream answers kept in the Django cache
+    dataset  a local dump file (MOVIE_DATASET_PATH), held in memory
+    omdb     the OMDb API (needs OMDB_API_KEY)
+    tmdb     the TMDB API (needs TMDB_API_KEY; detail only, as its search
+             results carry no IMDb IDs)
+
+Everything travels in OMDb's JSON shape, which is what the API has always
+returned. A provider answers None when it does not know; an upstream
+provider can also answer with an error ("Movie not found!", "Too many
+results.", ...), which ends the search. Failures of one upstream (no
+connection, an HTTP error, a body that is not OMDb JSON) fall through to
+the next, and are raised only if nobody answered. Answers from upstream
+providers, errors included, are written back to the cache.
+
+Search queries are normalized first (Unicode NFKC, lower case, runs of
+whitespace collapsed), so "Batman " and "BATMAN" share a cache entry.
+Identical lookups that arrive while one is in flight wait for it and share
+its answer rather than asking upstream again.
+
+Each hop is timed (Server-Timing ``provider-<name>`` and the
+movieshelf_provider_lookup_seconds histogram), so an air-gapped or test
+deployment can run on MOVIE_PROVIDERS=catalog,dataset alone and see that
+nothing left the process.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from movieshelfapp import metrics as prometheus
+from movieshelfapp.instrumentation import provider_hop, record_cache, record_movie_lookup
+from . import hot, identity
+from .models import Movie, normalize_imdb_id
+from .services import OMDBService, TMDBService
+from .signals import movie_enriched
+
+logger = logging.getLogger(__name__)
+
+RESULTS_PER_PAGE = 10
+MAX_PAGE = 100  # OMDb refuses pages beyond this
+NOT_FOUND = OMDBService.NOT_FOUND
+
+_WORD = re.compile(r'\w+')
+
+
+class ProviderError(Exception):
+    """An upstream answered with something other than a movie or an error message"""
+
+
+class MovieNotFound(Exception):
+    pass
+
+
+def not_found():
+    return {'Response': 'False', 'Error': NOT_FOUND}
+
+
+def is_found(payload):
+    return payload.get('Response') == 'True'
+
+
+def total_pages(payload):
+    try:
+        total = int(payload.get('totalResults', 0))
+    except (TypeError, ValueError):
+        return 0
+    return min(-(-total // RESULTS_PER_PAGE), MAX_PAGE)
+
+
+def normalize_query(query):
+    """The form of a search query that is cached and sent upstream"""
+    query = unicodedata.normalize('NFKC', query)
+    query = ''.join(char for char in query if char.isspace() or not unicodedata.category(char).startswith('C'))
+    return ' '.join(query.lower().split())
+
+
+def search_result(record):
+    """The short form of a detail record that search pages list"""
+    return {key: record.get(key, 'N/A') for key in ('Title', 'Year', 'imdbID', 'Type', 'Poster')}
+
+
+class MovieProvider:
+    name = None
+    # Upstream answers are cached and worth prefetching.
+    upstream = False
+
+    def available(self):
+        return True
+
+    def search(self, query, page, operation='search'):
+        return None
+
+    def detail(self, imdb_id, operation='detail'):
+        return None
+
+
+class CatalogProvider(MovieProvider):
+    name = 'catalog'
+
+    def detail(self, imdb_id, operation='detail'):
+        # Popular movies come from the hot movie cache without a query.
+        pk = identity.resolve('imdb', imdb_id)
+        movie = hot.get(pk) if pk is not None else None
+        if movie is None or movie.imdb_id != normalize_imdb_id(imdb_id):
+            movie = identity.get_movie('imdb', imdb_id)  # merged or deleted meanwhile
+        if movie is None or movie.is_placeholder:
+            return None
+        return movie_record(movie)
+
+
+class CacheProvider(MovieProvider):
+    name = 'cache'
+
+    def search(self, query, page, operation='search'):
+        return self._get(self.search_key(query, page), 'omdb_search')
+
+    def detail(self, imdb_id, operation='detail'):
+        return self._get(self.detail_key(imdb_id), 'omdb_detail')
+
+    def store(self, key, payload, timeout):
+        cache.set(key, payload, timeout=timeout)
+
+    @staticmethod
+    def search_key(query, page):
+        digest = hashlib.sha1(normalize_query(query).encode()).hexdigest()
+        return f"movies:search:{digest}:{page}"
+
+    @staticmethod
+    def detail_key(imdb_id):
+        return f"movies:detail:{normalize_imdb_id(imdb_id)}"
+
+    @staticmethod
+    def _get(key, name):
+        # Metric labels predate the chain; the cache now holds every upstream.
+        payload = cache.get(key)
+        record_cache(payload is not None, cache=name)
+        return payload
+
+
+class DatasetProvider(MovieProvider):
+    """
+    Serves a dump of OMDb detail records from memory: JSON Lines, or one
+    JSON array, optionally gzipped (``.gz``). Titles are matched on whole
+    words, like OMDb's search. The file is read once per process, on first
+    use or by the pre-fork warm-up.
+    """
+    name = 'dataset'
+
+    def __init__(self, path=None):
+        self.path = path or settings.MOVIE_DATASET_PATH
+        self._lock = threading.Lock()
+        self._records = None
+        self._words = None
+
+    def available(self):
+        return bool(self.path)
+
+    def search(self, query, page, operation='search'):
+        records, words = self.load()
+        terms = set(_WORD.findall(query.lower()))
+        if not terms:
+            return None
+        matches = set.intersection(*(words.get(term, set()) for term in terms))
+        if not matches:
+            return None
+        ranked = sorted(matches, key=lambda imdb_id: (-_votes(records[imdb_id]), imdb_id))
+        start = (page - 1) * RESULTS_PER_PAGE
+        return {
+            'Search': [search_result(records[imdb_id]) for imdb_id in ranked[start:start + RESULTS_PER_PAGE]],
+            'totalResults': str(len(ranked)),
+            'Response': 'True',
+        }
+
+    def detail(self, imdb_id, operation='detail'):
+        records, _ = self.load()
+        return records.get(normalize_imdb_id(imdb_id))
+
+    def load(self):
+        with self._lock:
+            if self._records is None:
+                self._records, self._words = self._read()
+            return self._records, self._words
+
+    def _read(self):
+        opener = gzip.open if self.path.endswith('.gz') else open
+        with opener(self.path, 'rt', encoding='utf-8') as fh:
+            first = fh.read(1)
+            fh.seek(0)
+            rows = json.load(fh) if first == '[' else (json.loads(line) for line in fh if line.strip())
+            records, words = {}, {}
+            for row in rows:
+                imdb_id = normalize_imdb_id(row.get('imdbID'))
+                if not imdb_id:
+                    continue
+                records[imdb_id] = {**row, 'imdbID': imdb_id, 'Response': 'True'}
+                for word in set(_WORD.findall(row.get('Title', '').lower())):
+                    words.setdefault(word, set()).add(imdb_id)
+        logger.info("Loaded %d movies from %s", len(records), self.path)
+        return records, words
+
+
+class OMDbProvider(MovieProvider):
+    name = 'omdb'
+    upstream = True
+
+    def available(self):
+        return bool(settings.OMDB_API_KEY)
+
+    def search(self, query, page, operation='search'):
+        return self._checked(OMDBService.search(query, page, operation))
+
+    def detail(self, imdb_id, operation='detail'):
+        return self._checked(OMDBService.get_details(imdb_id, operation))
+
+    @staticmethod
+    def _checked(payload):
+        # Quota and key errors come with a 401, which raise_for_status has raised already.
+        if not isinstance(payload, dict) or payload.get('Response') not in ('True', 'False'):
+            raise ProviderError('OMDb: malformed response')
+        return payload
+
+
+class TMDbProvider(MovieProvider):
+    name = 'tmdb'
+    upstream = True
+    POSTER_URL = 'https://image.tmdb.org/t/p/w500'
+
+    def available(self):
+        return bool(settings.TMDB_API_KEY)
+
+    def detail(self, imdb_id, operation='detail'):
+        data = TMDBService.find_by_imdb_id(imdb_id, operation)
+        if data is None:
+            return not_found()
+        released = data.get('release_date') or ''
+        credits = data.get('credits', {})
+        directors = [person['name'] for person in credits.get('crew', []) if person.get('job') == 'Director']
+        return {
+            'Title': data.get('title', ''),
+            'Year': released[:4] or 'N/A',
+            'Released': _reformat_date(released, '%Y-%m-%d', '%d %b %Y'),
+            'Runtime': f"{data['runtime']} min" if data.get('runtime') else 'N/A',
+            'Genre': ', '.join(genre['name'] for genre in data.get('genres', [])) or 'N/A',
+            'Director': ', '.join(directors) or 'N/A',
+            'Actors': ', '.join(actor['name'] for actor in credits.get('cast', [])[:10]) or 'N/A',
+            'Plot': data.get('overview') or 'N/A',
+            'Poster': f"{self.POSTER_URL}{data['poster_path']}" if data.get('poster_path') else 'N/A',
+            'imdbRating': str(data.get('vote_average', 'N/A')),
+            'imdbVotes': str(data.get('vote_count', 'N/A')),
+            'imdbID': normalize_imdb_id(imdb_id),
+            'Type': 'movie',
+            'Response': 'True',
+        }
+
+
+class _Flight:
+    """A lookup in progress, and its outcome for the callers waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload = None
+        self.error = None
+
+
+PROVIDERS = {
+    'catalog': CatalogProvider,
+    'cache': CacheProvider,
+    'dataset': DatasetProvider,
+    'omdb': OMDbProvider,
+    'tmdb': TMDbProvider,
+}
+
+
+class ProviderChain:
+    def __init__(self, providers):
+        self.providers = providers
+        self.cache = next((p for p in providers if isinstance(p, CacheProvider)), None)
+        self._prefetch_lock = threading.Lock()
+        self._prefetching = set()
+        self._prefetch_pool = None
+        self._flights_lock = threading.Lock()
+        self._flights = {}
+
+    def without(self, *names):
+        """A chain of the same providers minus ``names``, sharing their state and lookups in flight"""
+        chain = ProviderChain([provider for provider in self.providers if provider.name not in names])
+        chain._flights_lock, chain._flights = self._flights_lock, self._flights
+        return chain
+
+    def search(self, query, page=1, operation='search'):
+        query = normalize_query(query)
+        key = CacheProvider.search_key(query, page)
+        return self._ask('search', (query, page), operation, key, settings.OMDB_SEARCH_CACHE_SECONDS)
+
+    def detail(self, imdb_id, operation='detail'):
+        key = CacheProvider.detail_key(imdb_id)
+        return self._ask('detail', (imdb_id,), operation, key, settings.OMDB_DETAIL_CACHE_SECONDS)
+
+    def _ask(self, method, args, operation, cache_key, timeout):
+        with self._flights_lock:
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[cache_key] = _Flight()
+        prometheus.CACHE_LOOKUPS.labels('provider_in_flight', 'miss' if leader else 'hit').inc()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.payload
+        try:
+            flight.payload = self._walk(method, args, operation, cache_key, timeout)
+            return flight.payload
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[cache_key]
+            flight.done.set()
+
+    def _walk(self, method, args, operation, cache_key, timeout):
+        error = None
+        for provider in self.providers:
+            if not provider.available():
+                continue
+            with provider_hop(provider.name, operation) as hop:
+                try:
+                    payload = getattr(provider, method)(*args, operation=operation)
+                except (requests.RequestException, ProviderError) as exc:
+                    hop.outcome = 'error'
+                    error = exc
+                    continue
+                if payload is None:
+                    continue
+                hop.outcome = 'hit'
+            if provider.upstream and self.cache is not None:
+                if not is_found(payload):
+                    timeout = settings.OMDB_NOT_FOUND_CACHE_SECONDS
+                self.cache.store(cache_key, payload, timeout)
+            return payload
+        if error is not None:
+            raise error
+        return not_found()
+
+    def prefetch(self, query, page, payload):
+        """Warm the cache for page + 1 and the top results of ``payload`` in the background"""
+        if not settings.OMDB_PREFETCH or self.cache is None:
+            return
+        # Prefetch threads stay off the database; only upstream answers are worth caching anyway.
+        chain = self.without('catalog')
+        if page < total_pages(payload):
+            self._schedule(CacheProvider.search_key(query, page + 1), chain.search, query, page + 1, 'search_prefetch')
+        for movie in payload.get('Search', [])[:settings.OMDB_PREFETCH_DETAILS]:
+            imdb_id = movie.get('imdbID')
+            if imdb_id:
+                self._schedule(CacheProvider.detail_key(imdb_id), chain.detail, imdb_id, 'detail_prefetch')
+
+    def _schedule(self, key, fetch, *args):
+        with self._prefetch_lock:
+            # Skip what is cached, already queued, or beyond the backlog limit.
+            if key in self._prefetching or len(self._prefetching) >= settings.OMDB_PREFETCH_MAX_PENDING:
+                return
+            if cache.get(key) is not None:
+                return
+            self._prefetching.add(key)
+            if self._prefetch_pool is None:
+                self._prefetch_pool = ThreadPoolExecutor(
+                    max_workers=settings.OMDB_PREFETCH_WORKERS, thread_name_prefix='movie-prefetch'
+                )
+        self._prefetch_pool.submit(self._run_prefetch, key, fetch, *args)
+
+    def _run_prefetch(self, key, fetch, *args):
+        try:
+            fetch(*args)
+        except (requests.RequestException, ProviderError):
+            pass  # a prefetch is only an optimisation; the real request retries
+        finally:
+            with self._prefetch_lock:
+                self._prefetching.discard(key)
+
+
+_chain = None
+_chain_lock = threading.Lock()
+
+
+def get_chain():
+    global _chain
+    with _chain_lock:
+        if _chain is None:
+            _chain = ProviderChain([
+                (import_string(name) if '.' in name else PROVIDERS[name])()
+                for name in settings.MOVIE_PROVIDERS
+            ])
+        return _chain
+
+
+@receiver(setting_changed)
+def reset_chain(setting=None, **kwargs):
+    """Rebuild the chain from settings on next use"""
+    global _chain
+    if setting not in (None, 'MOVIE_PROVIDERS', 'MOVIE_DATASET_PATH'):
+        return
+    with _chain_lock:
+        _chain = None
+
+
+def prime():
+    """Load the dataset dump now; called before forking workers"""
+    for provider in get_chain().providers:
+        if isinstance(provider, DatasetProvider) and provider.available():
+            provider.load()
+
+
+def materialize(imdb_id, source):
+    """
+    The Movie for an IMDb ID, created from the provider chain if it is not
+    in the catalog yet (or filled in, if it is a placeholder). Returns
+    (movie, created); raises MovieNotFound. ``source`` labels the lookup
+    metric; pass None if the caller has counted the lookup already.
+    """
+    movie = identity.get_movie('imdb', imdb_id)
+    if source is not None:
+        record_movie_lookup(source, found=movie is not None and not movie.is_placeholder)
+    if movie is not None and not movie.is_placeholder:
+        return movie, False
+    record = get_chain().detail(imdb_id)
+    if not is_found(record):
+        raise MovieNotFound(record.get('Error', NOT_FOUND))
+    if movie is not None:
+        fill(movie, record)
+        return movie, False
+    return identity.create_movie(**movie_fields(record)), True
+
+
+def materialize_many(imdb_ids, source):
+    """
+    Movies for several IMDb IDs: one IN query against the catalog, then the
+    missing ones (and placeholders) fetched from the rest of the chain,
+    MOVIE_BATCH_CONCURRENCY at a time, and saved. Returns ({imdb_id: movie},
+    {imdb_id: error}); IDs no provider knows appear in neither.
+    """
+    imdb_ids = list(dict.fromkeys(filter(None, map(normalize_imdb_id, imdb_ids))))
+    movies = {movie.imdb_id: movie for movie in Movie.objects.filter(imdb_id__in=imdb_ids)}
+    for movie in movies.values():
+        identity.remember(movie)
+    missing = [imdb_id for imdb_id in imdb_ids if imdb_id not in movies or movies[imdb_id].is_placeholder]
+    for imdb_id in imdb_ids:
+        record_movie_lookup(source, found=imdb_id not in missing)
+
+    errors = {}
+    if missing:
+        # Threads stay off the database; the catalog was asked above.
+        chain = get_chain().without('catalog')
+
+        def fetch(imdb_id):
+            try:
+                return chain.detail(imdb_id), None
+            except (requests.RequestException, ProviderError) as exc:
+                return None, exc
+
+        with ThreadPoolExecutor(max_workers=min(settings.MOVIE_BATCH_CONCURRENCY, len(missing))) as pool:
+            results = list(pool.map(fetch, missing))
+        for imdb_id, (record, error) in zip(missing, results):
+            if error is not None:
+                errors[imdb_id] = error
+            elif is_found(record):
+                if imdb_id in movies:
+                    fill(movies[imdb_id], record)
+                else:
+                    movies[imdb_id] = identity.create_movie(**movie_fields(record))
+            elif imdb_id in movies:
+                del movies[imdb_id]  # a placeholder nobody knows
+    return movies, errors
+
+
+def fill(movie, record):
+    """Replace a placeholder's fields with a provider's detail record"""
+    for field, value in movie_fields(record).items():
+        if field not in ('tmdb_id', 'imdb_id'):
+            setattr(movie, field, value)
+    movie.is_placeholder = False
+    movie.save()
+    movie_enriched.send(sender=Movie, movie=movie)
+
+
+def movie_fields(record):
+    """Movie model fields from an OMDb-shaped detail record"""
+    imdb_id = normalize_imdb_id(record.get('imdbID'))
+    return {
+        'tmdb_id': imdb_id,  # Using imdb_id as primary identifier
+        'imdb_id': imdb_id,
+        'title': record.get('Title', ''),
+        'overview': record.get('Plot', ''),
+        'poster_path': record.get('Poster', ''),
+        'release_date': _parse_date(record.get('Released')),
+        'vote_average': _parse_number(record.get('imdbRating'), float, 0.0),
+        'vote_count': _parse_number(record.get('imdbVotes'), int, 0),
+        'runtime': _parse_number((_value(record.get('Runtime')) or ' ').split()[0], int, None),
+        'genres': _parse_list(record.get('Genre')),
+        'director': record.get('Director', ''),
+        'cast': _parse_list(record.get('Actors')),
+    }
+
+
+def movie_record(movie):
+    """OMDb-shaped detail record of a catalog Movie"""
+    return {
+        'Title': movie.title,
+        'Year': str(movie.release_date.year) if movie.release_date else 'N/A',
+        'Released': movie.release_date.strftime('%d %b %Y') if movie.release_date else 'N/A',
+        'Runtime': f"{movie.runtime} min" if movie.runtime else 'N/A',
+        'Genre': ', '.join(movie.genres) or 'N/A',
+        'Director': movie.director or 'N/A',
+        'Actors': ', '.join(movie.cast) or 'N/A',
+        'Plot': movie.overview or 'N/A',
+        'Poster': movie.poster_path or 'N/A',
+        'imdbRating': f"{movie.vote_average:.1f}",
+        'imdbVotes': f"{movie.vote_count:,}",
+        'imdbID': movie.imdb_id,
+        'Type': 'movie',
+        'Response': 'True',
+    }
+
+
+def _value(value):
+    return None if value in (None, '', 'N/A') else value
+
+
+def _parse_date(value):
+    value = _value(value)
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, '%d %b %Y').date()
+    except ValueError:
+        return None
+
+
+def _reformat_date(value, source, target):
+    try:
+        return datetime.strptime(value, source).strftime(target)
+    except ValueError:
+        return 'N/A'
+
+
+def _parse_number(value, cast, default):
+    value = _value(value)
+    if value is None:
+        return default
+    try:
+        return cast(str(value).replace(',', ''))
+    except ValueError:
+        return default
+
+
+def _parse_list(value):
+    value = _value(value)
+    return [part.strip() for part in value.split(',')] if value else []
+
+
+def _votes(record):
+    return _parse_number(record.get('imdbVotes'), int, 0)
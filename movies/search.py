@@ -0,0 +1,87 @@
+"""
+Per-user burst limit for movie search.
+
+Search-as-you-type clients send bursts even when debounced, and most of a
+burst repeats a search the user has just made (paging back and forth,
+retyping). Each user may start SEARCH_BURST_LIMIT searches per window of
+SEARCH_BURST_SECONDS, counted in the shared cache so every worker sees the
+same count. Past the limit, a search is answered from the user's
+SEARCH_RECENT_RESULTS most recent provider answers when one has the same
+(normalized) query and page, and refused with 429 otherwise. The answers
+are kept as the chain returned them, so shelf status is still computed per
+request.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .providers import normalize_query
+
+
+class Throttled(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many searches; retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def allow(user_id):
+    """Count a search against the user's current window; False once past the limit"""
+    limit, window = settings.SEARCH_BURST_LIMIT, settings.SEARCH_BURST_SECONDS
+    if not limit or not window:
+        return True
+    key = f"movies:search:burst:{user_id}:{int(time.time() // window)}"
+    cache.add(key, 0, timeout=window)
+    try:
+        count = cache.incr(key)
+    except ValueError:  # the window expired between add and incr
+        count = 1
+        cache.set(key, count, timeout=window)
+    return count <= limit
+
+
+def retry_after():
+    window = settings.SEARCH_BURST_SECONDS
+    if not window:
+        return 1
+    return max(1, int(window - time.time() % window + 0.5))
+
+
+def _recent_key(user_id):
+    return f"movies:search:recent:{user_id}"
+
+
+def recent(user_id, query, page):
+    """The user's latest answer to this query and page, or None"""
+    query = normalize_query(query)
+    for seen_query, seen_page, payload in cache.get(_recent_key(user_id)) or ():
+        if (seen_query, seen_page) == (query, page):
+            return payload
+    return None
+
+
+def remember(user_id, query, page, payload):
+    if not settings.SEARCH_BURST_LIMIT or not settings.SEARCH_BURST_SECONDS or not settings.SEARCH_RECENT_RESULTS:
+        return
+    query = normalize_query(query)
+    entries = [entry for entry in cache.get(_recent_key(user_id)) or () if entry[:2] != (query, page)]
+    entries.insert(0, (query, page, payload))
+    cache.set(
+        _recent_key(user_id), entries[:settings.SEARCH_RECENT_RESULTS], timeout=settings.OMDB_SEARCH_CACHE_SECONDS
+    )
+
+
+def search(chain, user_id, query, page):
+    """
+    (payload, replayed): the chain's answer, or within a burst the user's
+    recent one. Raises Throttled when the user is over the limit and has no
+    matching answer.
+    """
+    if not allow(user_id):
+        payload = recent(user_id, query, page)
+        if payload is None:
+            raise Throttled(retry_after())
+        return payload, True
+    payload = chain.search(query, page)
+    remember(user_id, query, page, payload)
+    return payload, False
@@ -1,12 +1,82 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Movie
+from . import hot, providers
+from .models import Movie, TrendingMovie
+from movieshelfapp.instrumentation import TimedSerializerMixin
 
-class MovieSerializer(serializers.ModelSerializer):
+class MovieSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Movie
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
 
+class HotMovieSerializer(MovieSerializer):
+    """
+    MovieSerializer for a related ``movie``, read from the hot movie cache
+    (movies/hot.py) unless the instance already holds the Movie.
+    """
+
+    def get_attribute(self, instance):
+        if type(instance).movie.is_cached(instance):
+            return instance.movie
+        records = getattr(self.root, 'hot_movies', None)
+        if records is not None and instance.movie_id in records:
+            return records[instance.movie_id]
+        return hot.get(instance.movie_id)
+
+class HotMovieListSerializer(serializers.ListSerializer):
+    """Looks up the movies of all objects in the hot movie cache at once, for HotMovieSerializer"""
+
+    def to_representation(self, data):
+        objects = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.hot_movies = hot.get_many({obj.movie_id for obj in objects})
+        return super().to_representation(objects)
+
 class MovieSearchSerializer(serializers.Serializer):
     query = serializers.CharField(max_length=255)
-    page = serializers.IntegerField(default=1, min_value=1)
\ No newline at end of file
+    page = serializers.IntegerField(default=1, min_value=1, max_value=providers.MAX_PAGE)
+
+    def validate_query(self, value):
+        query = providers.normalize_query(value)
+        if not query:
+            raise serializers.ValidationError('This field may not be blank.')
+        return query
+
+class MovieBatchSerializer(serializers.Serializer):
+    """Comma separated IMDb IDs, ``?ids=tt0068646,tt0071562``"""
+    MAX_IDS = 50
+
+    ids = serializers.CharField()
+
+    def validate_ids(self, value):
+        ids = [part.strip() for part in value.split(',') if part.strip()]
+        if not ids:
+            raise serializers.ValidationError('At least one IMDb ID is required')
+        if len(ids) > self.MAX_IDS:
+            raise serializers.ValidationError(f"At most {self.MAX_IDS} IDs per request")
+        return ids
+
+class TrendingMovieSerializer(serializers.ModelSerializer):
+    movie = MovieSerializer(read_only=True)
+    shelved_count = serializers.IntegerField(source='movie.stats.shelved_count', default=0)
+    watched_count = serializers.IntegerField(source='movie.stats.watched_count', default=0)
+    average_rating = serializers.FloatField(source='movie.stats.average_rating', default=None)
+
+    class Meta:
+        model = TrendingMovie
+        fields = ('rank', 'score', 'shelved_count', 'watched_count', 'average_rating', 'movie')
+
+
+class MovieSuggestionSerializer(serializers.ModelSerializer):
+    """Catalog match in the shape of an OMDb search result, plus its similarity"""
+    year = serializers.SerializerMethodField()
+    poster = serializers.CharField(source='poster_path')
+    similarity = serializers.FloatField()
+
+    class Meta:
+        model = Movie
+        fields = ('imdb_id', 'title', 'year', 'poster', 'similarity')
+
+    def get_year(self, movie):
+        return str(movie.release_date.year) if movie.release_date else None
+
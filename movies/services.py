@@ -1,6 +1,7 @@
 import requests
 from django.conf import settings
 from .models import Movie
+from movieshelfapp.instrumentation import upstream_call
 from datetime import datetime
 
 
@@ -19,8 +20,9 @@ class TMDBService:
         }
 
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            with upstream_call('tmdb', 'search'):
+                response = requests.get(url, params=params)
+                response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
             raise Exception(f"Error fetching movies: {str(e)}")
@@ -35,8 +37,9 @@ class TMDBService:
         }
 
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            with upstream_call('tmdb', 'detail'):
+                response = requests.get(url, params=params)
+                response.raise_for_status()
             return response.json()
         except requests.RequestException as e:
             raise Exception(f"Error fetching movie details: {str(e)}")
@@ -78,4 +81,54 @@ class TMDBService:
                 'cast': cast,
             }
         )
-        return movie
\ No newline at end of file
+        return movie
+
+    @classmethod
+    def find_by_imdb_id(cls, imdb_id, operation='detail'):
+        """TMDB details (with credits) of the movie with this IMDb ID, or None"""
+        with upstream_call('tmdb', operation):
+            response = requests.get(
+                f"{cls.BASE_URL}/find/{imdb_id}",
+                params={'api_key': cls.API_KEY, 'external_source': 'imdb_id'},
+                timeout=settings.TMDB_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+            matches = response.json().get('movie_results') or []
+            if not matches:
+                return None
+            response = requests.get(
+                f"{cls.BASE_URL}/movie/{matches[0]['id']}",
+                params={'api_key': cls.API_KEY, 'append_to_response': 'credits'},
+                timeout=settings.TMDB_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+        return response.json()
+
+
+class OMDBService:
+    """
+    OMDb API client. Caching, prefetching and fallback to other sources are
+    handled by the provider chain in movies/providers.py.
+    """
+    NOT_FOUND = 'Movie not found!'
+
+    @classmethod
+    def search(cls, query, page=1, operation='search'):
+        """Search OMDb by title; returns the raw OMDb payload"""
+        return cls._get({'s': query, 'page': page}, operation)
+
+    @classmethod
+    def get_details(cls, imdb_id, operation='detail'):
+        """Full OMDb record for an IMDb ID; returns the raw OMDb payload"""
+        return cls._get({'i': imdb_id}, operation)
+
+    @classmethod
+    def _get(cls, params, operation):
+        with upstream_call('omdb', operation):
+            response = requests.get(
+                settings.OMDB_BASE_URL,
+                params={**params, 'apikey': settings.OMDB_API_KEY},
+                timeout=settings.OMDB_TIMEOUT_SECONDS,
+            )
+            response.raise_for_status()
+        return response.json()
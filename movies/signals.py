@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from . import fuzzy, hot, identity
+from .models import Movie
+
+# Sent with ``movie=`` when a placeholder movie gets its details.
+movie_enriched = Signal()
+
+
+@receiver(post_save, sender=Movie)
+def index_saved_movie(sender, instance, **kwargs):
+    fuzzy.index_movie(instance)
+    hot.invalidate(instance.pk)
+
+
+@receiver(post_delete, sender=Movie)
+def forget_deleted_movie(sender, instance, **kwargs):
+    identity.forget(instance)
+    fuzzy.unindex_movie(instance)
+    hot.invalidate(instance.pk)
@@ -1,3 +1,428 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from movieshelfapp.testing import QueryBudgetMixin
+from . import fuzzy, hot, identity, providers, search
+from .serializers import MovieSerializer
+from .models import Movie
+
+User = get_user_model()
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class CreateMovieQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        identity.clear()
+        user = User.objects.create_user(
+            email='budget@example.com', username='budget', password='pw-for-tests-123'
+        )
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        Movie.objects.create(tmdb_id='tt0111161', imdb_id='tt0111161', title='The Shawshank Redemption')
+
+    def test_existing_movie_is_served_from_catalog(self):
+        with self.assertQueryBudget(2):
+            response = self.client.post('/api/movies/create/', {'imdb_id': 'tt0111161'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data['created'])
+        self.assertIn('cache;desc="1 hits 0 misses"', response['Server-Timing'])
+
+    def test_catalog_hits_are_exported_as_metrics(self):
+        self.client.post('/api/movies/create/', {'imdb_id': 'tt0111161'}, format='json')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('movieshelf_movie_lookups_total{result="catalog",source="create_movie"}', body)
+        self.assertIn('movieshelf_http_request_seconds_bucket', body)
+
+
+class IdentityMapTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        identity.clear()
+        self.movie = Movie.objects.create(tmdb_id='tt0111161', imdb_id=' TT0111161', title='The Shawshank Redemption')
+
+    def test_imdb_ids_are_stored_canonically(self):
+        self.assertEqual(Movie.objects.get(pk=self.movie.pk).imdb_id, 'tt0111161')
+
+    def test_lookups_repeat_no_queries_within_a_request(self):
+        with identity.request_scope():
+            with self.assertQueryBudget(1):
+                for external_id in ('tt0111161', 'TT0111161', 'tt0111161 '):
+                    self.assertEqual(identity.get_movie('imdb', external_id), self.movie)
+                self.assertEqual(identity.resolve('imdb', 'tt0111161'), self.movie.pk)
+
+    def test_pks_are_remembered_across_requests(self):
+        identity.resolve('imdb', 'tt0111161')
+        with self.assertQueryBudget(0):
+            self.assertEqual(identity.resolve('imdb', 'tt0111161'), self.movie.pk)
+
+    def test_deleted_movies_are_forgotten(self):
+        identity.resolve('imdb', 'tt0111161')
+        self.movie.delete()
+        self.assertIsNone(identity.resolve('imdb', 'tt0111161'))
+
+    def test_create_returns_the_existing_duplicate(self):
+        with identity.request_scope():
+            self.assertIsNone(identity.get_movie('imdb', 'tt0068646'))
+            first = identity.create_movie(tmdb_id='tt0068646', imdb_id='tt0068646', title='The Godfather')
+            again = identity.create_movie(tmdb_id='tt0068646x', imdb_id='TT0068646', title='The Godfather')
+        self.assertEqual(again.pk, first.pk)
+
+
+class HotMovieCacheTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        hot.clear()
+        self.movies = [
+            Movie.objects.create(
+                tmdb_id=f"tt{n:07d}", imdb_id=f"tt{n:07d}", title=f"Movie {n}", overview='x' * 500,
+                genres=['Drama', 'Crime'], cast=['Al Pacino', 'Marlon Brando'],
+            )
+            for n in range(3)
+        ]
+
+    def test_records_are_loaded_once_and_render_like_movies(self):
+        with self.assertQueryBudget(1):
+            records = hot.get_many([movie.pk for movie in self.movies])
+        with self.assertQueryBudget(0):
+            record = hot.get(self.movies[0].pk)
+        self.assertIs(record, records[self.movies[0].pk])
+        render = JSONRenderer().render
+        self.assertEqual(render(MovieSerializer(record).data), render(MovieSerializer(self.movies[0]).data))
+        # Repeated strings are shared between records.
+        self.assertIs(records[self.movies[1].pk].cast[0], record.cast[0])
+        self.assertEqual(hot.stats()['hits'], 1)
+        self.assertEqual(hot.stats()['misses'], 3)
+
+    def test_saving_a_movie_invalidates_its_record(self):
+        hot.get(self.movies[0].pk)
+        self.movies[0].title = 'Renamed'
+        self.movies[0].save()
+        self.assertEqual(hot.get(self.movies[0].pk).title, 'Renamed')
+        self.movies[0].delete()
+        self.assertIsNone(hot.get(self.movies[0].pk))
+
+    def test_least_recently_used_records_are_evicted_past_the_byte_budget(self):
+        size = hot.get(self.movies[0].pk).size
+        with override_settings(MOVIE_CACHE_MAX_BYTES=size * 2 + size // 2):
+            hot.get(self.movies[0].pk)
+            hot.get(self.movies[1].pk)
+            hot.get(self.movies[0].pk)
+            hot.get(self.movies[2].pk)  # evicts movie 1
+            stats = hot.stats()
+            self.assertEqual((stats['entries'], stats['evictions']), (2, 1))
+            self.assertLessEqual(stats['bytes'], stats['max_bytes'])
+            with self.assertQueryBudget(0):
+                hot.get(self.movies[0].pk)
+            with self.assertQueryBudget(1):
+                hot.get(self.movies[1].pk)
+
+    def test_placeholders_are_not_kept(self):
+        Movie.objects.filter(pk=self.movies[0].pk).update(is_placeholder=True)
+        hot.get(self.movies[0].pk)
+        with self.assertQueryBudget(1):
+            hot.get(self.movies[0].pk)
+
+
+class MovieAdminTests(TestCase):
+    def test_search_by_imdb_id(self):
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pw-for-tests-123')
+        self.client.force_login(admin)
+        for n in range(3):
+            Movie.objects.create(tmdb_id=f"tt{n:07d}", imdb_id=f"tt{n:07d}", title=f"Movie {n}")
+        response = self.client.get('/admin/movies/movie/', {'q': 'TT0000002'})
+        self.assertEqual([movie.title for movie in response.context['cl'].result_list], ['Movie 2'])
+
+class FuzzySearchTests(APITestCase):
+    def setUp(self):
+        fuzzy.clear()
+        user = User.objects.create_user(
+            email='fuzzy@example.com', username='fuzzy', password='pw-for-tests-123'
+        )
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        for n, title in enumerate(['The Shawshank Redemption', 'Interstellar', 'Shaun of the Dead', 'The Dark Knight']):
+            Movie.objects.create(tmdb_id=f"tt{n:07d}", imdb_id=f"tt{n:07d}", title=title)
+
+    def suggest(self, query):
+        response = self.client.get('/api/movies/suggest/', {'query': query})
+        self.assertEqual(response.status_code, 200)
+        return [movie['title'] for movie in response.data['suggestions']]
+
+    def test_typos_find_the_intended_title(self):
+        self.assertEqual(self.suggest('shawshenk'), ['The Shawshank Redemption'])
+        self.assertEqual(self.suggest('intersteller'), ['Interstellar'])
+        self.assertEqual(self.suggest('the dark night')[0], 'The Dark Knight')
+        self.assertEqual(self.suggest('zzzz'), [])
+
+    def test_new_movies_are_indexed(self):
+        self.suggest('godfather')  # loads the index
+        Movie.objects.create(tmdb_id='tt0068646', imdb_id='tt0068646', title='The Godfather')
+        self.assertEqual(self.suggest('godfater'), ['The Godfather'])
+
+    def test_similarity_matches_pg_trgm(self):
+        # Reference values from PostgreSQL's word_similarity().
+        self.assertAlmostEqual(fuzzy.word_similarity('word', 'two words'), 0.8)
+        self.assertAlmostEqual(fuzzy.word_similarity('inter', 'Interstellar'), 5 / 6)
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class ProviderChainTests(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        identity.clear()
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='chain@example.com', username='chain', password='pw-for-tests-123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        dataset = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with dataset:
+            for imdb_id, title, votes in (
+                ('tt0068646', 'The Godfather', '2,000,000'),
+                ('tt0071562', 'The Godfather Part II', '1,300,000'),
+                ('tt0099674', 'The Godfather Part III', '400,000'),
+            ):
+                dataset.write(json.dumps({
+                    'imdbID': imdb_id, 'Title': title, 'Year': '1972', 'Type': 'movie',
+                    'Released': '24 Mar 1972', 'Runtime': '175 min', 'Genre': 'Crime, Drama',
+                    'imdbRating': '9.2', 'imdbVotes': votes, 'Poster': 'N/A',
+                }) + '\n')
+        self.addCleanup(os.remove, dataset.name)
+        offline = override_settings(MOVIE_PROVIDERS=['catalog', 'cache', 'dataset'], MOVIE_DATASET_PATH=dataset.name)
+        offline.enable()
+        self.addCleanup(offline.disable)
+
+    def test_search_is_served_from_the_dataset(self):
+        response = self.client.get('/api/movies/search/', {'query': 'godfather part'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [movie['imdb_id'] for movie in response.data['movies']], ['tt0071562', 'tt0099674']
+        )
+        self.assertIn('provider-dataset', response['Server-Timing'])
+
+    def test_search_results_carry_the_callers_shelf_status(self):
+        godfather = Movie.objects.create(tmdb_id='tt0068646', imdb_id='tt0068646', title='The Godfather')
+        self.user.watchlist_items.create(movie=godfather, is_watched=True, rating=5)
+        with self.assertQueryBudget(2):
+            response = self.client.get('/api/movies/search/', {'query': 'godfather'})
+        shelf = {
+            movie['imdb_id']: (movie['in_watchlist'], movie['is_watched'], movie['rating'])
+            for movie in response.data['movies']
+        }
+        self.assertEqual(shelf, {
+            'tt0068646': (True, True, 5),
+            'tt0071562': (False, False, None),
+            'tt0099674': (False, False, None),
+        })
+
+    def test_unknown_titles_are_not_found(self):
+        response = self.client.get('/api/movies/search/', {'query': 'shawshank'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_spellings_of_a_query_share_one_cache_entry(self):
+        self.assertEqual(providers.normalize_query(' The\tGODFATHER\u00a0 '), 'the godfather')
+        key = providers.CacheProvider.search_key
+        self.assertEqual(key('Godfather  Part', 1), key('godfather part', 1))
+        self.assertEqual(self.client.get('/api/movies/search/', {'query': '\x00 '}).status_code, 400)
+
+    @override_settings(SEARCH_BURST_LIMIT=2)
+    def test_bursts_replay_the_users_recent_results(self):
+        for query in ('godfather', 'godfather part'):
+            self.assertEqual(self.client.get('/api/movies/search/', {'query': query}).status_code, 200)
+
+        response = self.client.get('/api/movies/search/', {'query': 'GODFATHER '})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Search-Replayed'], 'true')
+        self.assertNotIn('provider-', response['Server-Timing'])
+        self.assertEqual(len(response.data['movies']), 3)
+
+        response = self.client.get('/api/movies/search/', {'query': 'godfather', 'page': 2})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    @override_settings(SEARCH_BURST_LIMIT=1, SEARCH_BURST_SECONDS=0)
+    def test_a_zero_window_disables_the_limit(self):
+        for _ in range(3):
+            response = self.client.get('/api/movies/search/', {'query': 'godfather'})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Search-Replayed', response)
+        self.assertEqual(search.retry_after(), 1)
+
+    def test_movies_are_materialized_once(self):
+        response = self.client.post('/api/movies/create/', {'imdb_id': 'TT0068646'}, format='json')
+        self.assertTrue(response.data['created'])
+        self.assertEqual(response.data['movie']['runtime'], 175)
+        self.assertEqual(response.data['movie']['genres'], ['Crime', 'Drama'])
+        response = self.client.post('/api/movies/create/', {'imdb_id': 'tt0068646'}, format='json')
+        self.assertFalse(response.data['created'])
+
+        detail = self.client.get('/api/movies/detail/tt0068646/')
+        self.assertEqual(detail.data['Title'], 'The Godfather')
+        self.assertIn('provider-catalog', detail['Server-Timing'])
+        self.assertNotIn('provider-dataset', detail['Server-Timing'])
+
+    def test_batch_details_fill_gaps_in_request_order(self):
+        Movie.objects.create(tmdb_id='tt0111161', imdb_id='tt0111161', title='The Shawshank Redemption')
+        ids = 'tt0099674,tt0111161,tt9999999,TT0068646'
+        response = self.client.get('/api/movies/details/', {'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [movie['imdbID'] for movie in response.data['movies']], ['tt0099674', 'tt0111161', 'tt0068646']
+        )
+        self.assertEqual(response.data['not_found'], ['tt9999999'])
+        self.assertEqual(Movie.objects.count(), 3)
+
+        identity.clear()
+        with self.assertQueryBudget(2):
+            response = self.client.get('/api/movies/details/', {'ids': 'tt0099674,tt0111161,tt0068646'})
+        self.assertEqual(len(response.data['movies']), 3)
+
+
+@override_settings(MOVIE_PROVIDERS=['omdb', 'tmdb'], OMDB_API_KEY='omdb-key', TMDB_API_KEY='tmdb-key')
+class TMDbFallbackTests(TestCase):
+    def test_tmdb_answers_when_omdb_is_down(self):
+        def get(url, params=None, timeout=None):
+            if url == settings.OMDB_BASE_URL:
+                raise requests.ConnectionError('OMDb is down')
+            self.assertEqual(timeout, settings.TMDB_TIMEOUT_SECONDS)
+            response = Mock()
+            response.json.return_value = (
+                {'movie_results': [{'id': 238}]} if '/find/' in url else {
+                    'title': 'The Godfather', 'release_date': '1972-03-14', 'runtime': 175,
+                    'genres': [{'name': 'Crime'}, {'name': 'Drama'}], 'overview': 'A mafia saga.',
+                    'poster_path': '/godfather.jpg', 'vote_average': 8.7, 'vote_count': 20000,
+                    'credits': {
+                        'crew': [{'job': 'Director', 'name': 'Francis Ford Coppola'}],
+                        'cast': [{'name': 'Marlon Brando'}, {'name': 'Al Pacino'}],
+                    },
+                }
+            )
+            return response
+
+        with patch('movies.services.requests.get', side_effect=get):
+            record = providers.get_chain().detail('tt0068646')
+        self.assertEqual(record['Title'], 'The Godfather')
+        self.assertEqual(record['Director'], 'Francis Ford Coppola')
+        self.assertEqual(record['Released'], '14 Mar 1972')
+        self.assertEqual(providers.movie_fields(record)['genres'], ['Crime', 'Drama'])
+
+
+
+@override_settings(MOVIE_PROVIDERS=['cache', 'omdb'], OMDB_API_KEY='omdb-key')
+class OMDbErrorTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(email='omdb@example.com', username='omdb', password='pw-for-tests-123')
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def answer(self, error):
+        response = Mock()
+        response.json.return_value = {'Response': 'False', 'Error': error}
+        return patch('movies.services.requests.get', return_value=response)
+
+    def test_too_many_results_is_a_cached_404(self):
+        with self.answer('Too many results.') as get:
+            for _ in range(2):
+                response = self.client.get('/api/movies/search/', {'query': 'a'})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['error'], 'Too many results.')
+        get.assert_called_once()
+
+    def test_incorrect_imdb_id_is_a_cached_404(self):
+        with self.answer('Incorrect IMDb ID.') as get:
+            for _ in range(2):
+                response = self.client.get('/api/movies/detail/tt1/')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['error'], 'Incorrect IMDb ID.')
+        get.assert_called_once()
+
+class SearchPagingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(email='pages@example.com', username='pages', password='pw-for-tests-123')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+        dataset = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with dataset:
+            for n in range(25):
+                dataset.write(json.dumps({
+                    'imdbID': f"tt{n:07d}", 'Title': f"Star Film {n}", 'Year': '2001', 'Type': 'movie',
+                    'imdbVotes': str(1000 - n), 'Poster': 'N/A',
+                }) + '\n')
+        self.addCleanup(os.remove, dataset.name)
+        offline = override_settings(MOVIE_PROVIDERS=['catalog', 'cache', 'dataset'], MOVIE_DATASET_PATH=dataset.name)
+        offline.enable()
+        self.addCleanup(offline.disable)
+
+    def test_pages_link_to_their_neighbours(self):
+        response = self.client.get('/api/movies/search/', {'query': 'star film', 'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['total_results'], response.data['total_pages']), (25, 3))
+        self.assertEqual(
+            [movie['imdb_id'] for movie in response.data['movies']], [f"tt{n:07d}" for n in range(10, 20)]
+        )
+        self.assertIn('page=3', response.data['next'])
+        self.assertIn('page=1', response.data['previous'])
+
+        last = self.client.get('/api/movies/search/', {'query': 'star film', 'page': 3})
+        self.assertEqual(len(last.data['movies']), 5)
+        self.assertIsNone(last.data['next'])
+
+    def test_pages_past_the_upstream_limit_are_rejected(self):
+        response = self.client.get('/api/movies/search/', {'query': 'star film', 'page': providers.MAX_PAGE + 1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_next_page_and_top_details_are_prefetched_off_the_database(self):
+        with patch.object(providers.ProviderChain, '_schedule') as schedule:
+            self.client.get('/api/movies/search/', {'query': 'star film'})
+        keys = [call.args[0] for call in schedule.call_args_list]
+        self.assertEqual(keys, [
+            providers.CacheProvider.search_key('star film', 2),
+            *(providers.CacheProvider.detail_key(f"tt{n:07d}") for n in range(3)),
+        ])
+        for call in schedule.call_args_list:
+            fetch = call.args[1]
+            self.assertNotIn('catalog', [provider.name for provider in fetch.__self__.providers])
+
+class BlockingProvider(providers.MovieProvider):
+    name = 'blocking'
+    calls = 0
+    release = threading.Event()
+
+    def search(self, query, page, operation='search'):
+        type(self).calls += 1
+        self.release.wait(5)
+        return {'Search': [], 'totalResults': '0', 'Response': 'True', 'query': query}
+
+
+@override_settings(MOVIE_PROVIDERS=['movies.tests.BlockingProvider'])
+class SearchCoalescingTests(TestCase):
+    def test_concurrent_identical_searches_share_one_lookup(self):
+        BlockingProvider.calls = 0
+        BlockingProvider.release.clear()
+        chain = providers.get_chain()
+        results = []
+        threads = [
+            threading.Thread(target=lambda query=query: results.append(chain.search(query)))
+            for query in ('batman', 'Batman ', 'BATMAN')
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)  # let the followers find the first lookup in flight
+        BlockingProvider.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(BlockingProvider.calls, 1)
+        self.assertEqual([payload['query'] for payload in results], ['batman'] * 3)
+        self.assertEqual(chain._flights, {})
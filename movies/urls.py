@@ -4,13 +4,18 @@ from django.urls import path, include
 
 # movies/urls.py
 from django.urls import path
-from .views import SearchMoviesView, CreateMovieView, MovieDetailView
+from .views import (
+    SearchMoviesView, SuggestMoviesView, CreateMovieView, MovieDetailView, MovieBatchDetailView, TrendingMoviesView
+)
 
 #router = DefaultRouter()
 #router.register(r'', views.MovieViewSet)
 
 urlpatterns = [
     path('search/', SearchMoviesView.as_view(), name='movie-search'),
+    path('suggest/', SuggestMoviesView.as_view(), name='movie-suggest'),
+    path('trending/', TrendingMoviesView.as_view(), name='movie-trending'),
     path('create/', CreateMovieView.as_view(), name='create-movie'),
     path('detail/<str:imdb_id>/', MovieDetailView.as_view(), name='movie-detail'),
+    path('details/', MovieBatchDetailView.as_view(), name='movie-batch-detail'),
 ]
\ No newline at end of file
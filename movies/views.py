@@ -1,81 +1,143 @@
 # backend/movies/views.py - FIXED VERSION
-from django.conf import settings
 import requests
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import Movie
-from .serializers import MovieSerializer
+from rest_framework.utils.urls import replace_query_param
+from . import fuzzy, providers, search
+from .models import Movie, TrendingMovie, normalize_imdb_id
+from .serializers import (
+    MovieBatchSerializer, MovieSerializer, MovieSearchSerializer, MovieSuggestionSerializer,
+    TrendingMovieSerializer
+)
 
 
 class SearchMoviesView(APIView):
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     def get(self, request):
-        query = request.query_params.get('query', '')
-        if not query:
+        if not request.query_params.get('query', ''):
             return Response(
                 {"error": "Query parameter is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        params = MovieSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data['query']
+        page = params.validated_data['page']
 
+        chain = providers.get_chain()
         try:
-            omdb_api_key = settings.OMDB_API_KEY
-            if not omdb_api_key:
-                return Response(
-                    {"error": "OMDB API key is not configured"},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
-
-            response = requests.get(
-                f"http://www.omdbapi.com/?s={query}&apikey={omdb_api_key}"
-            )
-            response.raise_for_status()
-            data = response.json()
+            data, replayed = search.search(chain, request.user.pk, query, page)
 
             if data.get('Response') == 'False':
+                # Usually a typo; offer close titles from our own catalog.
+                suggestions = fuzzy.search(query, limit=SuggestMoviesView.default_limit)
                 return Response(
-                    {"error": data.get('Error', 'No results found')},
+                    {
+                        "error": data.get('Error', 'No results found'),
+                        "suggestions": MovieSuggestionSerializer(suggestions, many=True).data,
+                    },
                     status=status.HTTP_404_NOT_FOUND
                 )
 
             # Transform OMDB data to match your frontend expectations
+            results = data.get('Search', [])
+            shelf = self._shelf_status(request.user, [movie.get('imdbID') for movie in results])
             movies = []
-            if 'Search' in data:
-                for movie in data['Search']:
-                    movies.append({
-                        'imdb_id': movie.get('imdbID'),
-                        'title': movie.get('Title'),
-                        'year': movie.get('Year'),
-                        'poster': movie.get('Poster'),
-                        'type': movie.get('Type')
-                    })
-
-            return Response({
+            for movie in results:
+                is_watched, rating = shelf.get(normalize_imdb_id(movie.get('imdbID')), (False, None))
+                movies.append({
+                    'imdb_id': movie.get('imdbID'),
+                    'title': movie.get('Title'),
+                    'year': movie.get('Year'),
+                    'poster': movie.get('Poster'),
+                    'type': movie.get('Type'),
+                    'in_watchlist': normalize_imdb_id(movie.get('imdbID')) in shelf,
+                    'is_watched': is_watched,
+                    'rating': rating,
+                })
+
+            total_pages = providers.total_pages(data)
+            if not replayed:
+                chain.prefetch(query, page, data)
+
+            url = request.build_absolute_uri()
+            response = Response({
                 'movies': movies,
-                'total_results': data.get('totalResults', 0)
+                'total_results': int(data.get('totalResults', 0)),
+                'page': page,
+                'total_pages': total_pages,
+                'next': replace_query_param(url, 'page', page + 1) if page < total_pages else None,
+                'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
             })
+            if replayed:
+                response['X-Search-Replayed'] = 'true'
+            return response
 
-        except requests.RequestException as e:
+        except search.Throttled as e:
             return Response(
-                {"error": f"Error fetching from OMDB: {str(e)}"},
+                {"error": str(e)},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(e.retry_after)},
+            )
+
+        except (requests.RequestException, providers.ProviderError) as e:
+            return Response(
+                {"error": f"Error fetching movies: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @staticmethod
+    def _shelf_status(user, imdb_ids):
+        """{imdb_id: (is_watched, rating)} of the results on the user's watchlist, in one query"""
+        imdb_ids = [imdb_id for imdb_id in map(normalize_imdb_id, imdb_ids) if imdb_id]
+        if not imdb_ids:
+            return {}
+        rows = Movie.objects.filter(imdb_id__in=imdb_ids, watchlist_items__user=user).values_list(
+            'imdb_id', 'watchlist_items__is_watched', 'watchlist_items__rating'
+        )
+        return {imdb_id: (is_watched, rating) for imdb_id, is_watched, rating in rows}
+
+
+class SuggestMoviesView(APIView):
+    """Typo-tolerant title suggestions from the local catalog, no OMDb call"""
+    permission_classes = [IsAuthenticated]
+    replica_reads = True
+    default_limit = 5
+    max_limit = 20
+
+    def get(self, request):
+        query = request.query_params.get('query', '').strip()
+        if not query:
+            return Response(
+                {"error": "Query parameter is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        suggestions = fuzzy.search(query, limit=limit)
+        return Response({
+            'query': query,
+            'suggestions': MovieSuggestionSerializer(suggestions, many=True).data,
+        })
+
 
 class MovieDetailView(APIView):
-    """Get detailed movie information from OMDB API"""
+    """Detailed movie information (OMDb format) from the provider chain"""
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     def get(self, request, imdb_id):
         try:
-            omdb_api_key = settings.OMDB_API_KEY
-            response = requests.get(
-                f"http://www.omdbapi.com/?i={imdb_id}&apikey={omdb_api_key}"
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = providers.get_chain().detail(imdb_id)
 
             if data.get('Response') == 'False':
                 return Response(
@@ -85,77 +147,82 @@ class MovieDetailView(APIView):
 
             return Response(data)
 
-        except requests.RequestException as e:
+        except (requests.RequestException, providers.ProviderError) as e:
             return Response(
                 {"error": f"Error fetching movie details: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+class MovieBatchDetailView(APIView):
+    """
+    Details (OMDb format) of several movies at once, in request order. The
+    catalog answers in one query; only the rest goes to the providers.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = MovieBatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        movies, errors = providers.materialize_many(params.validated_data['ids'], source='batch_detail')
+
+        results, not_found = [], []
+        for imdb_id in params.validated_data['ids']:
+            movie = movies.get(normalize_imdb_id(imdb_id))
+            if movie is not None:
+                results.append(providers.movie_record(movie))
+            elif normalize_imdb_id(imdb_id) not in errors:
+                not_found.append(imdb_id)
+        return Response({
+            'movies': results,
+            'not_found': not_found,
+            'errors': {imdb_id: str(error) for imdb_id, error in errors.items()},
+        })
+
+
+class TrendingMoviesView(APIView):
+    """Most shelved and watched movies lately, from the precomputed ranking"""
+    permission_classes = [IsAuthenticated]
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), self.max_limit)
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ranking = TrendingMovie.objects.select_related('movie', 'movie__stats')[:limit]
+        movies = TrendingMovieSerializer(ranking, many=True).data
+        return Response({
+            'movies': movies,
+            'computed_at': ranking[0].computed_at if ranking else None,
+        })
+
+
 class CreateMovieView(APIView):
-    """Create a movie record from OMDB data"""
+    """Create a movie record from the provider chain"""
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        imdb_id = request.data.get('imdb_id')
+        imdb_id = normalize_imdb_id(request.data.get('imdb_id'))
         if not imdb_id:
             return Response(
                 {'error': 'imdb_id is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check if movie already exists
-        try:
-            movie = Movie.objects.get(imdb_id=imdb_id)
-            return Response({
-                'movie': MovieSerializer(movie).data,
-                'created': False
-            })
-        except Movie.DoesNotExist:
-            pass
-
-        # Fetch movie details from OMDB
         try:
-            omdb_api_key = settings.OMDB_API_KEY
-            response = requests.get(
-                f"http://www.omdbapi.com/?i={imdb_id}&apikey={omdb_api_key}"
+            movie, created = providers.materialize(imdb_id, source='create_movie')
+        except providers.MovieNotFound as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_404_NOT_FOUND
             )
-            response.raise_for_status()
-            omdb_data = response.json()
-
-            if omdb_data.get('Response') == 'False':
-                return Response(
-                    {"error": omdb_data.get('Error', 'Movie not found')},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-
-            # Transform OMDB data to your Movie model format
-            movie_data = {
-                'tmdb_id': imdb_id,  # Using imdb_id as primary identifier
-                'imdb_id': imdb_id,
-                'title': omdb_data.get('Title', ''),
-                'overview': omdb_data.get('Plot', ''),
-                'poster_path': omdb_data.get('Poster', ''),
-                'release_date': self._parse_date(omdb_data.get('Released')),
-                'vote_average': self._parse_rating(omdb_data.get('imdbRating')),
-                'vote_count': self._parse_votes(omdb_data.get('imdbVotes')),
-                'runtime': self._parse_runtime(omdb_data.get('Runtime')),
-                'genres': self._parse_genres(omdb_data.get('Genre')),
-                'director': omdb_data.get('Director', ''),
-                'cast': self._parse_actors(omdb_data.get('Actors')),
-            }
-
-            # Create movie
-            movie = Movie.objects.create(**movie_data)
-
-            return Response({
-                'movie': MovieSerializer(movie).data,
-                'created': True
-            })
-
-        except requests.RequestException as e:
+        except (requests.RequestException, providers.ProviderError) as e:
             return Response(
-                {"error": f"Error fetching from OMDB: {str(e)}"},
+                {"error": f"Error fetching movie details: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         except Exception as e:
@@ -164,51 +231,7 @@ class CreateMovieView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _parse_date(self, date_str):
-        """Parse OMDB date format to Django date"""
-        if not date_str or date_str == 'N/A':
-            return None
-        try:
-            from datetime import datetime
-            return datetime.strptime(date_str, '%d %b %Y').date()
-        except:
-            return None
-
-    def _parse_rating(self, rating_str):
-        """Parse OMDB rating to float"""
-        if not rating_str or rating_str == 'N/A':
-            return 0.0
-        try:
-            return float(rating_str)
-        except:
-            return 0.0
-
-    def _parse_votes(self, votes_str):
-        """Parse OMDB votes to integer"""
-        if not votes_str or votes_str == 'N/A':
-            return 0
-        try:
-            return int(votes_str.replace(',', ''))
-        except:
-            return 0
-
-    def _parse_runtime(self, runtime_str):
-        """Parse OMDB runtime to minutes"""
-        if not runtime_str or runtime_str == 'N/A':
-            return None
-        try:
-            return int(runtime_str.split()[0])
-        except:
-            return None
-
-    def _parse_genres(self, genre_str):
-        """Parse OMDB genres to list"""
-        if not genre_str or genre_str == 'N/A':
-            return []
-        return [g.strip() for g in genre_str.split(',')]
-
-    def _parse_actors(self, actors_str):
-        """Parse OMDB actors to list"""
-        if not actors_str or actors_str == 'N/A':
-            return []
-        return [a.strip() for a in actors_str.split(',')]  # FIX: Added missing return
\ No newline at end of file
+        return Response({
+            'movie': MovieSerializer(movie).data,
+            'created': created
+        })
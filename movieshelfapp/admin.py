@@ -0,0 +1,116 @@
+"""
+Admin changelists that stay fast on tables with millions of rows.
+
+LargeTableAdminMixin changes three things about a ModelAdmin:
+
+- Counting. The unfiltered changelist takes the row count from the planner's
+  statistics in pg_class (summed over partitions) instead of COUNT(*), once
+  the table is past ESTIMATE_THRESHOLD rows. Filtered and searched lists
+  count at most COUNT_LIMIT rows. The extra full-table count Django runs for
+  "N total" is switched off.
+- Navigation. With the default ordering, whose first field must be unique,
+  a "Next" link continues after the last row shown (``?after=<value>``),
+  an index range scan however deep the admin pages. Page-number links still
+  work; they use OFFSET.
+- Search. Searches use icontains on columns with trigram indexes over
+  UPPER(column), which is what Django's icontains compares on PostgreSQL
+  (see the users and movies migrations). Subclasses narrow searches on
+  joined tables themselves; see WatchlistItemAdmin.
+"""
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+CURSOR_VAR = 'after'
+
+
+def estimated_count(queryset):
+    """pg_class row estimate of the queryset's table, or None if there is none yet"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sum(greatest(reltuples, 0))::bigint FROM pg_partition_tree(%s::regclass) tree "
+            "JOIN pg_class ON pg_class.oid = tree.relid WHERE tree.isleaf",
+            [queryset.model._meta.db_table],
+        )
+        (estimate,) = cursor.fetchone()
+    return estimate or None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that neither scans a large table nor counts past COUNT_LIMIT rows"""
+    ESTIMATE_THRESHOLD = 100000
+    COUNT_LIMIT = 10000
+
+    approximate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate >= self.ESTIMATE_THRESHOLD:
+                self.approximate = True
+                return estimate
+        count = queryset.order_by()[:self.COUNT_LIMIT + 1].count()
+        if count > self.COUNT_LIMIT:
+            self.approximate = True
+            return self.COUNT_LIMIT
+        return count
+
+
+class KeysetChangeList(ChangeList):
+    """ChangeList that can continue after a row (``?after=``) in the default ordering"""
+
+    def __init__(self, request, *args, **kwargs):
+        # Custom sorting (?o=) has no unique key to continue from.
+        self.cursor = request.GET.get(CURSOR_VAR) if ORDER_VAR not in request.GET else None
+        self.next_url = None
+        super().__init__(request, *args, **kwargs)
+        # Not carried over by the search form, filters or sorting.
+        self.params.pop(CURSOR_VAR, None)
+        self.filter_params.pop(CURSOR_VAR, None)
+
+    @property
+    def keyset_field(self):
+        """(field name, descending) of the ordering the cursor follows"""
+        first = self.model_admin.ordering[0]
+        return first.lstrip('-'), first.startswith('-')
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.cursor is not None:
+            field, descending = self.keyset_field
+            try:
+                queryset = queryset.filter(**{f"{field}__{'lt' if descending else 'gt'}": self.cursor})
+            except (ValueError, ValidationError) as e:
+                raise IncorrectLookupParameters(e) from e
+        return queryset
+
+    def get_results(self, request):
+        super().get_results(request)
+        if ORDER_VAR in request.GET or self.show_all or not self.multi_page:
+            return
+        rows = list(self.result_list)  # the page's queryset keeps these for the template
+        if len(rows) == self.list_per_page:
+            field, _ = self.keyset_field
+            self.next_url = self.get_query_string({CURSOR_VAR: getattr(rows[-1], field)})
+
+
+class LargeTableAdminMixin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/large_table_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
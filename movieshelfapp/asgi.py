@@ -3,6 +3,11 @@ ASGI config for movieshelfapp project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server to enable the watchlist event stream
+(/api/watchlist/events/), which holds one long-lived connection per client:
+
+    gunicorn -k uvicorn.workers.UvicornWorker movieshelfapp.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,74 @@
+"""
+Primary/replica database routing.
+
+Reads go to a replica only while ReplicaRoutingMiddleware has marked the
+current request as replica-safe: a GET/HEAD/OPTIONS request, to a view that
+opts in with ``replica_reads = True``, from a user who has not written
+anything in the last DB_REPLICA_STICKY_SECONDS. The views that opt in are
+the read-heavy ones that tolerate a moment of replication lag: watchlist
+lists, movie detail and search, title suggestions. Everything else - writes,
+other views, management commands, the shell - stays on the primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+PRIMARY = 'default'
+
+_replicas_allowed = ContextVar('replicas_allowed', default=False)
+
+# Account lookups made during authentication stay on the primary, so a user
+# who has just registered cannot be rejected by a lagging replica.
+PRIMARY_ONLY_MODELS = {'users.user'}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != PRIMARY]
+
+
+@contextmanager
+def replicas_allowed(allowed):
+    token = _replicas_allowed.set(allowed)
+    try:
+        yield
+    finally:
+        _replicas_allowed.reset(token)
+
+
+def allow_replicas():
+    """Let the rest of the current replicas_allowed() block read from replicas"""
+    _replicas_allowed.set(True)
+
+
+def _sticky_key(user_id):
+    return f"db-sticky:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Send this user's reads to the primary until their writes have replicated"""
+    cache.set(_sticky_key(user_id), True, timeout=settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(_sticky_key(user_id), False)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replicas_allowed.get() or model._meta.label_lower in PRIMARY_ONLY_MODELS:
+            return PRIMARY
+        replicas = replica_aliases()
+        return random.choice(replicas) if replicas else PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so objects from any alias may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
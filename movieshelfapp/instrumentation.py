@@ -0,0 +1,142 @@
+"""
+Per-request performance counters.
+
+RequestMetricsMiddleware opens a RequestMetrics for every request; code
+further down records into it through the helpers below, which are no-ops
+outside a request (management commands, shell, tests without a client).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from . import metrics as prometheus
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.upstream = {}
+        self.timings = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._active = set()
+
+    def add_upstream(self, provider, elapsed):
+        calls, total = self.upstream.get(provider, (0, 0.0))
+        self.upstream[provider] = (calls + 1, total + elapsed)
+
+    def add_timing(self, name, elapsed):
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    @property
+    def upstream_time(self):
+        return sum(total for _, total in self.upstream.values())
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def count_query(self, execute, sql, params, many, context):
+        """Database execute wrapper, see connection.execute_wrapper()"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - started
+
+
+def current_metrics():
+    return _current.get()
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+@contextmanager
+def upstream_call(provider, operation):
+    """Time a call to an external movie API (``omdb``, ``tmdb``); exceptions count as errors"""
+    metrics = _current.get()
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - started
+        prometheus.UPSTREAM_LATENCY.labels(provider, operation).observe(elapsed)
+        prometheus.UPSTREAM_REQUESTS.labels(provider, operation, outcome).inc()
+        if metrics is not None:
+            metrics.add_upstream(provider, elapsed)
+
+
+class _Hop:
+    outcome = 'miss'
+
+
+@contextmanager
+def provider_hop(provider, operation):
+    """
+    Time one provider of the movie provider chain; set ``.outcome`` on the
+    yielded object to 'hit' or 'error' (it defaults to 'miss')
+    """
+    metrics = _current.get()
+    hop = _Hop()
+    started = time.perf_counter()
+    try:
+        yield hop
+    finally:
+        elapsed = time.perf_counter() - started
+        prometheus.PROVIDER_LOOKUPS.labels(provider, operation, hop.outcome).observe(elapsed)
+        if metrics is not None:
+            metrics.add_timing(f"provider-{provider}", elapsed)
+
+
+@contextmanager
+def timed(name):
+    """Accumulate wall time under ``name``; nested blocks of the same name count once"""
+    metrics = _current.get()
+    if metrics is None or name in metrics._active:
+        yield
+        return
+    metrics._active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._active.discard(name)
+        metrics.add_timing(name, time.perf_counter() - started)
+
+
+def record_cache(hit, cache):
+    prometheus.CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+    metrics = _current.get()
+    if metrics is None:
+        return
+    if hit:
+        metrics.cache_hits += 1
+    else:
+        metrics.cache_misses += 1
+
+
+def record_movie_lookup(source, found):
+    """Count a Movie lookup served by the local catalog (``found``) or left to a provider"""
+    prometheus.MOVIE_LOOKUPS.labels(source, 'catalog' if found else 'provider').inc()
+    record_cache(found, cache='catalog')
+
+
+class TimedSerializerMixin:
+    """Adds serializer output time to the request's ``serialize`` timing"""
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
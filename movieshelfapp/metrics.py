@@ -0,0 +1,81 @@
+"""
+Prometheus metrics.
+
+With several gunicorn workers, start the server with PROMETHEUS_MULTIPROC_DIR
+pointing at an empty, writable directory: every worker then writes its
+samples to memory-mapped files there and the /metrics view sums them up
+(see gunicorn.conf.py for the matching cleanup hook).
+"""
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Local providers answer in microseconds, so their histogram starts lower.
+PROVIDER_BUCKETS = (0.0001, 0.0005, 0.001) + LATENCY_BUCKETS
+
+UPSTREAM_LATENCY = Histogram(
+    'movieshelf_upstream_request_seconds',
+    'Latency of calls to external movie APIs',
+    ['provider', 'operation'],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUESTS = Counter(
+    'movieshelf_upstream_requests',
+    'Calls to external movie APIs; the ok+error sum is the quota consumed',
+    ['provider', 'operation', 'outcome'],
+)
+PROVIDER_LOOKUPS = Histogram(
+    'movieshelf_provider_lookup_seconds',
+    'Time spent in each movie provider of the fallback chain, by outcome (hit, miss, error)',
+    ['provider', 'operation', 'outcome'],
+    buckets=PROVIDER_BUCKETS,
+)
+MOVIE_LOOKUPS = Counter(
+    'movieshelf_movie_lookups',
+    'Movie lookups answered from the local catalog vs fetched from a provider',
+    ['source', 'result'],
+)
+ENRICHMENT_JOBS = Counter(
+    'movieshelf_enrichment_jobs',
+    'Placeholder movie enrichment attempts by outcome (enriched, not_found, retry, failed)',
+    ['outcome'],
+)
+CACHE_LOOKUPS = Counter(
+    'movieshelf_cache_lookups',
+    'Cache lookups by cache name and outcome',
+    ['cache', 'outcome'],
+)
+HOT_MOVIE_CACHE_BYTES = Gauge(
+    'movieshelf_hot_movie_cache_bytes',
+    'Estimated heap use of the in-process hot movie cache (movies/hot.py)',
+    multiprocess_mode='livesum',
+)
+REQUEST_LATENCY = Histogram(
+    'movieshelf_http_request_seconds',
+    'Request latency by view',
+    ['view', 'method', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return collected
+    return REGISTRY
+
+
+def exposition():
+    """Return (body, content type) for the current metric values"""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,283 @@
+import gzip
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from movies import identity
+from . import db_router, instrumentation, profiling
+from .metrics import REQUEST_LATENCY
+
+try:
+    import brotli
+except ImportError:  # optional; responses are gzipped only
+    brotli = None
+
+logger = logging.getLogger('movieshelfapp.requests')
+
+
+class RequestMetricsMiddleware:
+    """
+    Count and time ORM queries, upstream API calls, serialization, rendering
+    and cache lookups for each request. The totals are sent back as a
+    Server-Timing header when SERVER_TIMING_HEADER is on (it tells clients
+    about server internals) and logged as one JSON line at DEBUG.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = instrumentation.RequestMetrics()
+        request.metrics = metrics
+        token = instrumentation.activate(metrics)
+        try:
+            with ExitStack() as stack:
+                # Wrappers live on the per-thread connection objects, so this
+                # also covers connections that only get opened mid-request.
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.count_query))
+                response = self.get_response(request)
+        finally:
+            instrumentation.deactivate(token)
+
+        match = getattr(request, 'resolver_match', None)
+        REQUEST_LATENCY.labels(
+            match.view_name if match else '<unresolved>', request.method, response.status_code,
+        ).observe(metrics.elapsed)
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(metrics)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps(log_record(request, response, metrics), sort_keys=True))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.metrics.add_timing('render', time.perf_counter() - started)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests to views with ``replica_reads = True`` read from
+    replicas, with read-your-writes stickiness: after a user's unsafe request
+    their reads go to the primary for DB_REPLICA_STICKY_SECONDS.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.jwt = JWTAuthentication()
+
+    def __call__(self, request):
+        if not db_router.replica_aliases():
+            return self.get_response(request)
+
+        user_id = self.token_user_id(request)
+        safe = request.method in self.SAFE_METHODS
+        request.replica_safe = safe and not (user_id and db_router.is_pinned(user_id))
+        # process_view turns replicas on once the view is known to opt in.
+        with db_router.replicas_allowed(False):
+            response = self.get_response(request)
+
+        if not safe:
+            user = getattr(request, 'user', None)
+            if user_id is None and user is not None and user.is_authenticated:
+                user_id = user.pk
+            if user_id is not None:
+                db_router.pin_to_primary(user_id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if getattr(request, 'replica_safe', False) and getattr(view, 'replica_reads', False):
+            db_router.allow_replicas()
+
+    def token_user_id(self, request):
+        """User id from the bearer token, without a database lookup"""
+        header = self.jwt.get_header(request)
+        raw_token = self.jwt.get_raw_token(header) if header else None
+        if raw_token is None:
+            return None
+        try:
+            return self.jwt.get_validated_token(raw_token).get(jwt_settings.USER_ID_CLAIM)
+        except InvalidToken:
+            return None
+
+
+class CompressionMiddleware:
+    """
+    Compress JSON responses of at least COMPRESSION_MIN_BYTES with brotli or
+    gzip, whichever the client's Accept-Encoding prefers. Streaming
+    responses - the watchlist event stream - are passed through untouched,
+    since a compressor would hold events back until its buffer fills. HTML
+    is left alone too: admin and login pages put CSRF tokens next to
+    reflected input, which compression exposes to BREACH.
+    """
+    COMPRESSIBLE_TYPES = ('application/json',)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(self.COMPRESSIBLE_TYPES)
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        with instrumentation.timed('compress'):
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+            else:
+                compressed = gzip.compress(response.content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            # The bytes differ from the uncompressed representation.
+            response['ETag'] = f"W/{etag}"
+        return response
+
+
+def negotiate_encoding(accept_encoding):
+    """'br' or 'gzip', by the client's q-values (brotli wins ties), or None"""
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    weights = {}
+    for item in accept_encoding.lower().split(','):
+        coding, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip()] = q
+    wildcard = weights.get('*', 0.0)
+    best = max(available, key=lambda coding: (weights.get(coding, wildcard), -available.index(coding)))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class MovieIdentityMapMiddleware:
+    """Scope the per-request part of the Movie identity map (movies/identity.py)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with identity.request_scope():
+            return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    """
+    Run the sampling profiler (movieshelfapp/profiling.py) around requests
+    that staff ask to profile, with ``X-Profile: 1`` or ``?profile=1``, and
+    around a PROFILING_SAMPLE_RATE share of all requests.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.jwt = JWTAuthentication()
+
+    def __call__(self, request):
+        requested = request.headers.get('X-Profile') == '1' or request.GET.get('profile') == '1'
+        if not (requested and self.is_staff(request)) and not profiling.sampled():
+            return self.get_response(request)
+        if not profiling.acquire_slot():
+            return self.get_response(request)
+        try:
+            profiler = profiling.SamplingProfiler()
+            profiler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.stop()
+            metrics = request.metrics
+            match = getattr(request, 'resolver_match', None)
+            name = profiling.write(profiler, {
+                'view': match.view_name if match else None,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'requested': requested,
+                'duration_ms': round(metrics.elapsed * 1000, 1),
+                'db_queries': metrics.db_queries,
+                'db_ms': round(metrics.db_time * 1000, 1),
+                'upstream_ms': round(metrics.upstream_time * 1000, 1),
+            })
+        finally:
+            profiling.release_slot()
+        if requested:
+            response['X-Profile'] = name
+        return response
+
+    def is_staff(self, request):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            try:
+                authenticated = self.jwt.authenticate(request)
+            except AuthenticationFailed:  # bad token, or its user is gone or inactive
+                return False
+            user = authenticated[0] if authenticated else None
+        return user is not None and user.is_staff
+
+
+def server_timing(metrics):
+    entries = [f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.db_queries} queries"']
+    for provider, (calls, total) in sorted(metrics.upstream.items()):
+        entries.append(f'{provider};dur={total * 1000:.1f};desc="{calls} calls"')
+    for name, total in sorted(metrics.timings.items()):
+        entries.append(f'{name};dur={total * 1000:.1f}')
+    if metrics.cache_hits or metrics.cache_misses:
+        entries.append(f'cache;desc="{metrics.cache_hits} hits {metrics.cache_misses} misses"')
+    entries.append(f'total;dur={metrics.elapsed * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def log_record(request, response, metrics):
+    match = getattr(request, 'resolver_match', None)
+    return {
+        'method': request.method,
+        'path': request.path,
+        'view': match.view_name if match else None,
+        'status': response.status_code,
+        'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+        'duration_ms': round(metrics.elapsed * 1000, 1),
+        'db_queries': metrics.db_queries,
+        'db_ms': round(metrics.db_time * 1000, 1),
+        'upstream': {
+            provider: {'calls': calls, 'ms': round(total * 1000, 1)}
+            for provider, (calls, total) in metrics.upstream.items()
+        },
+        'timings_ms': {name: round(total * 1000, 1) for name, total in metrics.timings.items()},
+        'cache': {'hits': metrics.cache_hits, 'misses': metrics.cache_misses},
+    }
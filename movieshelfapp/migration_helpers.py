@@ -0,0 +1,14 @@
+"""Helpers shared by the apps' migrations."""
+
+
+def run_on_postgresql(statements):
+    """
+    RunPython code that executes raw SQL ``statements`` on PostgreSQL and
+    does nothing elsewhere, e.g. for pg_trgm indexes. Statements using
+    CONCURRENTLY need the migration to set ``atomic = False``.
+    """
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
@@ -0,0 +1,123 @@
+"""
+On-demand sampling profiler for single requests.
+
+ProfilingMiddleware profiles a request when a staff user asks for it
+(``X-Profile: 1`` header or ``?profile=1``) or when it is picked by
+PROFILING_SAMPLE_RATE. A background thread samples the request thread's
+stack every PROFILING_INTERVAL_MS, so the view runs at full speed apart
+from the GIL hand-offs; the stacks are written to PROFILING_DIR in the
+collapsed format that flamegraph.pl, speedscope and inferno read, next to
+a JSON file with the view name, status, query count and upstream time.
+
+Profiling is bounded: at most PROFILING_MAX_CONCURRENT requests per
+process are profiled at once (others run unprofiled), sampling stops after
+PROFILING_MAX_SECONDS, and only the newest PROFILING_MAX_FILES profiles
+are kept.
+"""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from django.conf import settings
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def acquire_slot():
+    """Reserve one of the PROFILING_MAX_CONCURRENT profiling slots, without waiting"""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.PROFILING_MAX_CONCURRENT)
+    return _slots.acquire(blocking=False)
+
+
+def release_slot():
+    _slots.release()
+
+
+def sampled():
+    return settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack from a helper thread"""
+
+    def __init__(self, thread_id=None, interval=None, max_seconds=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = (interval or settings.PROFILING_INTERVAL_MS) / 1000
+        self.max_seconds = max_seconds or settings.PROFILING_MAX_SECONDS
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[self._collapse(frame)] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def write(profiler, tags):
+    """Save a profile and its tags; returns the profile's name"""
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    view = ''.join(c if c.isalnum() or c in '-_' else '_' for c in tags.get('view') or 'unresolved')
+    name = f"{stamp}-{os.getpid()}-{view}"
+    base = os.path.join(settings.PROFILING_DIR, name)
+    with open(f"{base}.folded", 'w') as fh:
+        fh.write(profiler.collapsed())
+    with open(f"{base}.json", 'w') as fh:
+        json.dump({**tags, 'samples': profiler.samples, 'interval_ms': profiler.interval * 1000}, fh, sort_keys=True)
+    _prune()
+    return name
+
+
+def _prune():
+    profiles = sorted(entry for entry in os.listdir(settings.PROFILING_DIR) if entry.endswith('.folded'))
+    for entry in profiles[:-settings.PROFILING_MAX_FILES]:
+        stem = os.path.join(settings.PROFILING_DIR, entry[:-len('.folded')])
+        for suffix in ('.folded', '.json'):
+            try:
+                os.remove(stem + suffix)
+            except FileNotFoundError:
+                pass  # pruned by another worker
+
+
+@lru_cache(maxsize=4096)
+def _short_path(path):
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and path.startswith(prefix + os.sep):
+            return path[len(prefix) + 1:]
+    return path
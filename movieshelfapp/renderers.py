@@ -0,0 +1,48 @@
+"""
+orjson-based JSON renderer, a drop-in for DRF's JSONRenderer.
+
+orjson serializes the dicts, lists, strings, numbers, datetimes and UUIDs
+serializers produce natively and several times faster than the stdlib
+encoder; the few remaining types DRF's encoder knows about go through
+_default().
+"""
+import datetime
+import decimal
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+from .instrumentation import timed
+
+OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, '__iter__'):  # sets, querysets, generators
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(data):
+    return orjson.dumps(data, default=_default, option=OPTIONS)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None  # always UTF-8, like DRF's JSONRenderer
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        with timed('json'):
+            return dumps(data)
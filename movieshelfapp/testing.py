@@ -0,0 +1,66 @@
+"""Test helpers shared by the app test suites."""
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    Assertions that keep per-endpoint query counts under a fixed budget.
+
+    Use together with django.test.TestCase:
+
+        with self.assertQueryBudget(3):
+            self.client.get('/api/watchlist/')
+
+        self.assertNoQueryGrowth(lambda: self.client.get(url), grow=add_items)
+
+    Savepoint statements are not counted: they come from TestCase wrapping
+    every test in a transaction, not from the code under test.
+    """
+
+    def assertQueryBudget(self, budget, using=DEFAULT_DB_ALIAS):
+        return _QueryBudgetContext(self, budget, connections[using])
+
+    def assertNoQueryGrowth(self, call, grow, using=DEFAULT_DB_ALIAS):
+        """Fail if ``call`` runs more queries after ``grow`` added more rows (N+1)"""
+        connection = connections[using]
+        with CaptureQueriesContext(connection) as before:
+            call()
+        grow()
+        with CaptureQueriesContext(connection) as after:
+            call()
+        before, after = _counted(before.captured_queries), _counted(after.captured_queries)
+        if len(after) > len(before):
+            self.fail(
+                f"Query count grew from {len(before)} to {len(after)} with more rows:\n"
+                + _format_queries(after)
+            )
+
+
+class _QueryBudgetContext(CaptureQueriesContext):
+    def __init__(self, test_case, budget, connection):
+        self.test_case = test_case
+        self.budget = budget
+        super().__init__(connection)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        super().__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return
+        queries = _counted(self.captured_queries)
+        if len(queries) > self.budget:
+            self.test_case.fail(
+                f"{len(queries)} queries executed, budget is {self.budget}:\n"
+                + _format_queries(queries)
+            )
+
+
+def _counted(queries):
+    return [
+        q for q in queries
+        if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+    ]
+
+
+def _format_queries(queries):
+    return '\n'.join(f"{i}. {q['sql']}" for i, q in enumerate(queries, start=1))
@@ -0,0 +1,247 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.views import View
+from gunicorn.app.base import Application
+from gunicorn.config import Config
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from movies import identity
+from movies.admin import MovieAdmin
+from movies.models import Movie, TrendingMovie
+from watchlist.models import WatchlistItem
+from . import db_router, warmup
+from .admin import EstimatedCountPaginator
+from .middleware import CompressionMiddleware, ReplicaRoutingMiddleware, negotiate_encoding
+
+User = get_user_model()
+
+
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        aliases = patch.object(db_router, 'replica_aliases', return_value=['replica'])
+        aliases.start()
+        self.addCleanup(aliases.stop)
+        self.user = User.objects.create_user(email='route@example.com', username='route', password='pw-for-tests-123')
+        self.auth = f"Bearer {RefreshToken.for_user(self.user).access_token}"
+        self.factory = RequestFactory()
+
+    def route(self, method, view_class):
+        """The alias a Movie read goes to inside ``view_class``, served through the middleware"""
+        seen = {}
+
+        def view(request):
+            seen['read'] = router.db_for_read(Movie)
+            seen['user'] = router.db_for_read(User)
+            return HttpResponse()
+
+        view.view_class = view_class
+        request = getattr(self.factory, method)('/', HTTP_AUTHORIZATION=self.auth)
+
+        def handler(request):
+            # What Django's handler does between the middleware's __call__ and the view.
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(handler)
+        middleware(request)
+        return seen
+
+    def test_router_defaults_to_the_primary(self):
+        self.assertEqual(router.db_for_read(Movie), 'default')
+        with db_router.replicas_allowed(True):
+            self.assertEqual(router.db_for_read(Movie), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Movie), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'movies'))
+
+    def test_only_opted_in_views_read_from_replicas(self):
+        class ReadHeavy(View):
+            replica_reads = True
+
+        self.assertEqual(self.route('get', ReadHeavy), {'read': 'replica', 'user': 'default'})
+        self.assertEqual(self.route('get', View)['read'], 'default')
+        self.assertEqual(self.route('post', ReadHeavy)['read'], 'default')
+        self.assertEqual(router.db_for_read(Movie), 'default')
+
+    def test_reads_stick_to_the_primary_after_a_write(self):
+        class ReadHeavy(View):
+            replica_reads = True
+
+        self.route('post', ReadHeavy)
+        self.assertTrue(db_router.is_pinned(self.user.pk))
+        self.assertEqual(self.route('get', ReadHeavy)['read'], 'default')
+        cache.clear()
+        self.assertEqual(self.route('get', ReadHeavy)['read'], 'replica')
+
+
+class WarmUpTests(TransactionTestCase):
+    def test_warm_up_primes_indexes_and_closes_connections(self):
+        movie = Movie.objects.create(tmdb_id='tt0068646', imdb_id='tt0068646', title='The Godfather')
+        TrendingMovie.objects.create(rank=1, movie=movie, score=1.0, computed_at=timezone.now())
+        identity.clear()
+        # Freezing would move this test process's objects out of the collector for good.
+        database = connections['default']
+        with (
+            patch('gc.freeze'),
+            patch.object(warmup.logger, 'warning') as warning,
+            patch.object(database, 'close', wraps=database.close) as close,
+        ):
+            warmup.warm_up()
+        warning.assert_not_called()
+        close.assert_called_once()  # SQLite keeps in-memory test databases open regardless
+        with self.assertNumQueries(0):
+            self.assertEqual(identity.resolve('imdb', 'tt0068646'), movie.pk)
+
+
+
+class GunicornConfigTests(SimpleTestCase):
+    def test_config_file_loads(self):
+        class ConfigFile(Application):
+            def __init__(self):  # no command line to parse
+                self.cfg = Config()
+
+        app = ConfigFile()
+        # Every module-level name that matches a gunicorn setting is applied, `config` included.
+        names = app.load_config_from_file(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+        self.assertIs(app.cfg.on_starting, names['on_starting'])
+
+class CompressionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='gzip@example.com', username='gzip', password='pw-for-tests-123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        for n in range(10):
+            movie = Movie.objects.create(tmdb_id=f"tt{n:07d}", imdb_id=f"tt{n:07d}", title=f"Movie {n}")
+            WatchlistItem.objects.create(user=self.user, movie=movie)
+
+    def test_large_responses_are_gzipped(self):
+        response = self.client.get('/api/watchlist/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 10)
+
+        plain = self.client.get('/api/watchlist/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(plain.content)['count'], 10)
+
+    def test_streams_are_not_compressed(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        stream = StreamingHttpResponse(iter([b'data: {}\n\n'] * 1000), content_type='text/event-stream')
+        response = CompressionMiddleware(lambda request: stream)(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        small = CompressionMiddleware(lambda request: HttpResponse(b'{}', content_type='application/json'))(request)
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_html_is_not_compressed(self):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        page = HttpResponse(b'<p>csrfmiddlewaretoken</p>' * 100, content_type='text/html; charset=utf-8')
+        response = CompressionMiddleware(lambda request: page)(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_negotiation_follows_q_values(self):
+        self.assertEqual(negotiate_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate_encoding('br;q=0, gzip;q=0.5'), 'gzip')
+        self.assertIsNone(negotiate_encoding('identity'))
+        self.assertIsNone(negotiate_encoding('gzip;q=0'))
+
+
+class ProfilingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='profile@example.com', username='profile', password='pw-for-tests-123'
+        )
+        self.profiles = tempfile.TemporaryDirectory()
+        self.addCleanup(self.profiles.cleanup)
+        dirs = override_settings(PROFILING_DIR=self.profiles.name, PROFILING_INTERVAL_MS=1)
+        dirs.enable()
+        self.addCleanup(dirs.disable)
+
+    def get(self, **headers):
+        token = RefreshToken.for_user(self.user).access_token
+        return self.client.get('/api/watchlist/', HTTP_AUTHORIZATION=f"Bearer {token}", **headers)
+
+    def test_staff_can_profile_a_request(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.get(HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        with open(os.path.join(self.profiles.name, f"{response['X-Profile']}.json")) as fh:
+            tags = json.load(fh)
+        self.assertEqual((tags['view'], tags['status']), ('watchlist-list', 200))
+        self.assertGreater(tags['db_queries'], 0)
+        self.assertTrue(os.path.exists(os.path.join(self.profiles.name, f"{response['X-Profile']}.folded")))
+
+    def test_others_cannot(self):
+        response = self.get(HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(os.listdir(self.profiles.name), [])
+
+    def test_tokens_of_inactive_users_are_not_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+        token = RefreshToken.for_user(self.user).access_token
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/movies/search/?profile=1', HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('X-Profile', response)
+
+    def test_old_profiles_are_pruned(self):
+        self.user.is_staff = True
+        self.user.save()
+        with self.settings(PROFILING_MAX_FILES=2):
+            for _ in range(3):
+                self.get(HTTP_X_PROFILE='1')
+        self.assertEqual(len(os.listdir(self.profiles.name)), 4)
+
+
+class LargeTableAdminTests(TestCase):
+    """LargeTableAdminMixin, through the movies changelist (ordered by -id)"""
+
+    def setUp(self):
+        admin = User.objects.create_superuser(email='admin@example.com', username='admin', password='pw-for-tests-123')
+        self.client.force_login(admin)
+        self.movies = [
+            Movie.objects.create(tmdb_id=f"tt{n:07d}", imdb_id=f"tt{n:07d}", title=f"Movie {n}") for n in range(5)
+        ]
+
+    def titles(self, response):
+        return [movie.title for movie in response.context['cl'].result_list]
+
+    def test_pages_continue_after_the_last_row(self):
+        with patch.object(MovieAdmin, 'list_per_page', 2):
+            first = self.client.get('/admin/movies/movie/')
+            self.assertEqual(self.titles(first), ['Movie 4', 'Movie 3'])
+            self.assertEqual(first.context['cl'].next_url, f"?after={self.movies[3].pk}")
+            second = self.client.get(f"/admin/movies/movie/{first.context['cl'].next_url}")
+            self.assertEqual(self.titles(second), ['Movie 2', 'Movie 1'])
+            last = self.client.get(f"/admin/movies/movie/{second.context['cl'].next_url}")
+            self.assertEqual(self.titles(last), ['Movie 0'])
+            self.assertIsNone(last.context['cl'].next_url)
+
+    def test_counts_stop_at_the_limit(self):
+        with patch.object(EstimatedCountPaginator, 'COUNT_LIMIT', 3):
+            response = self.client.get('/admin/movies/movie/')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        self.assertContains(response, 'Counts are approximate.')
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get('/admin/movies/movie/', {'after': 'nope'})
+        self.assertRedirects(response, '/admin/movies/movie/?e=1', fetch_redirect_response=False)
@@ -0,0 +1,118 @@
+"""
+Pre-fork warm-up for gunicorn's master process (see gunicorn.conf.py).
+
+With preload_app the master imports the Django app once; warm_up() then
+does the work every worker would otherwise repeat lazily on its first
+requests - populating the URL resolver, building serializer fields,
+loading simplejwt and the HTTP client stack, filling the in-process movie
+indexes and loading the movie dataset - and finally freezes the garbage
+collector so the resulting objects stay in pages the forked workers share
+copy-on-write.
+
+It must not leave database connections open: they would be shared by
+every worker after the fork.
+"""
+import gc
+import logging
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+# Movies whose IDs are put in the identity map before forking.
+IDENTITY_PRIME_SIZE = 1000
+
+
+def warm_up():
+    started = time.perf_counter()
+    steps = {}
+    for name, step in (
+        ('urls', _compile_urls),
+        ('serializers', _build_serializers),
+        ('auth', _load_auth),
+        ('http', _load_http_client),
+        ('indexes', _prime_indexes),
+    ):
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            # A cold worker is slower, not broken; never refuse to start over this.
+            logger.warning("Warm-up step %s failed", name, exc_info=True)
+        steps[name] = round((time.perf_counter() - step_started) * 1000, 1)
+    _close_database_connections()
+
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        "Warm-up done in %.0f ms (%s), %d objects frozen",
+        (time.perf_counter() - started) * 1000,
+        ', '.join(f"{name} {ms} ms" for name, ms in steps.items()),
+        gc.get_freeze_count(),
+    )
+
+
+def _close_database_connections():
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+        # A psycopg pool keeps connections and threads of its own; let each
+        # worker open a fresh one. (Checked first: .pool would create it.)
+        if connection.alias in getattr(connection, '_connection_pools', ()):
+            connection.close_pool()
+
+
+def _compile_urls():
+    """Import every view and compile every route pattern"""
+    resolver = get_resolver()
+    resolver.reverse_dict  # populates the resolver
+    pending = list(resolver.url_patterns)
+    while pending:
+        pattern = pending.pop()
+        pattern.pattern.regex  # compiled lazily otherwise
+        pending.extend(getattr(pattern, 'url_patterns', ()))
+
+
+def _build_serializers():
+    """Build the field maps of every serializer the views use"""
+    from rest_framework.serializers import Serializer
+
+    from movies import serializers as movie_serializers
+    from users import serializers as user_serializers
+    from watchlist import serializers as watchlist_serializers
+
+    for module in (movie_serializers, user_serializers, watchlist_serializers):
+        for value in vars(module).values():
+            if isinstance(value, type) and issubclass(value, Serializer) and value.__module__ == module.__name__:
+                value().fields
+
+
+def _load_auth():
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.state import token_backend
+
+    JWTAuthentication()
+    token_backend.get_leeway()
+
+
+def _load_http_client():
+    """Import the requests/urllib3 stack and the CA bundle used for OMDb and TMDB"""
+    import ssl
+
+    import requests
+    from requests.utils import DEFAULT_CA_BUNDLE_PATH
+
+    requests.Session().get_adapter('https://')
+    ssl.create_default_context(cafile=DEFAULT_CA_BUNDLE_PATH)
+
+
+def _prime_indexes():
+    from movies import fuzzy, identity, providers
+    from movies.models import Movie, TrendingMovie
+
+    fuzzy.prime()
+    providers.prime()
+    trending = TrendingMovie.objects.values_list('movie_id', flat=True)[:IDENTITY_PRIME_SIZE]
+    for movie in Movie.objects.filter(pk__in=list(trending)).only('pk', 'imdb_id', 'tmdb_id'):
+        identity.remember(movie)
@@ -1,14 +1,17 @@
 from django.contrib import admin
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from movieshelfapp.admin import LargeTableAdminMixin
 from .models import User
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
     model = User
     list_display = ('email', 'username', 'is_staff', 'is_active')
     list_filter = ('is_staff', 'is_active', 'is_superuser')
+    # icontains on both is backed by trigram indexes (migration 0002).
     search_fields = ('email', 'username')
+    # Unique, so the changelist can continue after the last email shown.
     ordering = ('email',)
 
     fieldsets = (
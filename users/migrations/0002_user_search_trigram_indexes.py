@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from movieshelfapp.migration_helpers import run_on_postgresql
+
+# Trigram indexes for the admin's user search. Django's icontains compares
+# UPPER(column) on PostgreSQL, so the indexes are over that expression.
+# Built concurrently so the users table stays writable; PostgreSQL only.
+CREATE_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_upper_trgm_idx '
+    'ON users USING gin ((UPPER(email::text)) gin_trgm_ops)',
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS users_username_upper_trgm_idx '
+    'ON users USING gin ((UPPER(username::text)) gin_trgm_ops)',
+]
+DROP_INDEXES = [
+    'DROP INDEX CONCURRENTLY IF EXISTS users_email_upper_trgm_idx',
+    'DROP INDEX CONCURRENTLY IF EXISTS users_username_upper_trgm_idx',
+]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_postgresql(CREATE_INDEXES), run_on_postgresql(DROP_INDEXES)),
+    ]
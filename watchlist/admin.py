@@ -1,3 +1,38 @@
 from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db.models import Q
 
-# Register your models here.
+from movies.models import Movie
+from movieshelfapp.admin import LargeTableAdminMixin
+from .models import WatchlistItem
+
+User = get_user_model()
+
+
+@admin.register(WatchlistItem)
+class WatchlistItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    # Users and movies whose email or title match a search; broader searches are cut off.
+    SEARCH_MATCH_LIMIT = 1000
+
+    list_display = ('id', 'user', 'movie', 'is_watched', 'rating', 'added_at')
+    list_select_related = ('user', 'movie')
+    list_filter = ('is_watched',)
+    raw_id_fields = ('user', 'movie')
+    search_fields = ('user__email', 'movie__title')
+    search_help_text = 'User email or movie title'
+    ordering = ('-id',)
+    readonly_fields = ('added_at',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Match users and movies on their own trigram indexes first, then look
+        the items up by user_id and movie_id, rather than filtering a join
+        of all three tables.
+        """
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        limit = self.SEARCH_MATCH_LIMIT
+        user_ids = list(User.objects.filter(email__icontains=term).values_list('pk', flat=True)[:limit])
+        movie_ids = list(Movie.objects.filter(title__icontains=term).values_list('pk', flat=True)[:limit])
+        return queryset.filter(Q(user_id__in=user_ids) | Q(movie_id__in=movie_ids)), False
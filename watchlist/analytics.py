@@ -0,0 +1,230 @@
+"""
+Offline watchlist analytics computed with NumPy.
+
+The reports product asks for (rating distribution per genre, watch
+completion by release decade, director leaderboard) group by attributes of
+the movie, including the JSON ``genres`` list, which the database can
+only aggregate row by row. Here both tables are streamed instead, with a
+server-side cursor on PostgreSQL, preferably from a replica:
+
+1. movies, in primary key order, become columnar arrays: sorted ids, a
+   decade and a dictionary-encoded director per movie, and (movie, genre)
+   pairs for the genre lists;
+2. watchlist items are read in chunks. Each chunk is joined to the movies
+   with a binary search over the sorted ids and folded into per-movie
+   counters (items, watched items, ratings histogram) with np.bincount.
+
+Memory is bounded by the number of movies, not items. The reports are
+then group-bys over the per-movie counters.
+"""
+from datetime import datetime, timezone
+
+from .models import WatchlistItem
+from movies.models import Movie
+
+try:
+    import numpy as np
+except ImportError:  # optional; only the reports need it
+    np = None
+
+# Ratings are 1-5; column 0 of the histogram counts unrated items.
+RATINGS = 6
+
+
+class MovieColumns:
+    """Columnar movie attributes, indexed by position in ``ids``"""
+
+    def __init__(self, ids, decades, directors, director_names, genre_movies, genre_codes, genre_names):
+        self.ids = ids
+        self.decades = decades
+        self.directors = directors
+        self.director_names = director_names
+        self.genre_movies = genre_movies
+        self.genre_codes = genre_codes
+        self.genre_names = genre_names
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _chunks(iterator, size):
+    chunk = []
+    for row in iterator:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _encoder(names):
+    """Dictionary encoding: value -> code, assigning codes in order of first appearance"""
+    codes = {}
+
+    def encode(value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    return encode
+
+
+def load_movies(using, chunk_size):
+    director_names, genre_names = [], []
+    director_code, genre_code = _encoder(director_names), _encoder(genre_names)
+    ids, decades, directors, genre_movies, genre_codes = [], [], [], [], []
+    rows = (
+        Movie.objects.using(using).order_by('pk')
+        .values_list('pk', 'release_date', 'director', 'genres')
+        .iterator(chunk_size=chunk_size)
+    )
+    offset = 0
+    for chunk in _chunks(rows, chunk_size):
+        ids.append(np.fromiter((row[0] for row in chunk), dtype=np.int64, count=len(chunk)))
+        decades.append(np.fromiter(
+            (row[1].year // 10 * 10 if row[1] else 0 for row in chunk), dtype=np.int16, count=len(chunk)
+        ))
+        directors.append(np.fromiter(
+            (director_code(row[2] or '') for row in chunk), dtype=np.int32, count=len(chunk)
+        ))
+        pairs = [(offset + i, genre_code(genre)) for i, row in enumerate(chunk) for genre in row[3] or ()]
+        genre_movies.append(np.fromiter((movie for movie, _ in pairs), dtype=np.int64, count=len(pairs)))
+        genre_codes.append(np.fromiter((genre for _, genre in pairs), dtype=np.int32, count=len(pairs)))
+        offset += len(chunk)
+
+    def joined(parts, dtype):
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+    return MovieColumns(
+        joined(ids, np.int64), joined(decades, np.int16), joined(directors, np.int32),
+        np.array(director_names, dtype=str), joined(genre_movies, np.int64), joined(genre_codes, np.int32),
+        np.array(genre_names, dtype=str),
+    )
+
+
+def count_items(movies, using, chunk_size):
+    """Per-movie (items, watched items, ratings histogram) over the whole watchlist table"""
+    n = len(movies)
+    shelved = np.zeros(n, dtype=np.int64)
+    watched = np.zeros(n, dtype=np.int64)
+    ratings = np.zeros(n * RATINGS, dtype=np.int64)
+    rows = (
+        WatchlistItem.objects.using(using).order_by()
+        .values_list('movie_id', 'is_watched', 'rating')
+        .iterator(chunk_size=chunk_size)
+    )
+    total = 0
+    for chunk in _chunks(rows, chunk_size):
+        movie_ids = np.fromiter((row[0] for row in chunk), dtype=np.int64, count=len(chunk))
+        is_watched = np.fromiter((row[1] for row in chunk), dtype=bool, count=len(chunk))
+        rating = np.fromiter((row[2] or 0 for row in chunk), dtype=np.int64, count=len(chunk))
+        index = np.searchsorted(movies.ids, movie_ids)
+        # Movies created after they were read are left out.
+        known = index < n
+        known[known] = movies.ids[index[known]] == movie_ids[known]
+        index, is_watched, rating = index[known], is_watched[known], rating[known]
+        shelved += np.bincount(index, minlength=n)
+        watched += np.bincount(index[is_watched], minlength=n)
+        ratings += np.bincount(index * RATINGS + rating, minlength=n * RATINGS)
+        total += int(known.sum())
+    return shelved, watched, ratings.reshape(n, RATINGS), total
+
+
+def genre_ratings(movies, ratings):
+    """Items per (genre, rating); column 0 counts unrated items"""
+    counts = np.stack([
+        np.bincount(movies.genre_codes, weights=ratings[movies.genre_movies, column], minlength=len(movies.genre_names))
+        for column in range(RATINGS)
+    ], axis=1).astype(np.int64)
+    return {'genre': movies.genre_names, 'counts': counts, 'mean_rating': _mean_rating(counts)}
+
+
+def decade_completion(movies, shelved, watched):
+    """Watched share of shelved items by the movies' release decade (0: unknown)"""
+    decades, codes = np.unique(movies.decades, return_inverse=True)
+    items = np.bincount(codes, weights=shelved, minlength=len(decades)).astype(np.int64)
+    done = np.bincount(codes, weights=watched, minlength=len(decades)).astype(np.int64)
+    return {'decade': decades, 'items': items, 'watched': done, 'completion': _ratio(done, items)}
+
+
+def director_leaderboard(movies, shelved, watched, ratings, top, prior):
+    """
+    Directors by items on shelves, with a Bayesian average rating that pulls
+    directors with few ratings towards the overall mean by ``prior`` ratings
+    """
+    size = len(movies.director_names)
+    items = np.bincount(movies.directors, weights=shelved, minlength=size).astype(np.int64)
+    done = np.bincount(movies.directors, weights=watched, minlength=size).astype(np.int64)
+    counts = np.stack([
+        np.bincount(movies.directors, weights=ratings[:, column], minlength=size) for column in range(RATINGS)
+    ], axis=1).astype(np.int64)
+    rated = counts[:, 1:].sum(axis=1)
+    rating_sum = counts[:, 1:] @ np.arange(1, RATINGS)
+    overall = rating_sum.sum() / max(rated.sum(), 1)
+    score = (prior * overall + rating_sum) / (prior + rated)
+    named = movies.director_names != ''
+    order = np.lexsort((-score, -items))  # most shelved first, then best rated
+    order = order[named[order]][:top]
+    return {
+        'director': movies.director_names[order],
+        'items': items[order],
+        'watched': done[order],
+        'ratings': rated[order],
+        'mean_rating': _ratio(rating_sum[order], rated[order], empty=np.nan),
+        'bayesian_rating': score[order],
+    }
+
+
+def _mean_rating(counts):
+    rated = counts[:, 1:].sum(axis=1)
+    return _ratio(counts[:, 1:] @ np.arange(1, RATINGS), rated, empty=np.nan)
+
+
+def _ratio(numerator, denominator, empty=0.0):
+    numerator = numerator.astype(np.float64)
+    return np.divide(numerator, denominator, out=np.full(len(numerator), empty), where=denominator > 0)
+
+
+def build(using, chunk_size=50000, top=100, prior=10):
+    """All reports as {report: {column: array}}, plus a ``meta`` entry"""
+    movies = load_movies(using, chunk_size)
+    shelved, watched, ratings, items = count_items(movies, using, chunk_size)
+    return {
+        'genre_ratings': genre_ratings(movies, ratings),
+        'decade_completion': decade_completion(movies, shelved, watched),
+        'director_leaderboard': director_leaderboard(movies, shelved, watched, ratings, top, prior),
+        'meta': {
+            'generated_at': np.array([datetime.now(timezone.utc).isoformat()]),
+            'movies': np.array([len(movies)]),
+            'items': np.array([items]),
+        },
+    }
+
+
+def write_npz(reports, path):
+    """One compressed .npz with a ``<report>.<column>`` array per column"""
+    np.savez_compressed(path, **{
+        f"{report}.{column}": values for report, columns in reports.items() for column, values in columns.items()
+    })
+
+
+def write_parquet(reports, directory):
+    """One Parquet file per report (needs pyarrow)"""
+    import os
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+    for report, columns in reports.items():
+        table = pa.table({
+            # 2-D columns (per-rating counts) become one column per rating.
+            name: values for column, array in columns.items()
+            for name, values in (
+                [(f"{column}_{i}", array[:, i]) for i in range(array.shape[1])] if array.ndim == 2 else [(column, array)]
+            )
+        })
+        pq.write_table(table, os.path.join(directory, f"{report}.parquet"), compression='zstd')
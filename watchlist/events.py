@@ -0,0 +1,112 @@
+"""
+Watchlist change notifications.
+
+Every committed watchlist write publishes a small event for its owner:
+``{"upserted": [ids], "deleted": [ids]}``. Clients subscribed through the
+event stream (see watchlist_events in views.py) react by calling the delta
+sync endpoint instead of polling.
+
+Events go through Redis pub/sub when REDIS_URL is set, so subscribers on
+any worker see writes made on any other; otherwise an in-process broker is
+used, which is enough for a single ASGI process.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 100
+RESYNC = {'resync': True}
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(_deliver, queue, event)
+
+    async def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[user_id].add(subscriber)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(subscriber)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+
+class RedisBroker:
+    def __init__(self, url):
+        import redis
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+        self._errors = redis.RedisError
+
+    @staticmethod
+    def channel(user_id):
+        return f"watchlist-events:{user_id}"
+
+    def publish(self, user_id, event):
+        try:
+            self._client.publish(self.channel(user_id), json.dumps(event))
+        except self._errors:
+            # The write itself has committed; subscribers catch up on their next sync.
+            logger.warning("Could not publish watchlist event for user %s", user_id, exc_info=True)
+
+    async def subscribe(self, user_id):
+        import redis.asyncio
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.channel(user_id))
+        try:
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    yield json.loads(message['data'])
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+def _deliver(queue, event):
+    """Queue an event; a subscriber that fell behind is told to resync instead"""
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = RedisBroker(settings.REDIS_URL) if settings.REDIS_URL else InProcessBroker()
+        return _broker
+
+
+def publish_changes(user_id, upserted=(), deleted=(), using=None):
+    """Notify the user's subscribers once the current transaction commits"""
+    event = {'upserted': list(upserted), 'deleted': list(deleted)}
+    transaction.on_commit(lambda: get_broker().publish(user_id, event), using=using)
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from watchlist import orphans
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete movies that are on no watchlist, not trending and untouched for MOVIE_RETENTION_DAYS, '
+        'in small keyset-paged batches'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.MOVIE_RETENTION_DAYS,
+                            help='only movies unreferenced and unchanged for this many days')
+        parser.add_argument('--scan-size', type=int, default=5000, help='movies examined per window')
+        parser.add_argument('--batch-size', type=int, default=500, help='movies deleted per transaction')
+        parser.add_argument('--sleep', type=float, default=0.1, help='pause between batches, in seconds')
+        parser.add_argument('--limit', type=int, default=None, help='stop after this many orphans')
+        parser.add_argument('--archive', help='append the deleted movies to this file as JSON lines')
+        parser.add_argument('--dry-run', action='store_true', help='count the orphans without deleting')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        def progress(state):
+            self.stdout.write(
+                f"  up to id {state.scanned_to}: {state.found} orphans found, {state.deleted} deleted "
+                f"({state.elapsed:.1f}s)"
+            )
+
+        archive = open(options['archive'], 'a') if options['archive'] else None
+        try:
+            state = orphans.collect(
+                cutoff, scan_size=options['scan_size'], batch_size=options['batch_size'],
+                pause=options['sleep'], limit=options['limit'], dry_run=options['dry_run'],
+                archive=archive, progress=progress,
+            )
+        finally:
+            if archive is not None:
+                archive.close()
+        if options['dry_run']:
+            self.stdout.write(f"Found {state.found} orphaned movies (dry run, nothing deleted)")
+        else:
+            self.stdout.write(
+                f"Deleted {state.deleted} of {state.found} orphaned movies in {state.elapsed:.1f}s"
+                + (f"; {state.skipped_batches} busy batches skipped" if state.skipped_batches else '')
+            )
@@ -0,0 +1,219 @@
+import json
+import random
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from movies.models import Movie
+from watchlist import popularity
+from watchlist.models import WatchlistItem
+
+User = get_user_model()
+
+# Synthetic rows are recognisable by these, so --replace can find them.
+EMAIL_DOMAIN = 'synthetic.movieshelf.test'
+TMDB_PREFIX = 'synthetic-'
+PASSWORD = 'synthetic-password'
+
+GENRES = ('Drama', 'Comedy', 'Action', 'Thriller', 'Romance', 'Crime', 'Horror', 'Adventure',
+          'Sci-Fi', 'Animation', 'Documentary', 'Fantasy', 'Mystery', 'Family', 'War', 'Western')
+GENRE_WEIGHTS = (30, 22, 16, 14, 12, 11, 8, 8, 7, 5, 4, 4, 4, 3, 2, 1)
+WORDS = ('the', 'last', 'night', 'city', 'love', 'war', 'dark', 'secret', 'house', 'king', 'dead',
+         'girl', 'man', 'road', 'star', 'blood', 'summer', 'lost', 'game', 'river', 'shadow', 'dream',
+         'fire', 'ghost', 'heart', 'island', 'return', 'story', 'world', 'winter', 'wild', 'black')
+NAMES = ('Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+         'Robin', 'Charlie', 'Drew', 'Emery', 'Hayden', 'Kai', 'Logan', 'Parker', 'Reese', 'Skyler')
+SURNAMES = ('Smith', 'Garcia', 'Chen', 'Okafor', 'Novak', 'Silva', 'Kim', 'Moreau', 'Rossi', 'Haas',
+            'Ivanova', 'Nakamura', 'Patel', 'Larsen', 'Murphy', 'Costa', 'Weber', 'Ali', 'Berg', 'Diaz')
+# Watched items get a rating 70% of the time, skewed high like real ratings.
+RATINGS = (1, 2, 3, 4, 5)
+RATING_WEIGHTS = (4, 8, 22, 38, 28)
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, movies and watchlist items for scale testing: Zipf-distributed '
+        'movie popularity, log-normal shelf sizes plus a few power users, realistic ratings. '
+        'Deterministic for a given --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--movies', type=int, default=50000)
+        parser.add_argument('--items', type=int, default=1000000, help='watchlist items in total')
+        parser.add_argument('--power-users', type=int, default=20)
+        parser.add_argument('--power-user-items', type=int, default=10000)
+        parser.add_argument('--zipf', type=float, default=1.1, help='exponent of the movie popularity skew')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=20000, help='rows per COPY / INSERT batch')
+        parser.add_argument('--replace', action='store_true', help='delete earlier synthetic data first')
+
+    def handle(self, *args, **options):
+        if options['power_users'] > options['users']:
+            raise CommandError('--power-users cannot exceed --users')
+        if options['replace']:
+            self.delete_synthetic()
+        elif User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").exists():
+            raise CommandError('Synthetic data already exists; pass --replace to regenerate it')
+
+        rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        # A fixed reference time keeps the output identical between runs.
+        self.now = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+
+        started = time.perf_counter()
+        movie_ids = self.step('movies', lambda: self.create_movies(options['movies'], rng))
+        user_ids = self.step('users', lambda: self.create_users(options['users'], rng))
+        items = self.step('watchlist items', lambda: self.create_items(user_ids, movie_ids, rng, options))
+        self.step('movie counters', lambda: popularity.rebuild_stats())
+        self.stdout.write(
+            f"Generated {len(movie_ids)} movies, {len(user_ids)} users and {items} watchlist items "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+    def step(self, name, run):
+        started = time.perf_counter()
+        result = run()
+        self.stdout.write(f"  {name}: {time.perf_counter() - started:.1f}s")
+        return result
+
+    def delete_synthetic(self):
+        users = User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}")
+        items = WatchlistItem.objects.filter(user__in=users)
+        # Straight DELETE: no tombstones, events or counter updates for test data.
+        sql, params = items.values('pk').query.get_compiler(connection=connection).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(WatchlistItem._meta.db_table)} WHERE id IN ({sql})", params
+            )
+        users.delete()
+        Movie.objects.filter(tmdb_id__startswith=TMDB_PREFIX).delete()
+
+    def create_movies(self, count, rng):
+        def rows():
+            for rank in range(count):
+                title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+                # Popular titles (low rank) have many votes and good ratings.
+                yield (
+                    f"{TMDB_PREFIX}{rank}",
+                    f"tt9{rank:08d}",
+                    title,
+                    ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))).capitalize() + '.',
+                    date(1930, 1, 1) + timedelta(days=int(rng.triangular(0, 35000, 33000))),
+                    f"https://img.example.com/poster/{rank}.jpg",
+                    '',
+                    round(min(9.5, max(1.0, rng.gauss(7.2 - 1.2 * rank / count, 1.0))), 1),
+                    int(2_000_000 / (rank + 1) ** 0.9 * rng.uniform(0.5, 1.5)),
+                    int(min(240, max(60, rng.gauss(108, 20)))),
+                    sorted(set(rng.choices(GENRES, weights=GENRE_WEIGHTS, k=rng.randint(1, 3)))),
+                    f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}",
+                    [f"{rng.choice(NAMES)} {rng.choice(SURNAMES)}" for _ in range(rng.randint(3, 10))],
+                    False,
+                    self.now,
+                    self.now,
+                )
+
+        self.insert(Movie, (
+            'tmdb_id', 'imdb_id', 'title', 'overview', 'release_date', 'poster_path', 'backdrop_path',
+            'vote_average', 'vote_count', 'runtime', 'genres', 'director', 'cast', 'is_placeholder',
+            'created_at', 'updated_at',
+        ), rows())
+        # Inserted in rank order, so most popular first.
+        return list(Movie.objects.filter(tmdb_id__startswith=TMDB_PREFIX).order_by('pk').values_list('pk', flat=True))
+
+    def create_users(self, count, rng):
+        password = make_password(PASSWORD, salt='synthetic')  # hashed once; PBKDF2 per user takes minutes
+
+        def rows():
+            for n in range(count):
+                joined = self.now - timedelta(days=rng.uniform(0, 5 * 365))
+                yield (
+                    password, None, False, f"synthetic{n}", rng.choice(NAMES), rng.choice(SURNAMES),
+                    f"synthetic{n}@{EMAIL_DOMAIN}", False, True, joined, joined, joined,
+                )
+
+        self.insert(User, (
+            'password', 'last_login', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+            'is_staff', 'is_active', 'date_joined', 'created_at', 'updated_at',
+        ), rows())
+        return list(User.objects.filter(email__endswith=f"@{EMAIL_DOMAIN}").order_by('pk').values_list('pk', flat=True))
+
+    def create_items(self, user_ids, movie_ids, rng, options):
+        # movie_ids is ordered most popular first; rank k is picked with weight 1 / (k + 1) ** s.
+        cum_weights = list(accumulate(1 / (rank + 1) ** options['zipf'] for rank in range(len(movie_ids))))
+        power_users = options['power_users']
+        power_size = min(options['power_user_items'], len(movie_ids))
+        remaining = max(0, options['items'] - power_users * power_size)
+        shape = [rng.lognormvariate(0, 1.2) for _ in user_ids[power_users:]]
+        scale = remaining / sum(shape) if shape else 0
+        sizes = [power_size] * power_users + [min(len(movie_ids), max(1, round(s * scale))) for s in shape]
+
+        def shelf(size):
+            if size > len(movie_ids) // 2:
+                return rng.sample(movie_ids, size)
+            picked = {}  # in draw order, so the output does not depend on the ids
+            while len(picked) < size:
+                picked.update(dict.fromkeys(rng.choices(movie_ids, cum_weights=cum_weights, k=size - len(picked))))
+            return picked
+
+        def rows():
+            for user_id, size in zip(user_ids, sizes):
+                for movie_id in shelf(size):
+                    added = self.now - timedelta(days=rng.expovariate(1 / 200))
+                    watched = rng.random() < 0.55
+                    watched_at = added + timedelta(days=rng.expovariate(1 / 30)) if watched else None
+                    if watched_at is not None and watched_at > self.now:
+                        watched_at = self.now
+                    rating = rng.choices(RATINGS, weights=RATING_WEIGHTS)[0] if watched and rng.random() < 0.7 else None
+                    yield (
+                        user_id, movie_id, watched, rating, 'Rewatch soon' if rng.random() < 0.02 else '',
+                        added, watched_at, watched_at or added,
+                    )
+
+        return self.insert(WatchlistItem, (
+            'user', 'movie', 'is_watched', 'rating', 'note', 'added_at', 'watched_at', 'updated_at',
+        ), rows())
+
+    def insert(self, model, field_names, rows):
+        """COPY (PostgreSQL) or multi-row INSERT ``rows`` in chunks; returns the row count"""
+        opts = model._meta
+        fields = [opts.get_field(name) for name in field_names]
+        table = connection.ops.quote_name(opts.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        adapters = [self.adapter(field) for field in fields]
+        total = 0
+        rows = iter(rows)
+        while chunk := list(islice(rows, self.chunk_size)):
+            values = [
+                [value if adapt is None or value is None else adapt(value) for adapt, value in zip(adapters, row)]
+                for row in chunk
+            ]
+            with transaction.atomic(), connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    with cursor.copy(f"COPY {table} ({columns}) FROM STDIN") as copy:
+                        for row in values:
+                            copy.write_row(row)
+                else:
+                    placeholders = ', '.join(['%s'] * len(fields))
+                    cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", values)
+            total += len(chunk)
+        return total
+
+    @staticmethod
+    def adapter(field):
+        """Conversion of a column's Python values for the driver, or None if it takes them as they are"""
+        kind = field.get_internal_type()
+        if kind == 'JSONField':
+            return json.dumps
+        if connection.vendor == 'postgresql':
+            return None
+        if kind == 'DateTimeField':
+            return connection.ops.adapt_datetimefield_value
+        if kind == 'DateField':
+            return connection.ops.adapt_datefield_value
+        return None
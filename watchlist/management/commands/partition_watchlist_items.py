@@ -0,0 +1,67 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from watchlist import partitioning
+
+
+class Command(BaseCommand):
+    help = (
+        'Convert watchlist_items to a table hash-partitioned by user_id, online: prepare the new '
+        'table and its sync trigger, backfill existing rows in batches, then swap the tables. '
+        'Runs every remaining step unless one is named.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--partitions', type=int, default=None,
+                            help='number of hash partitions (default WATCHLIST_PARTITIONS)')
+        parser.add_argument('--prepare', action='store_true')
+        parser.add_argument('--backfill', action='store_true')
+        parser.add_argument('--swap', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--sleep', type=float, default=0.0, help='pause between batches, in seconds')
+        parser.add_argument('--drop-old', action='store_true', help='drop the table kept after the swap')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL')
+        if options['drop_old']:
+            partitioning.drop_old(connection)
+            self.stdout.write(f"Dropped {partitioning.OLD_TABLE}")
+            return
+        steps = [step for step in ('prepare', 'backfill', 'swap') if options[step]] or ['prepare', 'backfill', 'swap']
+        state = partitioning.state(connection)
+        if state == 'partitioned':
+            self.stdout.write(f"{partitioning.TABLE} is already partitioned")
+            return
+
+        if 'prepare' in steps:
+            if state == 'converting':
+                self.stdout.write(f"{partitioning.NEW_TABLE} exists; resuming")
+            else:
+                partitions = options['partitions'] or settings.WATCHLIST_PARTITIONS
+                if partitions < 1:
+                    raise CommandError('Set --partitions or WATCHLIST_PARTITIONS')
+                partitioning.prepare(connection, partitions)
+                self.stdout.write(f"Created {partitioning.NEW_TABLE} with {partitions} partitions")
+        elif state != 'converting':
+            raise CommandError('Run --prepare first')
+
+        if 'backfill' in steps:
+            started = time.perf_counter()
+
+            def progress(copied, last_id):
+                rate = copied / max(time.perf_counter() - started, 1e-9)
+                self.stdout.write(f"  {copied} rows copied, up to id {last_id} ({rate:.0f} rows/s)")
+
+            partitioning.backfill(connection, options['batch_size'], options['sleep'], progress=progress)
+            self.stdout.write(f"Backfill done in {time.perf_counter() - started:.1f}s")
+
+        if 'swap' in steps:
+            partitioning.swap(connection)
+            self.stdout.write(
+                f"{partitioning.TABLE} is now partitioned; the old table is kept as "
+                f"{partitioning.OLD_TABLE} until --drop-old"
+            )
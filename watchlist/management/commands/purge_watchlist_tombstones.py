@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from watchlist.models import WatchlistDeletion
+
+
+class Command(BaseCommand):
+    help = 'Delete watchlist sync tombstones older than WATCHLIST_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=settings.WATCHLIST_TOMBSTONE_RETENTION_DAYS)
+        total = 0
+        while True:
+            batch = list(
+                WatchlistDeletion.objects.filter(deleted_at__lt=cutoff)
+                .values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            total += WatchlistDeletion.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(f"Purged {total} tombstones older than {cutoff:%Y-%m-%d %H:%M}")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from watchlist import popularity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trending movies ranking from the hourly activity counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-stats', action='store_true',
+            help='Also recount every movie\'s shelving, watch and rating counters from the watchlist'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_stats']:
+            popularity.rebuild_stats()
+            self.stdout.write('Rebuilt movie counters from the watchlist')
+        ranked = popularity.refresh_trending()
+        self.stdout.write(f"Ranked {ranked} trending movies")
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movieshelfapp.db_router import PRIMARY, replica_aliases
+from watchlist import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the offline watchlist reports (ratings per genre, completion by decade, director '
+        'leaderboard), streaming both tables into NumPy arrays'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', help='database alias to read; defaults to the first replica, if any')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='rows fetched per round trip')
+        parser.add_argument('--top', type=int, default=100, help='directors in the leaderboard')
+        parser.add_argument('--prior', type=int, default=10,
+                            help='ratings of weight given to the overall mean in the directors\' Bayesian rating')
+        parser.add_argument('--format', choices=('npz', 'parquet'), default='npz',
+                            help='one .npz file, or a directory with a Parquet file per report (needs pyarrow)')
+        parser.add_argument('--output', default='watchlist-reports.npz', help='file (npz) or directory (parquet)')
+
+    def handle(self, *args, **options):
+        if analytics.np is None:
+            raise CommandError('The reports need numpy: pip install numpy')
+        if options['format'] == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError('Parquet output needs pyarrow: pip install pyarrow')
+        using = options['database'] or next(iter(replica_aliases()), PRIMARY)
+        started = time.monotonic()
+        reports = analytics.build(
+            using, chunk_size=options['chunk_size'], top=options['top'], prior=options['prior'],
+        )
+        if options['format'] == 'parquet':
+            analytics.write_parquet(reports, options['output'])
+        else:
+            analytics.write_npz(reports, options['output'])
+        meta = reports['meta']
+        self.stdout.write(
+            f"Wrote reports over {meta['movies'][0]} movies and {meta['items'][0]} watchlist items "
+            f"from {using} to {options['output']} in {time.monotonic() - started:.1f}s"
+        )
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_movie_imdb_id_alter_movie_tmdb_id'),
+        ('watchlist', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WatchlistDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('item_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'watchlist_deletions',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='watchlistitem',
+            index=models.Index(fields=['user', 'updated_at'], name='watchlist_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='watchlistdeletion',
+            index=models.Index(fields=['user_id', 'deleted_at'], name='watchlist_del_user_time_idx'),
+        ),
+    ]
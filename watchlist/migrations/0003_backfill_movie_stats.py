@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:50
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+
+def backfill_movie_stats(apps, schema_editor):
+    WatchlistItem = apps.get_model('watchlist', 'WatchlistItem')
+    MovieStats = apps.get_model('movies', 'MovieStats')
+    totals = WatchlistItem.objects.values('movie_id').annotate(
+        shelved=Count('id'),
+        watched=Count('id', filter=Q(is_watched=True)),
+        rating_total=Sum('rating'),
+        rated=Count('rating'),
+    )
+    MovieStats.objects.bulk_create(
+        (
+            MovieStats(
+                movie_id=row['movie_id'],
+                shelved_count=row['shelved'],
+                watched_count=row['watched'],
+                rating_sum=row['rating_total'] or 0,
+                rating_count=row['rated'],
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_movie_popularity'),
+        ('watchlist', '0002_watchlist_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_movie_stats, migrations.RunPython.noop),
+    ]
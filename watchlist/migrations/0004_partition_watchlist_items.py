@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations
+
+from watchlist import partitioning
+
+
+def partition(apps, schema_editor):
+    # Opt-in and PostgreSQL only. Large tables are better converted ahead of
+    # the deploy with `manage.py partition_watchlist_items`, which this
+    # resumes or skips.
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql' and settings.WATCHLIST_PARTITIONS > 0:
+        partitioning.convert(connection, settings.WATCHLIST_PARTITIONS)
+
+
+class Migration(migrations.Migration):
+    # Each backfill batch commits on its own.
+    atomic = False
+
+    dependencies = [
+        ('watchlist', '0003_backfill_movie_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,110 @@
-from django.db import models
+from django.db import connections, models, router, transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from movies.models import Movie
+from . import popularity
 
 User = get_user_model()
 
+
+class WatchlistItemQuerySet(models.QuerySet):
+    """Set-based writes that run as one statement regardless of row count"""
+
+    RETURNED_FIELDS = ('id', 'is_watched', 'watched_at', 'updated_at')
+
+    def set_watched(self, is_watched):
+        """
+        Mark all matching items watched or unwatched with a single UPDATE and
+        return the rows that changed. watched_at follows WatchlistItem.save:
+        stamped when an item becomes watched, cleared when it is unwatched.
+        Popularity counters are updated in the same transaction.
+        """
+        now = timezone.now()
+        changed = self.exclude(is_watched=is_watched)
+        using, connection, column = changed._write_target()
+        adapted_now = connection.ops.adapt_datetimefield_value(now)
+        if is_watched:
+            watched_at, watched_at_params = f"COALESCE({column('watched_at')}, %s)", [adapted_now]
+        else:
+            watched_at, watched_at_params = 'NULL', []
+        subquery, subquery_params = changed._pk_subquery(using)
+        sql = (
+            f"UPDATE {connection.ops.quote_name(self.model._meta.db_table)} "
+            f"SET {column('is_watched')} = %s, {column('watched_at')} = {watched_at}, "
+            f"{column('updated_at')} = %s "
+            f"WHERE {column('id')} IN ({subquery}) "
+            f"RETURNING {', '.join(column(name) for name in self.RETURNED_FIELDS)}, "
+            f"{column('user')}, {column('movie')}, {column('rating')}"
+        )
+        params = [is_watched, *watched_at_params, adapted_now, *subquery_params]
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            popularity.apply(
+                ((movie_id, (not is_watched, rating), (is_watched, rating))
+                 for *_, movie_id, rating in rows),
+                using
+            )
+            _publish_by_user(((row[0], row[-3]) for row in rows), 'upserted', using)
+        fields = [self.model._meta.get_field(name) for name in self.RETURNED_FIELDS]
+        return [
+            {field.name: field.to_python(value) for field, value in zip(fields, row)}
+            for row in rows
+        ]
+
+    def delete_returning(self):
+        """
+        Delete all matching items with a single DELETE, record their
+        tombstones for delta sync, update the popularity counters and
+        return the deleted ids.
+        """
+        using, connection, column = self._write_target()
+        subquery, params = self._pk_subquery(using)
+        returning = ', '.join(column(name) for name in ('id', 'user', 'movie', 'is_watched', 'rating'))
+        sql = (
+            f"DELETE FROM {connection.ops.quote_name(self.model._meta.db_table)} "
+            f"WHERE {column('id')} IN ({subquery}) RETURNING {returning}"
+        )
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            WatchlistDeletion.objects.using(using).bulk_create(
+                WatchlistDeletion(item_id=item_id, user_id=user_id) for item_id, user_id, *_ in rows
+            )
+            popularity.apply(
+                ((movie_id, (bool(is_watched), rating), None) for *_, movie_id, is_watched, rating in rows),
+                using
+            )
+            _publish_by_user(((item_id, user_id) for item_id, user_id, *_ in rows), 'deleted', using)
+        return [row[0] for row in rows]
+
+    def _write_target(self):
+        using = self._db or router.db_for_write(self.model)
+        connection = connections[using]
+        opts = self.model._meta
+
+        def column(name):
+            return connection.ops.quote_name(opts.get_field(name).column)
+
+        return using, connection, column
+
+    def _pk_subquery(self, using):
+        query = self.order_by().values('pk').query
+        return query.get_compiler(using).as_sql()
+
+
+def _publish_by_user(rows, kind, using):
+    """Publish change events for (item_id, user_id) rows, one per user"""
+    from .events import publish_changes
+    by_user = {}
+    for item_id, user_id in rows:
+        by_user.setdefault(user_id, []).append(item_id)
+    for user_id, item_ids in by_user.items():
+        publish_changes(user_id, using=using, **{kind: item_ids})
+
+
 class WatchlistItem(models.Model):
     RATING_CHOICES = [
         (1, '1 Star'),
@@ -22,18 +123,65 @@ class WatchlistItem(models.Model):
     watched_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = WatchlistItemQuerySet.as_manager()
+
     class Meta:
         db_table = 'watchlist_items'
         unique_together = ('user', 'movie')
         ordering = ['-added_at']
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='watchlist_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.movie.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_counted_state()
+        return instance
+
+    def _remember_counted_state(self):
+        """State last written to the popularity counters, see popularity.py"""
+        if 'is_watched' in self.__dict__ and 'rating' in self.__dict__:
+            self._counted_state = (self.is_watched, self.rating)
+
     def save(self, *args, **kwargs):
         if self.is_watched and not self.watched_at:
             from django.utils import timezone
             self.watched_at = timezone.now()
         elif not self.is_watched:
             self.watched_at = None
-        super().save(*args, **kwargs)
\ No newline at end of file
+
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            if self._state.adding:
+                before = None
+            elif hasattr(self, '_counted_state'):
+                before = self._counted_state
+            else:
+                before = type(self).objects.using(using).filter(pk=self.pk).values_list(
+                    'is_watched', 'rating'
+                ).first()
+            super().save(*args, **kwargs)
+            popularity.apply([(self.movie_id, before, (self.is_watched, self.rating))], using)
+        self._remember_counted_state()
+
+
+class WatchlistDeletion(models.Model):
+    """Tombstone of a deleted watchlist item, served by the delta sync endpoint"""
+    # Plain ids rather than foreign keys: tombstones outlive their rows and
+    # are purged by age (see the purge_watchlist_tombstones command).
+    user_id = models.BigIntegerField()
+    item_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'watchlist_deletions'
+        indexes = [
+            models.Index(fields=['user_id', 'deleted_at'], name='watchlist_del_user_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"user {self.user_id} - item {self.item_id}"
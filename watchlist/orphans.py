@@ -0,0 +1,137 @@
+"""
+Garbage collection of movies nobody references any more.
+
+/api/movies/create/ and the provider chain store movies that are never
+shelved, and removing items from watchlists leaves their movies behind. A
+movie is an orphan once it is on no watchlist, not in the trending ranking,
+and neither changed nor shelved for MOVIE_RETENTION_DAYS.
+
+collect() walks the movies table in primary key windows of ``scan_size``
+rows (keyset paging, so each query reads one index range), picks the
+orphans in each window with NOT EXISTS anti-joins, and deletes them in a
+transaction of their own. The DELETE repeats the anti-joins, so a movie
+shelved in the meantime is kept. On PostgreSQL a short lock_timeout makes
+a batch give up, rather than wait, when a row is busy. The foreign keys are
+checked at commit, so a watchlist item added concurrently to a deleted
+movie rolls the batch back instead of losing the item. A pause between
+batches leaves room for live traffic.
+
+Dependent rows (counters, activity buckets, enrichment jobs) go with their
+movie. The raw DELETE sends no post_delete signals, so after each batch
+commits the deleted movies are dropped from this process's hot movie cache,
+identity map and title index here instead. Pass ``archive`` (a writable
+text file) to keep a JSON line per deleted movie.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from movies import fuzzy, hot, identity
+from movies.models import EnrichmentJob, Movie, MovieActivity, MovieStats, TrendingMovie
+from .models import WatchlistItem
+
+logger = logging.getLogger(__name__)
+
+DEPENDENTS = (MovieStats, MovieActivity, EnrichmentJob)
+
+
+@dataclass
+class Progress:
+    scanned_to: int = 0
+    found: int = 0
+    deleted: int = 0
+    skipped_batches: int = 0
+    elapsed: float = 0.0
+
+
+def orphans(cutoff):
+    """Movies unreferenced and untouched since ``cutoff``"""
+    return Movie.objects.filter(updated_at__lt=cutoff).filter(
+        ~Exists(WatchlistItem.objects.filter(movie=OuterRef('pk'))),
+        ~Exists(TrendingMovie.objects.filter(movie=OuterRef('pk'))),
+        ~Exists(MovieActivity.objects.filter(movie=OuterRef('pk'), bucket__gte=cutoff)),
+    )
+
+
+def collect(cutoff=None, scan_size=5000, batch_size=500, pause=0.0, limit=None,
+            dry_run=False, archive=None, progress=None):
+    """Delete orphaned movies window by window; returns the final Progress"""
+    cutoff = cutoff or timezone.now() - timedelta(days=settings.MOVIE_RETENTION_DAYS)
+    using = router.db_for_write(Movie)
+    state = Progress()
+    started = time.monotonic()
+    while limit is None or state.found < limit:
+        # The window ends at the scan_size-th next movie, or at the end of the table.
+        upper = (
+            Movie.objects.using(using).filter(pk__gt=state.scanned_to).order_by('pk')
+            .values_list('pk', flat=True)[scan_size - 1:scan_size].first()
+        )
+        in_window = orphans(cutoff).using(using).filter(pk__gt=state.scanned_to)
+        if upper is not None:
+            in_window = in_window.filter(pk__lte=upper)
+        ids = list(in_window.order_by('pk').values_list('pk', flat=True))
+        if limit is not None:
+            ids = ids[:limit - state.found]
+        state.found += len(ids)
+        for start in range(0, len(ids), batch_size):
+            if dry_run:
+                break
+            deleted = _delete(ids[start:start + batch_size], cutoff, using, archive)
+            if deleted is None:
+                state.skipped_batches += 1
+            else:
+                state.deleted += deleted
+            if pause:
+                time.sleep(pause)
+        state.scanned_to = upper if upper is not None else max(ids, default=state.scanned_to)
+        state.elapsed = time.monotonic() - started
+        if progress:
+            progress(state)
+        if upper is None:
+            break
+    return state
+
+
+def _delete(ids, cutoff, using, archive):
+    """Delete the movies among ``ids`` that are still orphans; None if the batch was given up"""
+    connection = connections[using]
+    still_orphaned = orphans(cutoff).using(using).filter(pk__in=ids)
+    subquery, params = still_orphaned.order_by().values('pk').query.get_compiler(using).as_sql()
+    table = connection.ops.quote_name(Movie._meta.db_table)
+    pk = connection.ops.quote_name(Movie._meta.pk.column)
+    returning = ', '.join(
+        connection.ops.quote_name(Movie._meta.get_field(name).column) for name in ('id', 'imdb_id', 'tmdb_id')
+    )
+    try:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute("SET LOCAL lock_timeout = '2s'")
+            rows = list(still_orphaned.order_by('pk').values()) if archive is not None else None
+            # IN (subquery) rather than a correlated DELETE: the same SQL on SQLite and PostgreSQL.
+            cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({subquery}) RETURNING {returning}", params)
+            movies = [Movie(id=id_, imdb_id=imdb_id, tmdb_id=tmdb_id) for id_, imdb_id, tmdb_id in cursor.fetchall()]
+            deleted = [movie.pk for movie in movies]
+            for model in DEPENDENTS:
+                model.objects.using(using).filter(movie_id__in=deleted).delete()
+    except DatabaseError as exc:
+        # Lock timeout, or a movie shelved concurrently failing the deferred foreign key check.
+        logger.warning("Skipped a batch of %d orphaned movies: %s", len(ids), exc)
+        return None
+    for movie in movies:
+        hot.invalidate(movie.pk)
+        identity.forget(movie)
+        fuzzy.unindex_movie(movie)
+    if archive is not None:
+        deleted_ids = set(deleted)
+        for row in rows:
+            if row['id'] in deleted_ids:
+                archive.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+    return len(deleted)
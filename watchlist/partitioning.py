@@ -0,0 +1,164 @@
+"""
+Hash partitioning of watchlist_items by user_id (PostgreSQL only).
+
+Every watchlist query is scoped to one user, so with the table split into
+WATCHLIST_PARTITIONS hash partitions each query touches one partition, and
+vacuum, reindexing and the (user, movie) unique index work on partitions a
+fraction of the table's size.
+
+The conversion runs online, in three steps (``manage.py
+partition_watchlist_items`` runs them all, or one at a time):
+
+prepare   creates the partitioned table watchlist_items_p with its
+          partitions, indexes and foreign keys, plus a trigger that
+          mirrors every write on watchlist_items into it from then on.
+backfill  copies the existing rows over in keyset-paged batches, each its
+          own short transaction. Source rows are read FOR SHARE, so a row
+          deleted meanwhile is never resurrected.
+swap      under a brief ACCESS EXCLUSIVE lock, copies any stragglers,
+          renames watchlist_items to watchlist_items_unpartitioned and the
+          new table to watchlist_items, and moves the id sequence over.
+          The old table is kept for rollback; drop it with --drop-old.
+
+PostgreSQL requires a partitioned table's primary key to contain the
+partition key, so the primary key becomes (id, user_id). ids still come
+from one sequence, so Django's view of ``id`` as the primary key holds.
+"""
+import time
+
+from django.db import transaction
+
+TABLE = 'watchlist_items'
+NEW_TABLE = 'watchlist_items_p'
+OLD_TABLE = 'watchlist_items_unpartitioned'
+SEQUENCE = 'watchlist_items_p_id_seq'
+SYNC = 'watchlist_items_p_sync'
+# Named in WatchlistItem.Meta; the new table's copy takes the name over at swap.
+UPDATED_INDEX = 'watchlist_user_updated_idx'
+
+
+def partition_name(remainder):
+    return f"watchlist_items_h{remainder:03d}"
+
+
+def state(connection):
+    """'partitioned', 'converting' (prepared, not swapped) or 'plain'"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname, relkind FROM pg_class "
+            "WHERE relname IN (%s, %s) AND relnamespace = current_schema()::regnamespace",
+            [TABLE, NEW_TABLE],
+        )
+        kinds = dict(cursor.fetchall())
+    if kinds.get(TABLE) == 'p':
+        return 'partitioned'
+    return 'converting' if NEW_TABLE in kinds else 'plain'
+
+
+def prepare(connection, partitions):
+    statements = [
+        f"CREATE TABLE {NEW_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS) PARTITION BY HASH (user_id)",
+        f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {NEW_TABLE}_pkey PRIMARY KEY (id, user_id)",
+        f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {NEW_TABLE}_user_movie_uniq UNIQUE (user_id, movie_id)",
+        f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {NEW_TABLE}_user_fk FOREIGN KEY (user_id) "
+        f"REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED",
+        f"ALTER TABLE {NEW_TABLE} ADD CONSTRAINT {NEW_TABLE}_movie_fk FOREIGN KEY (movie_id) "
+        f"REFERENCES movies (id) DEFERRABLE INITIALLY DEFERRED",
+        f"CREATE INDEX {UPDATED_INDEX}_p ON {NEW_TABLE} (user_id, updated_at)",
+        f"CREATE INDEX {NEW_TABLE}_movie_idx ON {NEW_TABLE} (movie_id)",
+        *(
+            f"CREATE TABLE {partition_name(remainder)} PARTITION OF {NEW_TABLE} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+            for remainder in range(partitions)
+        ),
+        f"CREATE SEQUENCE {SEQUENCE} AS bigint",
+        # Mirror writes made during the backfill. An update may race the
+        # backfill's copy of the same row, hence the upsert.
+        f"""
+        CREATE FUNCTION {SYNC}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {NEW_TABLE} WHERE id = OLD.id AND user_id = OLD.user_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {NEW_TABLE} VALUES (NEW.*)
+                ON CONFLICT (id, user_id) DO UPDATE SET
+                    movie_id = EXCLUDED.movie_id, is_watched = EXCLUDED.is_watched,
+                    rating = EXCLUDED.rating, note = EXCLUDED.note, added_at = EXCLUDED.added_at,
+                    watched_at = EXCLUDED.watched_at, updated_at = EXCLUDED.updated_at;
+            END IF;
+            RETURN NULL;
+        END $$
+        """,
+        f"CREATE TRIGGER {SYNC} AFTER INSERT OR UPDATE OR DELETE ON {TABLE} "
+        f"FOR EACH ROW EXECUTE FUNCTION {SYNC}()",
+    ]
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def backfill(connection, batch_size, pause=0.0, after_id=0, progress=None):
+    """Copy rows with id > ``after_id`` in batches; returns the last id copied"""
+    copied = 0
+    while True:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f"WITH batch AS ("
+                f"  SELECT * FROM {TABLE} WHERE id > %s ORDER BY id LIMIT %s FOR SHARE"
+                f"), copied AS ("
+                f"  INSERT INTO {NEW_TABLE} SELECT * FROM batch ON CONFLICT DO NOTHING"
+                f") SELECT max(id), count(*) FROM batch",
+                [after_id, batch_size],
+            )
+            last_id, count = cursor.fetchone()
+        if not count:
+            return after_id
+        after_id = last_id
+        copied += count
+        if progress:
+            progress(copied, after_id)
+        if pause:
+            time.sleep(pause)
+
+
+def swap(connection, lock_timeout='5s'):
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        # Give up rather than queue every request behind a long wait for the lock.
+        cursor.execute(f"SET LOCAL lock_timeout = '{lock_timeout}'")
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f"INSERT INTO {NEW_TABLE} SELECT * FROM {TABLE} ON CONFLICT DO NOTHING")
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [TABLE])
+        (old_sequence,) = cursor.fetchone()
+        cursor.execute(
+            f"SELECT setval(%s, greatest((SELECT coalesce(max(id), 0) FROM {TABLE}), "
+            f"(SELECT last_value FROM {old_sequence})) + 1, false)",
+            [SEQUENCE],
+        )
+        for statement in (
+            f"DROP TRIGGER {SYNC} ON {TABLE}",
+            f"DROP FUNCTION {SYNC}()",
+            f"ALTER TABLE {TABLE} RENAME TO {OLD_TABLE}",
+            f"ALTER INDEX {UPDATED_INDEX} RENAME TO {UPDATED_INDEX}_unpartitioned",
+            f"ALTER INDEX {UPDATED_INDEX}_p RENAME TO {UPDATED_INDEX}",
+            f"ALTER TABLE {NEW_TABLE} RENAME TO {TABLE}",
+            f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')",
+            f"ALTER SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id",
+        ):
+            cursor.execute(statement)
+
+
+def drop_old(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {OLD_TABLE}")
+
+
+def convert(connection, partitions, batch_size=10000, progress=None):
+    """All three steps, resuming a conversion that was prepared earlier"""
+    current = state(connection)
+    if current == 'partitioned':
+        return
+    if current == 'plain':
+        prepare(connection, partitions)
+    backfill(connection, batch_size, progress=progress)
+    swap(connection)
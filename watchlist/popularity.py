@@ -0,0 +1,165 @@
+"""
+Maintenance of the per-movie popularity counters (movies.MovieStats) and
+the hourly activity buckets behind the trending ranking.
+
+Watchlist writes describe each item change as a (before, after) pair of
+``(is_watched, rating)`` states - None when the item does not exist - and
+apply() folds them into as few F()-expression UPDATEs as possible, inside
+the caller's transaction.
+
+refresh_trending() turns the buckets into the small ranked table read by
+the trending endpoint; it runs periodically (`manage.py refresh_trending`)
+rather than on every request.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.utils import timezone
+
+from movies.models import MovieActivity, MovieStats, TrendingMovie
+
+STAT_FIELDS = ('shelved_count', 'watched_count', 'rating_sum', 'rating_count')
+ACTIVITY_FIELDS = ('shelvings', 'watches')
+
+
+def item_delta(before, after):
+    """Counter changes for one item going from ``before`` to ``after``"""
+    was_watched, old_rating = before if before is not None else (False, None)
+    is_watched, new_rating = after if after is not None else (False, None)
+    shelved = int(after is not None) - int(before is not None)
+    return {
+        'shelved_count': shelved,
+        'watched_count': int(is_watched) - int(was_watched),
+        'rating_sum': (new_rating or 0) - (old_rating or 0),
+        'rating_count': int(new_rating is not None) - int(old_rating is not None),
+        'shelvings': max(shelved, 0),
+        'watches': int(is_watched and not was_watched),
+    }
+
+
+def apply(changes, using):
+    """Apply (movie_id, before, after) item changes to the counters"""
+    totals = defaultdict(lambda: dict.fromkeys(STAT_FIELDS + ACTIVITY_FIELDS, 0))
+    for movie_id, before, after in changes:
+        for field, value in item_delta(before, after).items():
+            totals[movie_id][field] += value
+
+    # Movies whose counters move by the same amounts share one UPDATE, so a
+    # bulk action over hundreds of items stays a single statement.
+    groups = defaultdict(list)
+    for movie_id, delta in totals.items():
+        key = tuple(delta[field] for field in STAT_FIELDS)
+        if any(key):
+            groups[key].append(movie_id)
+    for key, movie_ids in groups.items():
+        _update_stats(movie_ids, dict(zip(STAT_FIELDS, key)), using)
+
+    activity = [
+        (movie_id, delta['shelvings'], delta['watches'])
+        for movie_id, delta in totals.items()
+        if delta['shelvings'] or delta['watches']
+    ]
+    if activity:
+        _add_activity(activity, using)
+
+
+def _update_stats(movie_ids, delta, using):
+    changes = {field: F(field) + value for field, value in delta.items() if value}
+    stats = MovieStats.objects.using(using)
+    updated = stats.filter(movie_id__in=movie_ids).update(**changes)
+    if updated < len(movie_ids):
+        # First shelving of these movies: create their rows, then count.
+        existing = set(stats.filter(movie_id__in=movie_ids).values_list('movie_id', flat=True))
+        missing = [movie_id for movie_id in movie_ids if movie_id not in existing]
+        stats.bulk_create([MovieStats(movie_id=movie_id) for movie_id in missing], ignore_conflicts=True)
+        stats.filter(movie_id__in=missing).update(**changes)
+
+
+def _add_activity(rows, using):
+    """Add to the current hour's buckets with one INSERT ... ON CONFLICT"""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    bucket = connection.ops.adapt_datetimefield_value(
+        timezone.now().replace(minute=0, second=0, microsecond=0)
+    )
+    table = quote(MovieActivity._meta.db_table)
+    shelvings, watches = quote('shelvings'), quote('watches')
+    values = ', '.join(['(%s, %s, %s, %s)'] * len(rows))
+    sql = (
+        f"INSERT INTO {table} ({quote('movie_id')}, {quote('bucket')}, {shelvings}, {watches}) "
+        f"VALUES {values} "
+        f"ON CONFLICT ({quote('movie_id')}, {quote('bucket')}) DO UPDATE SET "
+        f"{shelvings} = {table}.{shelvings} + EXCLUDED.{shelvings}, "
+        f"{watches} = {table}.{watches} + EXCLUDED.{watches}"
+    )
+    params = [value for movie_id, s, w in rows for value in (movie_id, bucket, s, w)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def refresh_trending(using='default', now=None):
+    """Recompute the trending ranking from the activity buckets; returns its size"""
+    now = now or timezone.now()
+    current = now.replace(minute=0, second=0, microsecond=0)
+    window = settings.TRENDING_WINDOW_DAYS * 24
+    half_life = settings.TRENDING_HALF_LIFE_HOURS
+    start = current - timedelta(hours=window - 1)
+
+    # One weight per hourly bucket, so the decay is computed by the database
+    # while grouping instead of row by row in Python.
+    decay = Case(
+        *(
+            When(bucket=current - timedelta(hours=age), then=Value(0.5 ** (age / half_life)))
+            for age in range(window)
+        ),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    activity = F('shelvings') + settings.TRENDING_WATCH_WEIGHT * F('watches')
+    ranked = (
+        MovieActivity.objects.using(using)
+        .filter(bucket__gte=start)
+        .values('movie_id')
+        .annotate(score=Sum(activity * decay, output_field=FloatField()))
+        .filter(score__gt=0)
+        .order_by('-score', 'movie_id')[:settings.TRENDING_SIZE]
+    )
+    rows = [
+        TrendingMovie(rank=rank, movie_id=row['movie_id'], score=row['score'], computed_at=now)
+        for rank, row in enumerate(ranked, start=1)
+    ]
+    with transaction.atomic(using=using):
+        TrendingMovie.objects.using(using).all().delete()
+        TrendingMovie.objects.using(using).bulk_create(rows)
+        MovieActivity.objects.using(using).filter(bucket__lt=start).delete()
+    return len(rows)
+
+
+def rebuild_stats(using='default'):
+    """Recount every movie's counters from the watchlist, e.g. after a bulk import"""
+    from .models import WatchlistItem
+
+    totals = WatchlistItem.objects.using(using).values('movie_id').annotate(
+        shelved=Count('id'),
+        watched=Count('id', filter=Q(is_watched=True)),
+        rating_total=Sum('rating'),
+        rated=Count('rating'),
+    )
+    with transaction.atomic(using=using):
+        MovieStats.objects.using(using).all().delete()
+        MovieStats.objects.using(using).bulk_create(
+            (
+                MovieStats(
+                    movie_id=row['movie_id'],
+                    shelved_count=row['shelved'],
+                    watched_count=row['watched'],
+                    rating_sum=row['rating_total'] or 0,
+                    rating_count=row['rated'],
+                )
+                for row in totals.iterator()
+            ),
+            batch_size=1000,
+        )
@@ -1,18 +1,21 @@
 # watchlist/serializers.py - FIXED VERSION
 from rest_framework import serializers
 from .models import WatchlistItem
-from movies.serializers import MovieSerializer
-from movies.models import Movie
+from movies.serializers import HotMovieListSerializer, HotMovieSerializer
+from movies import identity
+from movies.models import normalize_imdb_id
+from movieshelfapp.instrumentation import TimedSerializerMixin
 
 
-class WatchlistItemSerializer(serializers.ModelSerializer):
-    movie = MovieSerializer(read_only=True)
+class WatchlistItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    movie = HotMovieSerializer(read_only=True)
 
     class Meta:
         model = WatchlistItem
         fields = ('id', 'movie', 'is_watched', 'rating', 'note',
                   'added_at', 'watched_at', 'updated_at')
         read_only_fields = ('id', 'added_at', 'watched_at', 'updated_at')
+        list_serializer_class = HotMovieListSerializer
 
 
 class WatchlistItemCreateSerializer(serializers.ModelSerializer):
@@ -29,9 +32,8 @@ class WatchlistItemCreateSerializer(serializers.ModelSerializer):
         imdb_id = validated_data.pop('imdb_id')
 
         # Get or create the movie
-        try:
-            movie = Movie.objects.get(imdb_id=imdb_id)
-        except Movie.DoesNotExist:
+        movie = identity.get_movie('imdb', imdb_id)
+        if movie is None:
             raise serializers.ValidationError({
                 'imdb_id': 'Movie not found. Please create the movie first using the /api/movies/create/ endpoint.'
             })
@@ -64,7 +66,11 @@ class WatchlistItemUpdateSerializer(serializers.ModelSerializer):
         elif not validated_data.get('is_watched', instance.is_watched):
             instance.watched_at = None
 
-        return super().update(instance, validated_data)
+        # Only write the columns that can have changed.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'watched_at', 'updated_at'])
+        return instance
 
 
 # FIX: Move this outside the WatchlistItemUpdateSerializer class
@@ -74,6 +80,8 @@ class AddFromOMDBSerializer(serializers.Serializer):
     This is the key serializer for your workflow.
     """
     imdb_id = serializers.CharField(max_length=20)
+    # Shown until the movie's details have been fetched (the search result's title).
+    title = serializers.CharField(max_length=255, required=False, allow_blank=True)
     rating = serializers.IntegerField(
         min_value=1,
         max_value=5,
@@ -88,6 +96,39 @@ class AddFromOMDBSerializer(serializers.Serializer):
 
     def validate_imdb_id(self, value):
         """Validate IMDB ID format"""
-        if not value.startswith('tt'):
+        value = normalize_imdb_id(value)
+        if not value or not value.startswith('tt'):
             raise serializers.ValidationError("Invalid IMDB ID format. Should start with 'tt'")
-        return value
\ No newline at end of file
+        return value
+
+
+class BulkFilterSerializer(serializers.Serializer):
+    is_watched = serializers.BooleanField(required=False)
+    rating = serializers.IntegerField(min_value=1, max_value=5, required=False, allow_null=True)
+
+
+class BulkSelectionSerializer(serializers.Serializer):
+    """
+    Selects the caller's watchlist items for a bulk action, either by id
+    (``{"ids": [1, 2, 3]}``) or by filter (``{"filter": {"is_watched": true}}``;
+    an empty filter selects the whole watchlist).
+    """
+    MAX_IDS = 1000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        allow_empty=False,
+        max_length=MAX_IDS
+    )
+    filter = BulkFilterSerializer(required=False)
+
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Provide either 'ids' or 'filter'")
+        return attrs
+
+    def select(self, queryset):
+        if 'ids' in self.validated_data:
+            return queryset.filter(pk__in=self.validated_data['ids'])
+        return queryset.filter(**self.validated_data['filter'])
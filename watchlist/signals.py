@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from movies.signals import movie_enriched
+from . import popularity
+from .events import publish_changes
+from .models import WatchlistDeletion, WatchlistItem, _publish_by_user
+
+
+@receiver(post_save, sender=WatchlistItem)
+def publish_save(sender, instance, using, **kwargs):
+    publish_changes(instance.user_id, upserted=[instance.pk], using=using)
+
+
+@receiver(post_delete, sender=WatchlistItem)
+def record_deletion(sender, instance, using, **kwargs):
+    """Bookkeeping for items deleted through the ORM (delete_returning does its own)"""
+    WatchlistDeletion.objects.using(using).create(item_id=instance.pk, user_id=instance.user_id)
+    popularity.apply([(instance.movie_id, (instance.is_watched, instance.rating), None)], using)
+    publish_changes(instance.user_id, deleted=[instance.pk], using=using)
+
+
+@receiver(movie_enriched)
+def refresh_shelved_placeholder(sender, movie, **kwargs):
+    """Let delta sync and the event stream deliver the movie's new details"""
+    items = WatchlistItem.objects.filter(movie=movie)
+    rows = list(items.values_list('pk', 'user_id'))
+    items.update(updated_at=timezone.now())
+    _publish_by_user(rows, 'upserted', None)
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
 
-# Create your tests here.
+import requests
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from movies import enrichment, hot, identity
+from movies.models import EnrichmentJob, Movie, MovieActivity, MovieStats, TrendingMovie
+from movies.providers import MovieProvider
+from movieshelfapp.testing import QueryBudgetMixin
+from . import analytics, events, orphans, partitioning, popularity
+from .admin import WatchlistItemAdmin
+from .models import WatchlistItem
+
+User = get_user_model()
+
+
+def make_movie(n):
+    return Movie.objects.create(
+        tmdb_id=f"tt{n:07d}",
+        imdb_id=f"tt{n:07d}",
+        title=f"Movie {n}",
+        genres=['Drama'],
+        cast=['Someone'],
+    )
+
+
+class WatchlistQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    """Per-endpoint query budgets; these fail on N+1 regressions in the serializers"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='budget@example.com', username='budget', password='pw-for-tests-123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.items = [self.add_item(n) for n in range(3)]
+        # Budgets are for a warm hot movie cache; a cold one adds one query per response.
+        hot.clear()
+        hot.get_many([item.movie_id for item in self.items])
+
+    def add_item(self, n, **fields):
+        return WatchlistItem.objects.create(user=self.user, movie=make_movie(n), **fields)
+
+    def add_more_items(self):
+        items = [self.add_item(n, is_watched=n % 2 == 0) for n in range(10, 30)]
+        hot.get_many([item.movie_id for item in items])
+
+    def test_list(self):
+        with self.assertQueryBudget(3):
+            response = self.client.get('/api/watchlist/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNoQueryGrowth(lambda: self.client.get('/api/watchlist/'), self.add_more_items)
+
+    def test_watched_and_unwatched(self):
+        for url in ('/api/watchlist/watched/', '/api/watchlist/unwatched/'):
+            with self.assertQueryBudget(2):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertNoQueryGrowth(lambda: self.client.get('/api/watchlist/unwatched/'), self.add_more_items)
+
+    def test_retrieve(self):
+        with self.assertQueryBudget(2):
+            response = self.client.get(f"/api/watchlist/{self.items[0].pk}/")
+        self.assertEqual(response.status_code, 200)
+
+    def test_mark_watched(self):
+        # Item lookup, UPDATE, movie counters and the trending activity bucket.
+        with self.assertQueryBudget(5):
+            response = self.client.patch(f"/api/watchlist/{self.items[0].pk}/mark_watched/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_watched'])
+
+    def test_server_timing_header(self):
+        self.assertFalse(self.client.get('/api/watchlist/').has_header('Server-Timing'))
+        with self.settings(SERVER_TIMING_HEADER=True):
+            response = self.client.get('/api/watchlist/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    def test_bulk_mark_watched_is_one_update(self):
+        self.add_more_items()
+        ids = list(WatchlistItem.objects.filter(user=self.user).values_list('pk', flat=True))
+        with self.assertQueryBudget(4):
+            response = self.client.patch('/api/watchlist/bulk_mark_watched/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 13)  # the 10 already watched are skipped
+        self.assertFalse(WatchlistItem.objects.filter(user=self.user, watched_at__isnull=True).exists())
+
+    def test_bulk_delete_by_filter_is_scoped_to_user(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='pw-for-tests-123')
+        WatchlistItem.objects.create(user=other, movie=self.items[0].movie, is_watched=True)
+        self.add_more_items()
+        with self.assertQueryBudget(4):
+            response = self.client.post('/api/watchlist/bulk_delete/', {'filter': {'is_watched': True}}, format='json')
+        self.assertEqual(response.data['deleted'], 10)
+        self.assertEqual(WatchlistItem.objects.filter(is_watched=True).count(), 1)
+
+    @override_settings(WATCHLIST_SYNC_OVERLAP_SECONDS=0)
+    def test_sync_returns_changes_and_tombstones(self):
+        snapshot = self.client.get('/api/watchlist/sync/').data
+        self.assertTrue(snapshot['full'])
+        self.assertEqual(len(snapshot['items']), 3)
+
+        deleted_ids = [self.items[1].pk, self.items[2].pk]
+        self.client.patch(f"/api/watchlist/{self.items[0].pk}/mark_watched/")
+        self.client.delete(f"/api/watchlist/{self.items[1].pk}/")
+        self.items[2].delete()
+
+        with self.assertQueryBudget(3):
+            delta = self.client.get('/api/watchlist/sync/', {'since': snapshot['cursor']}).data
+        self.assertFalse(delta['full'])
+        self.assertEqual([item['id'] for item in delta['items']], [self.items[0].pk])
+        self.assertCountEqual(delta['deleted'], deleted_ids)
+
+
+class PopularityCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='counts@example.com', username='counts', password='pw-for-tests-123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.movies = [make_movie(n) for n in range(3)]
+
+    def stats(self, movie):
+        return MovieStats.objects.get(movie=movie)
+
+    def test_counters_follow_watchlist_writes(self):
+        item = WatchlistItem.objects.create(user=self.user, movie=self.movies[0], rating=4)
+        self.client.patch(f"/api/watchlist/{item.pk}/mark_watched/")
+        stats = self.stats(self.movies[0])
+        self.assertEqual(
+            (stats.shelved_count, stats.watched_count, stats.rating_sum, stats.rating_count), (1, 1, 4, 1)
+        )
+
+        self.client.patch('/api/watchlist/bulk_unmark_watched/', {'ids': [item.pk]}, format='json')
+        self.assertEqual(self.stats(self.movies[0]).watched_count, 0)
+
+        self.client.delete(f"/api/watchlist/{item.pk}/")
+        stats = self.stats(self.movies[0])
+        self.assertEqual((stats.shelved_count, stats.rating_count), (0, 0))
+
+    def test_trending_ranks_recent_activity(self):
+        other = User.objects.create_user(email='o@example.com', username='o', password='pw-for-tests-123')
+        for user in (self.user, other):
+            WatchlistItem.objects.create(user=user, movie=self.movies[1], is_watched=True)
+        WatchlistItem.objects.create(user=self.user, movie=self.movies[2])
+        self.assertEqual(popularity.refresh_trending(), 2)
+
+        response = self.client.get('/api/movies/trending/')
+        self.assertEqual(response.status_code, 200)
+        ranked = [(row['rank'], row['movie']['id'], row['shelved_count']) for row in response.data['movies']]
+        self.assertEqual(ranked, [(1, self.movies[1].pk, 2), (2, self.movies[2].pk, 1)])
+
+
+class StubProvider(MovieProvider):
+    name = 'stub'
+    down = False
+
+    def detail(self, imdb_id, operation='detail'):
+        if self.down:
+            raise requests.ConnectionError('upstream down')
+        if imdb_id == 'tt0000404':
+            return {'Response': 'False', 'Error': 'Movie not found!'}
+        return {
+            'Response': 'True', 'imdbID': imdb_id, 'Title': 'The Godfather', 'Runtime': '175 min',
+            'Genre': 'Crime, Drama', 'Plot': 'The aging patriarch...', 'imdbRating': '9.2',
+        }
+
+
+@override_settings(MOVIE_PROVIDERS=['watchlist.tests.StubProvider'], ENRICHMENT_RETRY_SECONDS=0)
+class EnrichmentQueueTests(APITestCase):
+    def setUp(self):
+        identity.clear()
+        StubProvider.down = False
+        self.user = User.objects.create_user(
+            email='queue@example.com', username='queue', password='pw-for-tests-123'
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def add(self, imdb_id, **data):
+        return self.client.post('/api/watchlist/add-from-omdb/', {'imdb_id': imdb_id, **data}, format='json')
+
+    def test_add_returns_before_the_details_are_fetched(self):
+        StubProvider.down = True  # never asked
+        response = self.add('tt0068646', title='The Godfather')
+        self.assertEqual(response.status_code, 202)
+        movie = response.data['watchlist_item']['movie']
+        self.assertTrue(movie['is_placeholder'])
+        self.assertEqual(movie['title'], 'The Godfather')
+        self.assertEqual(EnrichmentJob.objects.count(), 1)
+
+    def test_worker_fills_in_placeholders(self):
+        self.add('tt0068646')
+        other = User.objects.create_user(email='other@example.com', username='other', password='pw-for-tests-123')
+        WatchlistItem.objects.create(user=other, movie=Movie.objects.get(imdb_id='tt0068646'))
+        self.assertEqual(EnrichmentJob.objects.count(), 1)  # one job per movie
+
+        self.assertEqual(enrichment.run_batch(), 1)
+        movie = Movie.objects.get(imdb_id='tt0068646')
+        self.assertFalse(movie.is_placeholder)
+        self.assertEqual((movie.title, movie.runtime, movie.genres), ('The Godfather', 175, ['Crime', 'Drama']))
+        self.assertFalse(EnrichmentJob.objects.exists())
+        self.assertEqual(enrichment.run_batch(), 0)
+
+    def test_failed_fetches_are_retried_then_given_up(self):
+        self.add('tt0068646')
+        StubProvider.down = True
+        with self.settings(ENRICHMENT_MAX_ATTEMPTS=2):
+            enrichment.run_batch()
+            job = EnrichmentJob.objects.get()
+            self.assertEqual((job.status, job.attempts, job.locked_until), (EnrichmentJob.PENDING, 1, None))
+            enrichment.run_batch()
+        job = EnrichmentJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (EnrichmentJob.FAILED, 2))
+        self.assertIn('upstream down', job.last_error)
+
+    def test_unknown_movies_are_not_retried(self):
+        self.add('tt0000404')
+        enrichment.run_batch()
+        self.assertEqual(EnrichmentJob.objects.get().status, EnrichmentJob.FAILED)
+        self.assertTrue(Movie.objects.get(imdb_id='tt0000404').is_placeholder)
+
+    def test_full_queue_falls_back_to_a_synchronous_fetch(self):
+        with self.settings(ENRICHMENT_MAX_PENDING=1):
+            self.assertEqual(self.add('tt0068646').status_code, 202)
+            response = self.add('tt0071562')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.data['watchlist_item']['movie']['is_placeholder'])
+
+    def test_no_queue_fetches_synchronously(self):
+        with self.settings(ENRICHMENT_MAX_PENDING=0):
+            response = self.add('tt0068646')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(EnrichmentJob.objects.exists())
+
+
+class SyntheticDataTests(TestCase):
+    def generate(self, **options):
+        call_command(
+            'generate_synthetic_data', users=30, movies=1000, items=1500, power_users=2,
+            power_user_items=150, stdout=io.StringIO(), **options
+        )
+        return list(WatchlistItem.objects.order_by('pk').values_list(
+            'user__email', 'movie__imdb_id', 'is_watched', 'rating', 'added_at'
+        ))
+
+    def test_generation_is_deterministic_and_skewed(self):
+        first = self.generate()
+        self.assertEqual(self.generate(replace=True), first)
+        self.assertEqual(User.objects.count(), 30)
+
+        shelves = sorted(WatchlistItem.objects.values('user').annotate(n=Count('id')).values_list('n', flat=True))
+        self.assertGreaterEqual(shelves.count(150), 2)
+        self.assertAlmostEqual(sum(shelves), 1500, delta=30)
+        # Zipf popularity: the top movie is on far more shelves than the median one.
+        counts = list(MovieStats.objects.order_by('-shelved_count').values_list('shelved_count', flat=True))
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+        self.assertEqual(sum(counts), len(first))
+
+
+class WatchlistItemAdminTests(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', password='pw-for-tests-123'
+        )
+        self.client.force_login(self.admin)
+        self.items = [
+            WatchlistItem.objects.create(user=self.admin, movie=make_movie(n)) for n in range(5)
+        ]
+
+    def test_rows_need_no_queries_of_their_own(self):
+        with patch.object(WatchlistItemAdmin, 'list_per_page', 2):
+            with self.assertQueryBudget(5):  # session, user, capped count, page, and nothing per row
+                response = self.client.get('/admin/watchlist/watchlistitem/')
+        self.assertEqual(
+            [item.pk for item in response.context['cl'].result_list], [self.items[4].pk, self.items[3].pk]
+        )
+
+    def test_search_matches_users_and_movies(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='pw-for-tests-123')
+        WatchlistItem.objects.create(user=other, movie=self.items[0].movie)
+        by_title = self.client.get('/admin/watchlist/watchlistitem/', {'q': 'movie 3'})
+        self.assertEqual([item.pk for item in by_title.context['cl'].result_list], [self.items[3].pk])
+        by_email = self.client.get('/admin/watchlist/watchlistitem/', {'q': 'other@'})
+        self.assertEqual([item.user for item in by_email.context['cl'].result_list], [other])
+
+
+class OrphanMovieCollectionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='gc@example.com', username='gc', password='pw-for-tests-123')
+        self.movies = [make_movie(n) for n in range(8)]
+        long_ago = timezone.now() - timedelta(days=90)
+        Movie.objects.filter(pk__in=[movie.pk for movie in self.movies[:7]]).update(updated_at=long_ago)
+        WatchlistItem.objects.create(user=self.user, movie=self.movies[0])
+        TrendingMovie.objects.create(rank=1, movie=self.movies[1], score=1.0, computed_at=timezone.now())
+        MovieActivity.objects.create(movie=self.movies[2], bucket=timezone.now(), shelvings=1)
+        MovieActivity.objects.create(movie=self.movies[3], bucket=long_ago, shelvings=1)
+        MovieStats.objects.create(movie=self.movies[3])
+        # movies[4:7] are plain orphans; movies[7] is recent.
+
+    def collect(self, *args):
+        out = io.StringIO()
+        call_command('collect_orphan_movies', '--scan-size=2', '--batch-size=2', '--sleep=0', *args, stdout=out)
+        return out.getvalue()
+
+    def test_only_unreferenced_stale_movies_are_deleted(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, 'movies.jsonl')
+            output = self.collect(f"--archive={archive}")
+            with open(archive) as fh:
+                archived = [json.loads(line) for line in fh]
+        self.assertIn('Deleted 4 of 4 orphaned movies', output)
+        remaining = set(Movie.objects.values_list('pk', flat=True))
+        self.assertEqual(remaining, {movie.pk for movie in self.movies[:3] + self.movies[7:]})
+        self.assertFalse(MovieStats.objects.filter(movie_id=self.movies[3].pk).exists())
+        self.assertEqual([row['title'] for row in archived], [movie.title for movie in self.movies[3:7]])
+        self.assertEqual(archived[0]['genres'], ['Drama'])
+
+    def test_dry_run_deletes_nothing(self):
+        self.assertIn('Found 4 orphaned movies', self.collect('--dry-run'))
+        self.assertEqual(Movie.objects.count(), 8)
+
+    def test_movies_shelved_after_selection_are_kept(self):
+        cutoff = timezone.now() - timedelta(days=30)
+        ids = list(orphans.orphans(cutoff).values_list('pk', flat=True))
+        WatchlistItem.objects.create(user=self.user, movie=self.movies[4])
+        self.assertEqual(orphans._delete(ids, cutoff, 'default', None), 3)
+        self.assertTrue(Movie.objects.filter(pk=self.movies[4].pk).exists())
+
+    def test_deleted_movies_leave_the_in_process_caches(self):
+        hot.clear()
+        identity.clear()
+        orphan = self.movies[5]
+        self.assertIsNotNone(hot.get(orphan.pk))
+        identity.remember(orphan)
+        self.collect()
+        self.assertIsNone(hot.get(orphan.pk))
+        self.assertIsNone(identity.resolve('imdb', orphan.imdb_id))
+
+
+@unittest.skipIf(analytics.np is None, 'numpy is not installed')
+class WatchlistReportTests(TestCase):
+    def setUp(self):
+        users = [
+            User.objects.create_user(email=f"r{n}@example.com", username=f"r{n}", password='pw-for-tests-123')
+            for n in range(3)
+        ]
+        self.movies = [make_movie(n) for n in range(4)]
+        details = [
+            (['Drama'], 'Ann Director', date(1994, 5, 1)),
+            (['Drama', 'Comedy'], 'Ann Director', date(1999, 1, 1)),
+            (['Comedy'], 'Bob Director', date(2004, 1, 1)),
+            ([], '', None),
+        ]
+        for movie, (genres, director, released) in zip(self.movies, details):
+            Movie.objects.filter(pk=movie.pk).update(genres=genres, director=director, release_date=released)
+        shelves = [
+            (0, 0, True, 5), (1, 0, True, 4), (2, 0, False, None),
+            (0, 1, True, 3), (1, 1, False, None),
+            (0, 2, True, 1),
+            (0, 3, False, None),
+        ]
+        for user, movie, watched, rating in shelves:
+            WatchlistItem.objects.create(user=users[user], movie=self.movies[movie], is_watched=watched, rating=rating)
+
+    def report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'reports.npz')
+            out = io.StringIO()
+            call_command('watchlist_report', f"--output={path}", '--chunk-size=2', stdout=out)
+            with analytics.np.load(path) as data:
+                return {key: data[key].tolist() for key in data.files}, out.getvalue()
+
+    def test_reports(self):
+        data, output = self.report()
+        self.assertIn('4 movies and 7 watchlist items', output)
+
+        genres = dict(zip(data['genre_ratings.genre'], data['genre_ratings.counts']))
+        # Columns: unrated, then ratings 1 to 5.
+        self.assertEqual(genres['Drama'], [2, 0, 0, 1, 1, 1])
+        self.assertEqual(genres['Comedy'], [1, 1, 0, 1, 0, 0])
+        self.assertEqual(
+            dict(zip(data['genre_ratings.genre'], data['genre_ratings.mean_rating'])), {'Drama': 4.0, 'Comedy': 2.0}
+        )
+
+        decades = dict(zip(data['decade_completion.decade'], data['decade_completion.completion']))
+        self.assertEqual(decades, {0: 0.0, 1990: 0.6, 2000: 1.0})
+
+        self.assertEqual(data['director_leaderboard.director'], ['Ann Director', 'Bob Director'])
+        self.assertEqual(data['director_leaderboard.items'], [5, 1])
+        self.assertEqual(data['director_leaderboard.mean_rating'], [4.0, 1.0])
+
+    def test_empty_tables(self):
+        WatchlistItem.objects.all().delete()
+        Movie.objects.all().delete()
+        data, output = self.report()
+        self.assertIn('0 movies and 0 watchlist items', output)
+        self.assertEqual(data['director_leaderboard.director'], [])
+
+
+class WatchlistEventTests(TestCase):
+    def setUp(self):
+        broker = patch.object(events, '_broker', events.InProcessBroker())
+        broker.start()
+        self.addCleanup(broker.stop)
+        self.user = User.objects.create_user(email='events@example.com', username='events', password='pw-for-tests-123')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    async def test_broker_delivers_and_asks_slow_subscribers_to_resync(self):
+        broker = events.get_broker()
+        subscription = broker.subscribe(1)
+        received = asyncio.ensure_future(anext(subscription))
+        await asyncio.sleep(0)  # subscribed
+        broker.publish(1, {'upserted': [7], 'deleted': []})
+        broker.publish(2, {'upserted': [8], 'deleted': []})
+        self.assertEqual(await asyncio.wait_for(received, 1), {'upserted': [7], 'deleted': []})
+        for n in range(events.QUEUE_SIZE + 1):
+            broker.publish(1, {'upserted': [n], 'deleted': []})
+        await asyncio.sleep(0)  # deliveries run on the loop
+        self.assertEqual(await asyncio.wait_for(anext(subscription), 1), events.RESYNC)
+        await subscription.aclose()
+
+    async def test_stream_sends_retry_then_published_events(self):
+        response = await self.async_client.get('/api/watchlist/events/', {'token': self.token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        await asyncio.sleep(0.05)  # let the stream subscribe
+        events.get_broker().publish(self.user.pk, {'upserted': [1], 'deleted': []})
+        chunk = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(chunk, b'event: watchlist\ndata: {"upserted": [1], "deleted": []}\n\n')
+        await stream.aclose()
+
+    async def test_stream_needs_a_valid_token(self):
+        response = await self.async_client.get('/api/watchlist/events/', {'token': 'nonsense'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_wsgi_is_told_to_use_the_asgi_app(self):
+        response = self.client.get('/api/watchlist/events/', {'token': self.token})
+        self.assertEqual(response.status_code, 501)
+
+
+class PartitioningTests(TestCase):
+    def test_command_refuses_other_databases(self):
+        with self.assertRaisesMessage(CommandError, 'Partitioning needs PostgreSQL'):
+            call_command('partition_watchlist_items', '--partitions=4', stdout=io.StringIO())
+
+    @override_settings(WATCHLIST_PARTITIONS=4)
+    def test_migration_leaves_other_databases_alone(self):
+        migration = importlib.import_module('watchlist.migrations.0004_partition_watchlist_items')
+        # Only the editor's connection is used; SQLite's real editor cannot run inside a test transaction.
+        migration.partition(None, SimpleNamespace(connection=connection))
+        self.assertIn(partitioning.TABLE, connection.introspection.table_names())
+        self.assertNotIn(partitioning.NEW_TABLE, connection.introspection.table_names())
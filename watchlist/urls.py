@@ -11,11 +11,12 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WatchlistViewSet
+from .views import WatchlistViewSet, watchlist_events
 
 router = DefaultRouter()
 router.register(r'', WatchlistViewSet, basename='watchlist')
 
 urlpatterns = [
+    path('events/', watchlist_events, name='watchlist-events'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,25 +1,40 @@
 # watchlist/views.py - Updated with add-from-omdb endpoint
+import asyncio
+import json
+from datetime import timedelta, timezone as dt_timezone
+from asgiref.sync import sync_to_async
 from django.conf import settings
-import requests
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import WatchlistItem
-from movies.models import Movie
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from .events import get_broker
+from .models import WatchlistDeletion, WatchlistItem
+from movieshelfapp.instrumentation import record_movie_lookup
+from movies import enrichment, identity, providers
 from .serializers import (
     WatchlistItemSerializer,
     WatchlistItemCreateSerializer,
     WatchlistItemUpdateSerializer,
-    AddFromOMDBSerializer  # New serializer
+    AddFromOMDBSerializer,  # New serializer
+    BulkSelectionSerializer
 )
 
 
 class WatchlistViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    replica_reads = True
 
     def get_queryset(self):
-        return WatchlistItem.objects.filter(user=self.request.user).select_related('movie')
+        # Movies are read from the hot movie cache when serialized (movies/hot.py).
+        return WatchlistItem.objects.filter(user=self.request.user)
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -28,11 +43,22 @@ class WatchlistViewSet(viewsets.ModelViewSet):
             return WatchlistItemUpdateSerializer
         elif self.action == 'add_from_omdb':
             return AddFromOMDBSerializer
+        elif self.action in ['bulk_mark_watched', 'bulk_unmark_watched', 'bulk_delete']:
+            return BulkSelectionSerializer
         return WatchlistItemSerializer
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def destroy(self, request, *args, **kwargs):
+        """Delete one item with a single user-scoped DELETE"""
+        deleted = WatchlistItem.objects.filter(
+            user=request.user, pk=kwargs['pk']
+        ).delete_returning()
+        if not deleted:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=False, methods=['post'], url_path='add-from-omdb')
     def add_from_omdb(self, request):
         """
@@ -47,9 +73,10 @@ class WatchlistViewSet(viewsets.ModelViewSet):
 
         try:
             # Check if already in watchlist
-            existing_item = WatchlistItem.objects.filter(
+            movie_pk = identity.resolve('imdb', imdb_id)
+            existing_item = movie_pk and WatchlistItem.objects.filter(
                 user=user,
-                movie__imdb_id=imdb_id
+                movie_id=movie_pk
             ).first()
 
             if existing_item:
@@ -61,8 +88,17 @@ class WatchlistViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Get or create movie from OMDB
-            movie = self._get_or_create_movie_from_omdb(imdb_id)
+            # Shelve a placeholder now and fetch the details in the background,
+            # unless the queue is backed up.
+            movie = identity.get_movie('imdb', imdb_id)
+            record_movie_lookup('add_from_omdb', found=movie is not None)
+            if movie is None and settings.ENRICHMENT_ASYNC:
+                try:
+                    movie = enrichment.add_placeholder(imdb_id, serializer.validated_data.get('title', ''))
+                except enrichment.QueueFull:
+                    pass
+            if movie is None:
+                movie = self._get_or_create_movie_from_omdb(imdb_id)
 
             # Create watchlist item
             watchlist_item = WatchlistItem.objects.create(
@@ -72,6 +108,14 @@ class WatchlistViewSet(viewsets.ModelViewSet):
                 note=serializer.validated_data.get('note', '')
             )
 
+            if movie.is_placeholder:
+                return Response(
+                    {
+                        'message': 'Movie added to watchlist; its details are being fetched',
+                        'watchlist_item': WatchlistItemSerializer(watchlist_item).data
+                    },
+                    status=status.HTTP_202_ACCEPTED
+                )
             return Response(
                 {
                     'message': 'Movie added to watchlist successfully',
@@ -88,90 +132,14 @@ class WatchlistViewSet(viewsets.ModelViewSet):
 
     def _get_or_create_movie_from_omdb(self, imdb_id):
         """
-        Get movie from database or fetch from OMDB and create it.
-        This handles the "lazy loading" of movies.
+        Fetch the movie through the provider chain and create it, within
+        the request; used when enrichment cannot be queued.
         """
-        # Try to get existing movie
         try:
-            return Movie.objects.get(imdb_id=imdb_id)
-        except Movie.DoesNotExist:
-            pass
-
-        # Fetch from OMDB and create
-        omdb_api_key = settings.OMDB_API_KEY
-        if not omdb_api_key:
-            raise Exception("OMDB API key not configured")
-
-        response = requests.get(
-            f"http://www.omdbapi.com/?i={imdb_id}&apikey={omdb_api_key}"
-        )
-        response.raise_for_status()
-        omdb_data = response.json()
-
-        if omdb_data.get('Response') == 'False':
-            raise Exception(f"Movie not found in OMDB: {omdb_data.get('Error', 'Unknown error')}")
-
-        # Transform OMDB data to Movie model format
-        movie_data = {
-            'tmdb_id': imdb_id,  # Using imdb_id as primary identifier
-            'imdb_id': imdb_id,
-            'title': omdb_data.get('Title', ''),
-            'overview': omdb_data.get('Plot', ''),
-            'poster_path': omdb_data.get('Poster', ''),
-            'release_date': self._parse_date(omdb_data.get('Released')),
-            'vote_average': self._parse_rating(omdb_data.get('imdbRating')),
-            'vote_count': self._parse_votes(omdb_data.get('imdbVotes')),
-            'runtime': self._parse_runtime(omdb_data.get('Runtime')),
-            'genres': self._parse_genres(omdb_data.get('Genre')),
-            'director': omdb_data.get('Director', ''),
-            'cast': self._parse_actors(omdb_data.get('Actors')),
-        }
-
-        return Movie.objects.create(**movie_data)
-
-    # Keep your existing parsing methods from CreateMovieView
-    def _parse_date(self, date_str):
-        if not date_str or date_str == 'N/A':
-            return None
-        try:
-            from datetime import datetime
-            return datetime.strptime(date_str, '%d %b %Y').date()
-        except:
-            return None
-
-    def _parse_rating(self, rating_str):
-        if not rating_str or rating_str == 'N/A':
-            return 0.0
-        try:
-            return float(rating_str)
-        except:
-            return 0.0
-
-    def _parse_votes(self, votes_str):
-        if not votes_str or votes_str == 'N/A':
-            return 0
-        try:
-            return int(votes_str.replace(',', ''))
-        except:
-            return 0
-
-    def _parse_runtime(self, runtime_str):
-        if not runtime_str or runtime_str == 'N/A':
-            return None
-        try:
-            return int(runtime_str.split()[0])
-        except:
-            return None
-
-    def _parse_genres(self, genre_str):
-        if not genre_str or genre_str == 'N/A':
-            return []
-        return [g.strip() for g in genre_str.split(',')]
-
-    def _parse_actors(self, actors_str):
-        if not actors_str or actors_str == 'N/A':
-            return []
-        return [a.strip() for a in actors_str.split(',')]
+            movie, _ = providers.materialize(imdb_id, source=None)
+        except providers.MovieNotFound as e:
+            raise Exception(f"Movie not found: {e}")
+        return movie
 
     # Keep all your existing actions (mark_watched, unmark_watched, etc.)
     @action(detail=True, methods=['patch'])
@@ -180,7 +148,7 @@ class WatchlistViewSet(viewsets.ModelViewSet):
         try:
             watchlist_item = self.get_object()
             watchlist_item.is_watched = True
-            watchlist_item.save()
+            watchlist_item.save(update_fields=['is_watched', 'watched_at', 'updated_at'])
 
             serializer = WatchlistItemSerializer(watchlist_item)
             return Response(serializer.data)
@@ -196,7 +164,7 @@ class WatchlistViewSet(viewsets.ModelViewSet):
         try:
             watchlist_item = self.get_object()
             watchlist_item.is_watched = False
-            watchlist_item.save()
+            watchlist_item.save(update_fields=['is_watched', 'watched_at', 'updated_at'])
 
             serializer = WatchlistItemSerializer(watchlist_item)
             return Response(serializer.data)
@@ -218,4 +186,129 @@ class WatchlistViewSet(viewsets.ModelViewSet):
         """Get only unwatched movies"""
         unwatched_items = self.get_queryset().filter(is_watched=False)
         serializer = WatchlistItemSerializer(unwatched_items, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    # Bulk actions: one UPDATE/DELETE for any number of items
+    @action(detail=False, methods=['patch'])
+    def bulk_mark_watched(self, request):
+        """Mark the selected watchlist items as watched"""
+        return self._bulk_set_watched(request, True)
+
+    @action(detail=False, methods=['patch'])
+    def bulk_unmark_watched(self, request):
+        """Unmark the selected watchlist items as watched"""
+        return self._bulk_set_watched(request, False)
+
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """Remove the selected watchlist items"""
+        selection = self.get_serializer(data=request.data)
+        selection.is_valid(raise_exception=True)
+        deleted = selection.select(WatchlistItem.objects.filter(user=request.user)).delete_returning()
+        return Response({'deleted': len(deleted), 'ids': deleted})
+
+    def _bulk_set_watched(self, request, is_watched):
+        selection = self.get_serializer(data=request.data)
+        selection.is_valid(raise_exception=True)
+        items = selection.select(WatchlistItem.objects.filter(user=request.user)).set_watched(is_watched)
+        return Response({'updated': len(items), 'items': items})
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        """
+        Delta sync: items added or changed since ?since=<cursor> plus the ids
+        of deleted items. Without a cursor, or with one older than the
+        tombstone retention, the whole watchlist is returned with "full": true
+        and the client should replace its local copy.
+        """
+        now = timezone.now()
+        since = request.query_params.get('since')
+        if since:
+            since = parse_datetime(since)
+            if since is None:
+                return Response(
+                    {'error': 'Invalid sync cursor'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, dt_timezone.utc)
+
+        retention = timedelta(days=settings.WATCHLIST_TOMBSTONE_RETENTION_DAYS)
+        full = since is None or since < now - retention
+
+        items = self.get_queryset()
+        deleted = []
+        if not full:
+            items = items.filter(updated_at__gte=since)
+            deleted = list(
+                WatchlistDeletion.objects.filter(user_id=request.user.pk, deleted_at__gte=since)
+                .values_list('item_id', flat=True)
+            )
+
+        cursor = now - timedelta(seconds=settings.WATCHLIST_SYNC_OVERLAP_SECONDS)
+        return Response({
+            'cursor': cursor.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'full': full,
+            'items': WatchlistItemSerializer(items, many=True).data,
+            'deleted': deleted,
+        })
+
+
+async def watchlist_events(request):
+    """
+    Server-sent event stream of the caller's watchlist changes. Each event
+    carries the ids of upserted and deleted items; clients then call the
+    sync endpoint. EventSource cannot send headers, so the access token may
+    also be passed as ?token=.
+
+    Only the ASGI app (movieshelfapp/asgi.py) serves it: a WSGI worker would
+    consume the endless stream synchronously and be tied up for as long as
+    the client stays connected, so under WSGI this answers 501.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'The event stream is only served by the ASGI application.'},
+            status=501
+        )
+    user = await _event_stream_user(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided or are invalid.'},
+            status=401
+        )
+    return StreamingHttpResponse(
+        _event_stream(user.pk),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+async def _event_stream_user(request):
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        token = auth.get_validated_token(raw_token)
+        return await sync_to_async(auth.get_user)(token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def _event_stream(user_id):
+    events = get_broker().subscribe(user_id)
+    next_event = asyncio.ensure_future(anext(events))
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            done, _ = await asyncio.wait({next_event}, timeout=settings.WATCHLIST_EVENTS_HEARTBEAT_SECONDS)
+            if not done:
+                yield ': keepalive\n\n'
+                continue
+            yield f"event: watchlist\ndata: {json.dumps(next_event.result())}\n\n"
+            next_event = asyncio.ensure_future(anext(events))
+    finally:
+        next_event.cancel()
+        await asyncio.gather(next_event, return_exceptions=True)
+        await events.aclose()